@@ -0,0 +1,582 @@
+"""End-to-end load test of the API and the Gradio pipeline, fully offline.
+
+``manimator.main:app`` is driven in-process through an ASGI client, and the
+Gradio app through ``gradio_app.stream_prompt``. LLM calls go through
+LiteLLM's OpenAI client to a local fake provider, an HTTP server answering
+with a canned response after ``--llm-latency`` seconds, and renders go to a fake
+``manim`` executable that sleeps ``--render-latency`` seconds, or to the
+real Manim CLI at preview quality with ``--render real``. Caches, artifacts
+and sessions live in a scratch directory, so runs do not share state.
+
+Scenarios, each sending ``--requests`` requests ``--concurrency`` at a time:
+
+- ``scene``: ``POST /generate-prompt-scene``
+- ``animation``: ``POST /generate-animation``, polling the job, then
+  downloading the video
+- ``stream``: ``POST /generate-animation/stream`` until its last event
+- ``gradio``: ``gradio_app.stream_prompt`` until its last update (skipped
+  when gradio is not installed)
+
+Reported are the throughput and end-to-end latency of every scenario, the
+p50/p95/p99 latency of every pipeline stage (from the stage telemetry, worker
+stages included) and the memory high-water mark of the server and its worker
+processes. With ``--baseline`` the run is compared with an earlier
+``--save-baseline`` and the script exits with status 1 on a regression.
+
+Usage:
+    python benchmarks/end_to_end.py [--scenarios scene,animation,stream]
+        [--requests 20] [--concurrency 4] [--llm-latency 0.2]
+        [--render-latency 0.5] [--render fake|real]
+        [--save-baseline e2e.json] [--baseline e2e.json] [--tolerance 0.2]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import resource
+import shlex
+import shutil
+import stat
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import httpx  # noqa: E402
+import litellm  # noqa: E402
+
+SCENARIOS = ("scene", "animation", "stream", "gradio")
+
+# Fake model names, one per stage; the openai/ prefix routes them to FakeProvider
+FAKE_MODELS = {
+    "PROMPT_SCENE_GEN_MODEL": "openai/bench-scene",
+    "PDF_SCENE_GEN_MODEL": "openai/bench-pdf",
+    "CODE_GEN_MODEL": "openai/bench-code",
+}
+
+SCENE_RESPONSE = """### Topic: Benchmark
+
+Key Points:
+- A circle is drawn and transformed into a square
+
+Visual Elements:
+- Circle morphing into a square
+
+Style:
+- 3Blue1Brown-style animation
+"""
+
+CODE_RESPONSE = """```python
+from manim import *
+
+# {tag}
+class BenchmarkScene(Scene):
+    def construct(self):
+        circle = Circle()
+        self.play(Create(circle))
+        self.play(Transform(circle, Square()))
+        self.wait(0.5)
+```"""
+
+FAKE_MANIM = """#!{python}
+import os, sys, time
+
+args = sys.argv[1:]
+media_dir = args[args.index("--media_dir") + 1]
+scene_file, scene_name = args[-2], args[-1]
+seconds = float(os.environ.get("BENCH_RENDER_SECONDS", "0"))
+for animation in range(2):
+    for frame in range(0, 16, 5):
+        sys.stderr.write(
+            f"\\rAnimation {{animation}}: Create(Circle): {{frame * 100 // 15}}%|#| {{frame}}/15"
+        )
+        sys.stderr.flush()
+        time.sleep(seconds / 8)
+    sys.stderr.write("\\n")
+videos = os.path.join(media_dir, "videos")
+os.makedirs(videos, exist_ok=True)
+with open(os.path.join(videos, scene_name + ".mp4"), "wb") as f:
+    f.write(os.urandom(64 * 1024))
+"""
+
+
+class FakeProvider(ThreadingHTTPServer):
+    """OpenAI-compatible chat completions endpoint with canned responses.
+
+    Answers after ``latency`` seconds, streamed or not, so LiteLLM's HTTP
+    clients, connection reuse and event loops are exercised like against a
+    real provider.
+    """
+
+    def __init__(self, latency: float):
+        super().__init__(("127.0.0.1", 0), FakeProviderHandler)
+        self.latency = latency
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.server.latency)
+        if "openai/" + body["model"] == FAKE_MODELS["CODE_GEN_MODEL"]:
+            # A distinct comment per prompt keeps the render cache cold
+            prompt = str(body["messages"][-1]["content"])
+            digest = hashlib.sha256(prompt.encode()).hexdigest()
+            content = CODE_RESPONSE.format(tag=digest[:16])
+        else:
+            content = SCENE_RESPONSE
+        completion = {
+            "id": "chatcmpl-bench",
+            "created": int(time.time()),
+            "model": body["model"],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 100, "total_tokens": 200},
+        }
+        if body.get("stream"):
+            events = [
+                {
+                    **completion,
+                    "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": {"content": line}}],
+                }
+                for line in content.splitlines(keepends=True)
+            ]
+            events.append(
+                {
+                    **completion,
+                    "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                }
+            )
+            payload = "".join(f"data: {json.dumps(event)}\n\n" for event in events)
+            self._send("text/event-stream", (payload + "data: [DONE]\n\n").encode())
+        else:
+            completion.update(
+                object="chat.completion",
+                choices=[
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }
+                ],
+            )
+            self._send("application/json", json.dumps(completion).encode())
+
+    def _send(self, content_type: str, payload: bytes):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_llm(latency: float) -> FakeProvider:
+    """Serves the fake provider and points LiteLLM's OpenAI models at it."""
+
+    provider = FakeProvider(latency)
+    threading.Thread(target=provider.serve_forever, daemon=True).start()
+    os.environ.update(OPENAI_API_BASE=provider.base_url, OPENAI_API_KEY="bench")
+    litellm.suppress_debug_info = True
+    return provider
+
+
+def install_fake_manim(bin_dir: str, latency: float):
+    """Makes renders run a ``manim`` executable that fakes a render.
+
+    It is set as ``MANIM_COMMAND``, so the installed Manim is never run, and
+    put first on the PATH for anything calling ``manim`` directly.
+    """
+
+    path = os.path.join(bin_dir, "manim")
+    with open(path, "w") as f:
+        f.write(FAKE_MANIM.format(python=sys.executable))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+    os.environ["MANIM_COMMAND"] = shlex.quote(path)
+    os.environ["BENCH_RENDER_SECONDS"] = str(latency)
+
+
+def configure_environment(scratch: str, args: argparse.Namespace):
+    """Points models, caches and workers at the benchmark's own settings.
+
+    Runs before manimator is imported, since its singletons read the
+    environment at import time.
+    """
+
+    os.environ.update(FAKE_MODELS)
+    for env in (
+        "PROMPT_SCENE_FALLBACK_MODELS",
+        "PDF_SCENE_FALLBACK_MODELS",
+        "CODE_GEN_FALLBACK_MODELS",
+        "REPAIR_MODEL",
+        "REPAIR_FALLBACK_MODELS",
+        "PDF_RETRY_MODEL",
+        "LLM_CACHE_DB",
+    ):
+        os.environ[env] = ""
+    os.environ.update(
+        ARTIFACT_DIR=os.path.join(scratch, "artifacts"),
+        RENDER_CACHE_DIR=os.path.join(scratch, "render_cache"),
+        RENDER_CACHE_MAX_BYTES="0",
+        RENDER_SESSION_DIR=os.path.join(scratch, "sessions"),
+        RENDER_SCRATCH_DIR=os.path.join(scratch, "render_scratch"),
+        RENDER_TEX_CACHE_DIR=os.path.join(scratch, "tex_cache"),
+        SEMANTIC_CACHE="off",
+        ARXIV_CACHE_DIR=os.path.join(scratch, "arxiv"),
+        RENDER_MODE="cli",
+        MANIM_COMMAND="",
+        RENDER_PARALLEL_CHUNKS="1",
+        RENDER_WORKERS=str(args.workers),
+        RENDER_QUEUE_SIZE=str(max(args.concurrency, 8)),
+        LLM_MAX_CONCURRENCY=str(max(args.concurrency, 4)),
+        LLM_MODEL_CONCURRENCY="",
+    )
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of unsorted samples, ``q`` in [0, 100]."""
+
+    ordered = sorted(samples)
+    rank = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(samples: List[float]) -> dict:
+    return {
+        "count": len(samples),
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+        "max": max(samples),
+    }
+
+
+class MemorySampler:
+    """Samples the resident memory of this process and its worker processes.
+
+    ``ru_maxrss`` only covers children once they have exited, while render
+    workers live as long as the server, so ``/proc`` is polled instead.
+    """
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.peak_total_kib = 0
+        self.peak_workers = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def _rss_kib(pid: int) -> int:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            children = multiprocessing.active_children()
+            total = self._rss_kib(os.getpid()) + sum(
+                self._rss_kib(child.pid) for child in children
+            )
+            self.peak_total_kib = max(self.peak_total_kib, total)
+            self.peak_workers = max(self.peak_workers, len(children))
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self) -> dict:
+        return {
+            "server_peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "total_peak_rss_mib": self.peak_total_kib / 1024,
+            "peak_worker_processes": self.peak_workers,
+        }
+
+
+async def _poll_job(client: httpx.AsyncClient, job_id: str, interval: float) -> dict:
+    while True:
+        job = (await client.get(f"/jobs/{job_id}")).json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        await asyncio.sleep(interval)
+
+
+async def run_request(scenario: str, client: httpx.AsyncClient, prompt: str) -> Optional[str]:
+    """Runs one request of a scenario, returning an error or None."""
+
+    body = {"prompt": prompt, "bypass_cache": True}
+    if scenario == "scene":
+        response = await client.post("/generate-prompt-scene", json=body)
+        return None if response.status_code == 200 else f"HTTP {response.status_code}"
+    if scenario == "animation":
+        response = await client.post("/generate-animation", json=body)
+        if response.status_code != 202:
+            return f"HTTP {response.status_code}"
+        job = await _poll_job(client, response.json()["job_id"], 0.05)
+        if job["status"] == "failed":
+            return job["error"]
+        video = await client.get(f"/jobs/{job['job_id']}/video")
+        return None if video.status_code == 200 else f"video HTTP {video.status_code}"
+    if scenario == "stream":
+        event = None
+        async with client.stream("POST", "/generate-animation/stream", json=body) as response:
+            if response.status_code != 200:
+                return f"HTTP {response.status_code}"
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line.split(":", 1)[1].strip()
+        return None if event == "done" else f"stream ended with {event}"
+    # gradio
+    from manimator import gradio_app
+
+    status = None
+    async for _, _, status, _ in gradio_app.stream_prompt(prompt):
+        pass
+    return None if status == "Animation generated successfully!" else status
+
+
+async def run_scenario(
+    scenario: str, client: httpx.AsyncClient, requests: int, concurrency: int
+) -> dict:
+    """Sends ``requests`` requests of a scenario, ``concurrency`` at a time."""
+
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                error = await run_request(
+                    scenario, client, f"Benchmark {scenario} request {index}"
+                )
+            except Exception as e:
+                # Report the cause, not the task group wrapping it
+                while isinstance(e, BaseExceptionGroup) and len(e.exceptions) == 1:
+                    e = e.exceptions[0]
+                error = f"{type(e).__name__}: {e}"
+            if error is None:
+                latencies.append(time.perf_counter() - start)
+            else:
+                key = error.splitlines()[0][:120]
+                errors[key] = errors.get(key, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    wall = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "errors": sum(errors.values()),
+        "error_messages": errors,
+        "wall_seconds": wall,
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "latency": summarize(latencies) if latencies else None,
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    from manimator.main import app
+    from manimator.utils.telemetry import telemetry
+
+    stage_samples: Dict[str, List[float]] = {}
+
+    def on_event(event):
+        if event[0] == "stage" and event[3] == "ok":
+            stage_samples.setdefault(event[1], []).append(event[2])
+
+    telemetry.subscribe(on_event)
+
+    scenarios = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench", timeout=None
+        ) as client:
+            for scenario in args.scenarios:
+                if scenario == "gradio":
+                    try:
+                        from manimator import gradio_app  # noqa: F401
+                    except ImportError as e:
+                        print(f"Skipping gradio scenario: {e}")
+                        continue
+                if args.warmup:
+                    await run_scenario(scenario, client, args.warmup, args.concurrency)
+                stage_samples.clear()
+                print(f"Running {scenario}: {args.requests} requests...")
+                result = await run_scenario(
+                    scenario, client, args.requests, args.concurrency
+                )
+                result["stages"] = {
+                    stage: summarize(samples) for stage, samples in stage_samples.items()
+                }
+                scenarios[scenario] = result
+    return scenarios
+
+
+def compare(current: dict, baseline: dict, tolerance: float, min_delta: float) -> List[str]:
+    """Lists the metrics of ``current`` that regressed from ``baseline``.
+
+    Latencies regress when they grow by more than ``tolerance`` (a fraction)
+    and ``min_delta`` seconds, throughput when it drops by more than
+    ``tolerance``, and memory when it grows by more than ``tolerance``.
+    """
+
+    regressions = []
+
+    def check_latency(name: str, now: Optional[dict], before: Optional[dict]):
+        if not now or not before:
+            return
+        for q in ("p50", "p95", "p99"):
+            if now[q] > before[q] * (1 + tolerance) and now[q] - before[q] > min_delta:
+                regressions.append(
+                    f"{name} {q}: {before[q] * 1000:.1f} ms -> {now[q] * 1000:.1f} ms"
+                )
+
+    for scenario, result in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if previous is None:
+            continue
+        if result["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{scenario} throughput: {previous['throughput_rps']:.2f} -> "
+                f"{result['throughput_rps']:.2f} req/s"
+            )
+        if result["errors"] > previous["errors"]:
+            regressions.append(
+                f"{scenario} errors: {previous['errors']} -> {result['errors']}"
+            )
+        check_latency(scenario, result["latency"], previous["latency"])
+        for stage, summary in result["stages"].items():
+            check_latency(
+                f"{scenario}/{stage}", summary, previous.get("stages", {}).get(stage)
+            )
+
+    for key, value in current["memory"].items():
+        before = baseline.get("memory", {}).get(key)
+        if key.endswith("_mib") and before and value > before * (1 + tolerance):
+            regressions.append(f"memory {key}: {before:.0f} -> {value:.0f} MiB")
+    return regressions
+
+
+def print_report(report: dict):
+    for scenario, result in report["scenarios"].items():
+        latency = result["latency"]
+        print(
+            f"\n{scenario}: {result['requests']} requests, {result['errors']} errors, "
+            f"{result['throughput_rps']:.2f} req/s"
+        )
+        for message, count in result["error_messages"].items():
+            print(f"  error x{count}: {message}")
+        print(f"  {'stage':<24} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        rows = [("end_to_end", latency)] if latency else []
+        rows += sorted(result["stages"].items())
+        for stage, summary in rows:
+            print(
+                f"  {stage:<24} {summary['count']:>6} {summary['p50'] * 1000:>9.1f} "
+                f"{summary['p95'] * 1000:>9.1f} {summary['p99'] * 1000:>9.1f}"
+            )
+    memory = report["memory"]
+    print(
+        f"\nMemory high-water mark: server {memory['server_peak_rss_mib']:.0f} MiB, "
+        f"server and workers {memory['total_peak_rss_mib']:.0f} MiB "
+        f"({memory['peak_worker_processes']} worker processes)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default="scene,animation,stream,gradio")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--render-latency", type=float, default=0.5)
+    parser.add_argument("--render", choices=("fake", "real"), default="fake")
+    parser.add_argument("--save-baseline", default=None)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--min-delta", type=float, default=0.01)
+    args = parser.parse_args()
+    args.scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    scratch = tempfile.mkdtemp(prefix="manimator-bench-")
+    try:
+        configure_environment(scratch, args)
+        if args.render == "fake":
+            os.makedirs(os.path.join(scratch, "bin"))
+            install_fake_manim(os.path.join(scratch, "bin"), args.render_latency)
+        elif shutil.which("manim") is None:
+            parser.error("--render real needs the manim CLI on the PATH")
+        provider = start_fake_llm(args.llm_latency)
+
+        with MemorySampler() as memory:
+            scenarios = asyncio.run(run_benchmark(args))
+        provider.shutdown()
+        report = {
+            "config": {
+                key: getattr(args, key)
+                for key in (
+                    "requests",
+                    "concurrency",
+                    "workers",
+                    "llm_latency",
+                    "render_latency",
+                    "render",
+                )
+            },
+            "scenarios": scenarios,
+            "memory": memory.report(),
+        }
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    print_report(report)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("\nWarning: the baseline was recorded with different settings")
+        regressions = compare(report, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"\n{len(regressions)} regressions against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Measures the cold-start import time of a manimator module.
+
+Every sample imports the module in a fresh interpreter, the way a newly
+scaled-up container does. ``-X importtime`` is used to report the slowest
+imports, which is usually where a regression comes from.
+
+Usage:
+    python benchmarks/import_time.py [--module manimator.main] [--runs 5]
+        [--max-seconds 3.0] [--top 10]
+
+Exits with status 1 when the median exceeds ``--max-seconds``.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(module: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [REPO_ROOT, env.get("PYTHONPATH")])
+    )
+    flags = ["-X", "importtime"] if importtime else []
+    return subprocess.run(
+        [sys.executable, *flags, "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def measure(module: str, runs: int) -> List[float]:
+    """Returns wall-clock seconds to import ``module`` in ``runs`` fresh interpreters."""
+
+    _run(module)  # warm the bytecode and OS file caches
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        _run(module)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def slowest_imports(module: str, top: int) -> List[Tuple[int, str]]:
+    """Returns the ``top`` imports by cumulative time, in microseconds."""
+
+    rows = []
+    for line in _run(module, importtime=True).stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="manimator.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    samples = measure(args.module, args.runs)
+    median = statistics.median(samples)
+    print(
+        f"import {args.module}: median {median:.3f}s, "
+        f"min {min(samples):.3f}s, max {max(samples):.3f}s over {args.runs} runs"
+    )
+    print("Slowest imports (cumulative):")
+    for micros, name in slowest_imports(args.module, args.top):
+        print(f"  {micros / 1e6:8.3f}s  {name}")
+
+    if args.max_seconds is not None and median > args.max_seconds:
+        print(f"FAIL: median exceeds {args.max_seconds:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Compares prompt variants by input tokens and, optionally, live latency.
+
+The static report counts the tokens of the prompt prefix every stage sends
+before the request itself (system prompt and few-shot examples), with the
+tokenizer of ``--tokenizer-model``, so it runs offline. PDF attachments are
+reported in bytes since their token cost depends on the provider.
+
+With ``--live`` each variant is also run ``--runs`` times against the
+configured models (scene and code stages, plus the PDF stage when ``--pdf``
+is given), bypassing the completion cache, and latency percentiles and the
+token usage reported by the providers are printed, including prompt tokens
+served from the provider's prompt cache.
+
+Usage:
+    python benchmarks/prompt_variants.py [--tokenizer-model gpt-4o]
+        [--prompt "Explain Fourier Transform"] [--live] [--runs 3]
+        [--pdf paper.pdf]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import litellm  # noqa: E402
+
+from manimator.api.animation_generation import (  # noqa: E402
+    animation_messages,
+    generate_animation_response,
+)
+from manimator.api.scene_description import (  # noqa: E402
+    pdf_prompt_prefix,
+    process_pdf_prompt,
+    process_prompt_scene,
+    scene_prompt_prefix,
+)
+from manimator.utils.llm_client import llm_client  # noqa: E402
+from manimator.utils.system_prompts import PROMPT_VARIANTS  # noqa: E402
+
+
+def _split_attachments(messages: List[Dict]) -> Tuple[List[Dict], int]:
+    """Returns the text-only messages and the bytes of inline attachments."""
+
+    text_messages, attachment_bytes = [], 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, list):
+            texts = []
+            for block in content:
+                if block.get("type") == "text":
+                    texts.append(block["text"])
+                else:
+                    url = block.get("image_url")
+                    url = url.get("url", "") if isinstance(url, dict) else url or ""
+                    attachment_bytes += len(url)
+            content = "\n".join(texts)
+        text_messages.append({"role": message["role"], "content": content})
+    return text_messages, attachment_bytes
+
+
+def prefix_report(tokenizer_model: str, prompt: str) -> List[Tuple[str, str, int, int]]:
+    """Returns ``(stage, variant, prefix tokens, attachment bytes)`` rows."""
+
+    rows = []
+    for variant in PROMPT_VARIANTS:
+        prefixes = {
+            "scene": scene_prompt_prefix(variant),
+            "pdf": pdf_prompt_prefix(variant),
+            "code": animation_messages(prompt, variant)[:1],
+        }
+        for stage, messages in prefixes.items():
+            text_messages, attachment_bytes = _split_attachments(messages)
+            tokens = litellm.token_counter(model=tokenizer_model, messages=text_messages)
+            rows.append((stage, variant, tokens, attachment_bytes))
+    return rows
+
+
+async def _live_stage(stage: str, prompt: str, pdf: bytes) -> float:
+    start = time.perf_counter()
+    if stage == "scene":
+        await process_prompt_scene(prompt, use_cache=False)
+    elif stage == "code":
+        await generate_animation_response(prompt, use_cache=False)
+    else:
+        await process_pdf_prompt(pdf, use_cache=False)
+    return time.perf_counter() - start
+
+
+async def live_report(prompt: str, runs: int, pdf: bytes) -> List[dict]:
+    """Runs every stage ``runs`` times per variant against the real models."""
+
+    stages = ["scene", "code"] + (["pdf"] if pdf else [])
+    rows = []
+    for variant in PROMPT_VARIANTS:
+        os.environ["PROMPT_VARIANT"] = variant
+        for stage in stages:
+            before = dict(llm_client.usage.get(stage, {}))
+            samples = [await _live_stage(stage, prompt, pdf) for _ in range(runs)]
+            after = llm_client.usage.get(stage, {})
+            usage = {k: (after.get(k, 0) - before.get(k, 0)) / runs for k in after}
+            rows.append(
+                {
+                    "stage": stage,
+                    "variant": variant,
+                    "p50": statistics.median(samples),
+                    "max": max(samples),
+                    **usage,
+                }
+            )
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokenizer-model", default="gpt-4o")
+    parser.add_argument("--prompt", default="Explain Fourier Transform")
+    parser.add_argument("--live", action="store_true")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--pdf", default=None)
+    args = parser.parse_args()
+
+    print(f"Prompt prefix tokens ({args.tokenizer_model} tokenizer):")
+    print(f"  {'stage':<6} {'variant':<8} {'tokens':>8} {'attachments':>12}")
+    for stage, variant, tokens, attachment_bytes in prefix_report(
+        args.tokenizer_model, args.prompt
+    ):
+        attachments = f"{attachment_bytes / 1024:.0f} KiB" if attachment_bytes else "-"
+        print(f"  {stage:<6} {variant:<8} {tokens:>8} {attachments:>12}")
+
+    if not args.live:
+        return
+    pdf = None
+    if args.pdf:
+        with open(args.pdf, "rb") as f:
+            pdf = f.read()
+    print(f"\nLive calls ({args.runs} per stage and variant, cache bypassed):")
+    print(
+        f"  {'stage':<6} {'variant':<8} {'p50 s':>7} {'max s':>7} "
+        f"{'prompt':>8} {'cached':>8} {'output':>8}"
+    )
+    for row in asyncio.run(live_report(args.prompt, args.runs, pdf)):
+        print(
+            f"  {row['stage']:<6} {row['variant']:<8} {row['p50']:>7.2f} "
+            f"{row['max']:>7.2f} {row.get('prompt_tokens', 0):>8.0f} "
+            f"{row.get('cached_prompt_tokens', 0):>8.0f} "
+            f"{row.get('completion_tokens', 0):>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
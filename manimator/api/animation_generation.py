@@ -1,18 +1,58 @@
-import litellm
 from fastapi import HTTPException
 from dotenv import load_dotenv
-import os
+import time
+from typing import AsyncIterator, List, Dict, Optional
 
-from manimator.utils.system_prompts import MANIM_SYSTEM_PROMPT
+from manimator.utils.llm_cache import cached_completion, stream_cached_completion
+from manimator.utils.llm_router import llm_router
+from manimator.utils.telemetry import telemetry
+from manimator.utils.system_prompts import (
+    MANIM_SYSTEM_PROMPT,
+    MANIM_SYSTEM_PROMPT_COMPACT,
+    prompt_variant,
+)
 
 load_dotenv()
 
 
-def generate_animation_response(prompt: str) -> str:
+def animation_messages(prompt: str, variant: Optional[str] = None) -> List[Dict]:
+    """Builds the code generation messages for a prompt.
+
+    Args:
+        prompt (str): Scene description to animate
+        variant (Optional[str]): ``full`` or ``compact`` prompt set. Defaults
+            to env PROMPT_VARIANT
+
+    Returns:
+        List[Dict]: The system prompt, a static prefix shared by every call,
+            followed by the user message
+    """
+
+    if (variant or prompt_variant()) == "compact":
+        # The compact system prompt already states the layout rules once
+        return [
+            {"role": "system", "content": MANIM_SYSTEM_PROMPT_COMPACT},
+            {"role": "user", "content": prompt},
+        ]
+    return [
+        {
+            "role": "system",
+            "content": MANIM_SYSTEM_PROMPT,
+        },
+        {
+            "role": "user",
+            "content": f"{prompt}\n\n NOTE!!!: Make sure the objects or text in the generated code are not overlapping at any point in the video. Make sure that each scene is properly cleaned up before transitioning to the next scene.",
+        },
+    ]
+
+
+async def generate_animation_response(prompt: str, use_cache: bool = True) -> str:
     """Generate Manim animation code from a text prompt.
 
     Args:
         prompt (str): Text description of the desired animation
+        use_cache (bool): Whether a cached response for the same prompt may be
+            returned. Defaults to True
 
     Returns:
         str: Generated Manim Python code
@@ -23,21 +63,56 @@ def generate_animation_response(prompt: str) -> str:
     """
 
     try:
-        messages = [
-            {
-                "role": "system",
-                "content": MANIM_SYSTEM_PROMPT,
-            },
-            {
-                "role": "user",
-                "content": f"{prompt}\n\n NOTE!!!: Make sure the objects or text in the generated code are not overlapping at any point in the video. Make sure that each scene is properly cleaned up before transitioning to the next scene.",
-            },
-        ]
-        response = litellm.completion(
-            model=os.getenv("CODE_GEN_MODEL"), messages=messages, num_retries=2
+        with telemetry.span("code_generation"):
+            return await cached_completion(
+                llm_router.chain("code"),
+                messages=animation_messages(prompt),
+                use_cache=use_cache,
+                stage="code",
+                cache_prefix=1,
+            )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed to generate animation response: {str(e)}"
         )
-        return response.choices[0].message.content
+
+
+async def stream_animation_response(
+    prompt: str, use_cache: bool = True
+) -> AsyncIterator[str]:
+    """Stream Manim animation code from a text prompt as it is generated.
+
+    Args:
+        prompt (str): Text description of the desired animation
+        use_cache (bool): Whether a cached response for the same prompt may be
+            returned. Defaults to True
+
+    Yields:
+        str: Chunks of the model response in arrival order
+
+    Raises:
+        HTTPException: If code generation fails, returns 500 status code
+            with error details
+    """
+
+    # Timed by hand: a span cannot stay current across the generator's yields
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        async for chunk in stream_cached_completion(
+            llm_router.chain("code"),
+            messages=animation_messages(prompt),
+            use_cache=use_cache,
+            stage="code",
+            cache_prefix=1,
+        ):
+            yield chunk
+        outcome = "ok"
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed to generate animation response: {str(e)}"
         )
+    finally:
+        telemetry.observe(
+            "code_generation", time.perf_counter() - start, outcome, streamed=True
+        )
@@ -0,0 +1,118 @@
+import re
+import time
+from typing import List, Tuple
+import litellm
+from dotenv import load_dotenv
+
+from manimator.utils.llm_router import llm_router
+from manimator.utils.schema import PROGRESS_PATTERN
+from manimator.utils.system_prompts import (
+    CODE_REPAIR_PROMPT,
+    MANIM_SYSTEM_PROMPT,
+    MANIM_SYSTEM_PROMPT_COMPACT,
+    prompt_variant,
+)
+
+load_dotenv()
+
+ANSI_PATTERN = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+# Borders drawn around rich tracebacks, as printed by the manim CLI
+BOX_CHARS = "│╭╮╰╯─━┃"
+EXCEPTION_PATTERN = re.compile(r"^[A-Za-z_][\w.]*(Error|Exception|Exit|Interrupt)\b")
+
+
+def trim_traceback(output: str, max_lines: int = 30) -> str:
+    """Reduces Manim console output to the part of a failure a model needs.
+
+    Progress bars and Manim's own stack frames are dropped; what remains is
+    the frames pointing into the scene file, with their source lines, and
+    the final exception message.
+
+    Args:
+        output (str): Console output or error detail of a failed render
+        max_lines (int): Maximum number of lines returned
+
+    Returns:
+        str: The trimmed traceback
+    """
+
+    lines = []
+    for line in ANSI_PATTERN.sub("", output).splitlines():
+        line = line.strip(BOX_CHARS + " ").rstrip()
+        if line and not PROGRESS_PATTERN.search(line):
+            lines.append(line)
+
+    exception_at = None
+    for index in range(len(lines) - 1, -1, -1):
+        if EXCEPTION_PATTERN.match(lines[index]):
+            exception_at = index
+            break
+    if exception_at is None:
+        return "\n".join(lines[-max_lines:])
+
+    # Frames in the generated file, each with the source line that follows
+    scene_frames: List[str] = []
+    for index, line in enumerate(lines[:exception_at]):
+        if "scene.py" in line:
+            scene_frames.extend(lines[index : min(index + 3, exception_at)])
+    message = lines[exception_at:]
+    return "\n".join((scene_frames + message)[-max_lines:])
+
+
+async def repair_animation_code(
+    description: str, code: str, error: str, model: str = None
+) -> Tuple[str, dict]:
+    """Asks the code model for a minimal fix of scene code that failed.
+
+    Args:
+        description (str): Scene description the code was generated from
+        code (str): The failing Manim code
+        error (str): Trimmed traceback or validation errors
+        model (str): LiteLLM model name. Defaults to the ``repair`` model
+            chain: env REPAIR_MODEL and REPAIR_FALLBACK_MODELS, or the
+            ``code`` chain when REPAIR_MODEL is unset
+
+    Returns:
+        Tuple[str, dict]: The model response, containing the corrected code
+            in a python code block, and a usage record with the ``model``
+            that answered,
+            ``prompt_tokens``, ``completion_tokens``, ``cost_usd`` and
+            ``latency_s``
+
+    Raises:
+        AllModelsFailedError: If every model of the chain failed
+    """
+
+    models = [model] if model else llm_router.chain("repair")
+    system_prompt = (
+        MANIM_SYSTEM_PROMPT_COMPACT
+        if prompt_variant() == "compact"
+        else MANIM_SYSTEM_PROMPT
+    )
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {
+            "role": "user",
+            "content": CODE_REPAIR_PROMPT.format(
+                description=description, error=error, code=code
+            ),
+        },
+    ]
+    start = time.perf_counter()
+    response = await llm_router.complete(
+        models, messages, stage="repair", cache_prefix=1
+    )
+    latency = time.perf_counter() - start
+
+    usage = getattr(response, "usage", None)
+    try:
+        cost = litellm.completion_cost(completion_response=response)
+    except Exception:
+        cost = None  # no pricing known for this model
+    return response.choices[0].message.content, {
+        "model": getattr(response, "model", None) or models[0],
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+        "cost_usd": cost,
+        "latency_s": round(latency, 3),
+    }
@@ -1,24 +1,73 @@
 from fastapi import HTTPException
-import litellm
+import hashlib
 import os
+from typing import Callable, Dict, List, Optional
 from dotenv import load_dotenv
 
-from manimator.utils.helpers import compress_pdf
-from manimator.utils.system_prompts import SCENE_SYSTEM_PROMPT
-from manimator.few_shot.few_shot_prompts import SCENE_EXAMPLES, PDF_EXAMPLE
+from manimator.utils.llm_cache import cached_completion
+from manimator.utils.llm_router import llm_router
+from manimator.utils.pdf_preprocessing import pdf_prep_pool
+from manimator.utils.telemetry import telemetry
+from manimator.utils.system_prompts import (
+    SCENE_SYSTEM_PROMPT,
+    SCENE_SYSTEM_PROMPT_COMPACT,
+    prompt_variant,
+)
+from manimator.few_shot.few_shot_prompts import (
+    PDF_EXAMPLE_COMPACT,
+    SCENE_EXAMPLES,
+    SCENE_EXAMPLES_COMPACT,
+    get_pdf_example,
+)
 
 load_dotenv()
 
 
-def process_prompt_scene(prompt: str) -> str:
+def scene_prompt_prefix(variant: Optional[str] = None) -> List[Dict]:
+    """Returns the static messages sent before every text prompt.
+
+    Args:
+        variant: ``full`` (three few-shot examples) or ``compact`` (compact
+            system prompt, one example). Defaults to env PROMPT_VARIANT
+    """
+
+    if (variant or prompt_variant()) == "compact":
+        return [
+            {"role": "system", "content": SCENE_SYSTEM_PROMPT_COMPACT},
+            *SCENE_EXAMPLES_COMPACT,
+        ]
+    return [{"role": "system", "content": SCENE_SYSTEM_PROMPT}, *SCENE_EXAMPLES]
+
+
+def pdf_prompt_prefix(variant: Optional[str] = None) -> List[Dict]:
+    """Returns the static messages sent before every PDF.
+
+    Args:
+        variant: ``full`` (example paper sent as a PDF) or ``compact``
+            (compact system prompt, example paper referenced by title).
+            Defaults to env PROMPT_VARIANT
+    """
+
+    if (variant or prompt_variant()) == "compact":
+        return [
+            {"role": "system", "content": SCENE_SYSTEM_PROMPT_COMPACT},
+            *PDF_EXAMPLE_COMPACT,
+        ]
+    return [{"role": "system", "content": SCENE_SYSTEM_PROMPT}, *get_pdf_example()]
+
+
+async def process_prompt_scene(prompt: str, use_cache: bool = True) -> str:
     """Generate a scene description from a text prompt using LLM.
 
     This function takes a text prompt and generates a detailed scene description
-    using the configured LLM model. It includes few-shot examples to improve
-    the quality of generated descriptions.
+    using the ``scene`` model chain (PROMPT_SCENE_GEN_MODEL and its
+    fallbacks). It includes few-shot examples to improve the quality of
+    generated descriptions.
 
     Args:
         prompt: The text prompt describing the desired scene
+        use_cache: Whether a cached description for the same prompt may be
+            returned. Defaults to True
 
     Returns:
         str: Generated scene description
@@ -27,72 +76,86 @@ def process_prompt_scene(prompt: str) -> str:
         HTTPException: If the model fails to generate a description
     """
 
-    messages = [
-        {
-            "role": "system",
-            "content": SCENE_SYSTEM_PROMPT,
-        },
-    ]
-    messages.extend(SCENE_EXAMPLES)
-    messages.append(
-        {
-            "role": "user",
-            "content": prompt,
-        }
-    )
-    response = litellm.completion(
-        model=os.getenv("PROMPT_SCENE_GEN_MODEL"),
-        messages=messages,
-        num_retries=2,
-    )
-    return response.choices[0].message.content
+    prefix = scene_prompt_prefix()
+    messages = [*prefix, {"role": "user", "content": prompt}]
+    with telemetry.span("scene_description"):
+        return await cached_completion(
+            llm_router.chain("scene"),
+            messages=messages,
+            use_cache=use_cache,
+            stage="scene",
+            cache_prefix=len(prefix),
+        )
 
 
-def process_pdf_prompt(
+async def process_pdf_prompt(
     file_content: bytes,
-    model: str = os.getenv("PDF_SCENE_GEN_MODEL"),
-    retry: bool = False,
+    use_cache: bool = True,
+    on_prepared: Optional[Callable[[dict], None]] = None,
 ) -> str:
-    """Process a PDF file and generate a scene description using the specified model.
+    """Process a PDF file and generate a scene description using the ``pdf`` model chain.
+
+    The PDF is first reduced to its most relevant pages on the PDF worker pool
+    (see :func:`manimator.utils.pdf_preprocessing.prepare_pdf`), sent either
+    as a trimmed PDF or as extracted text depending on PDF_PREP_MODE. The
+    prepared payload is reused when PDF_SCENE_GEN_MODEL fails and a fallback
+    model is tried.
 
     Args:
         file_content: Raw PDF file bytes
-        model: LLM model to use for processing. Defaults to env PDF_SCENE_GEN_MODEL
-        retry: Whether this is a retry attempt and should it use the PDF_RETRY_MODEL
+        use_cache: Whether a cached description for the same PDF may be
+            returned. Defaults to True
+        on_prepared: Called with the preprocessing report (pages kept, bytes
+            and tokens saved, per-stage timings). Not called when the
+            description is cached
 
     Returns:
         str: Generated scene description
 
     Raises:
-        HTTPException: If PDF processing fails or invalid input
+        HTTPException: If PDF processing fails or invalid input, 413 if the
+            PDF exceeds PDF_MAX_BYTES or PDF_MAX_PAGES
     """
     if not file_content:
         raise HTTPException(status_code=400, detail="Empty PDF file provided")
 
     try:
-        encoded_pdf = compress_pdf(file_content)
-        messages = [
-            {"role": "system", "content": SCENE_SYSTEM_PROMPT},
-            *PDF_EXAMPLE,
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "image_url",
-                        "image_url": f"data:application/pdf;base64,{encoded_pdf}",
-                    }
-                ],
-            },
-        ]
-
-        response = litellm.completion(
-            model=model,
-            messages=messages,
-        )
-        return response.choices[0].message.content
+        prompt_messages = pdf_prompt_prefix()
+
+        mode = os.getenv("PDF_PREP_MODE", "trimmed")
+        token_budget = int(os.getenv("PDF_TOKEN_BUDGET", "16000"))
+
+        async def build_messages():
+            prepared = await pdf_prep_pool.prepare(
+                file_content, mode=mode, token_budget=token_budget
+            )
+            report = prepared.report()
+            print(f"PDF preprocessing: {report}")
+            for stage, ms in prepared.timings_ms.items():
+                telemetry.observe(f"pdf_{stage}", ms / 1000, mode=prepared.mode)
+            if on_prepared is not None:
+                on_prepared(report)
+            return [*prompt_messages, prepared.message()]
+
+        # Key the cache on the PDF digest instead of the base64 body, so a hit
+        # skips preprocessing entirely
+        pdf_digest = hashlib.sha256(file_content).hexdigest()
+        key_message = {
+            "role": "user",
+            "content": f"pdf-sha256:{pdf_digest}:{mode}:{token_budget}",
+        }
 
+        with telemetry.span("pdf_scene_description"):
+            return await cached_completion(
+                llm_router.chain("pdf"),
+                messages=build_messages,
+                key_messages=[*prompt_messages, key_message],
+                use_cache=use_cache,
+                stage="pdf",
+                cache_prefix=len(prompt_messages),
+            )
+
+    except HTTPException:
+        raise
     except Exception as e:
-        retry_model = os.getenv("PDF_RETRY_MODEL")
-        if not retry and retry_model:
-            return process_pdf_prompt(file_content, model=retry_model, retry=True)
         raise HTTPException(status_code=500, detail=f"Failed to process PDF: {str(e)}")
@@ -1,3 +1,6 @@
+import functools
+from typing import Tuple
+
 from manimator.utils.helpers import read_base64_few_shot_file
 
 FOURIER_TRANSFORM_EXAMPLE = [
@@ -69,17 +72,11 @@ SCENE_EXAMPLES = [
     for message in example
 ]
 
-few_shot_pdf = read_base64_few_shot_file()
-
-PDF_EXAMPLE = {
-    "role": "user",
-    "content": [
-        {
-            "type": "image_url",
-            "image_url": "data:application/pdf;base64,{}".format(few_shot_pdf),
-        },
-    ],
-}, {
+# Compact variants (PROMPT_VARIANT=compact): a single scene example, and the
+# PDF example response paired with the paper title instead of the PDF itself
+SCENE_EXAMPLES_COMPACT = list(FOURIER_TRANSFORM_EXAMPLE)
+
+PDF_EXAMPLE_RESPONSE = {
     "role": "assistant",
     "content": r"""*Topic*: Deep Residual Learning for Image Recognition
 *Key Points*:
@@ -96,3 +93,41 @@ PDF_EXAMPLE = {
 - Animate the flow of data through shortcut connections and residual blocks.
 - Provide step-by-step explanations for each concept.""",
 }
+
+PDF_EXAMPLE_COMPACT = [
+    {
+        "role": "user",
+        "content": "Paper: Deep Residual Learning for Image Recognition",
+    },
+    PDF_EXAMPLE_RESPONSE,
+]
+
+
+@functools.lru_cache(maxsize=None)
+def get_pdf_example() -> Tuple[dict, dict]:
+    """Returns the few-shot PDF example, reading the bundled PDF on first use.
+
+    The example PDF is several hundred KB once base64 encoded, so it is only
+    loaded when a PDF is actually processed instead of at import time.
+
+    Returns:
+        Tuple[dict, dict]: The example user message and assistant response
+    """
+
+    few_shot_pdf = read_base64_few_shot_file()
+    return {
+        "role": "user",
+        "content": [
+            {
+                "type": "image_url",
+                "image_url": "data:application/pdf;base64,{}".format(few_shot_pdf),
+            },
+        ],
+    }, PDF_EXAMPLE_RESPONSE
+
+
+def __getattr__(name: str):
+    # Keeps ``from few_shot_prompts import PDF_EXAMPLE`` working, lazily
+    if name == "PDF_EXAMPLE":
+        return get_pdf_example()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
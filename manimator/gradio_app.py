@@ -1,87 +1,150 @@
 import gradio as gr
-import re
+from fastapi.concurrency import run_in_threadpool
 from importlib import resources
 from typing import Tuple, Optional, Dict
 import functools
+import os
 
-from manimator.api.animation_generation import generate_animation_response
 from manimator.api.scene_description import process_prompt_scene, process_pdf_prompt
-from manimator.utils.schema import ManimProcessor
+from manimator.utils.jobs import JobManager
+from manimator.utils.streaming import relay_job_events, stream_animation_events
+from manimator.utils.telemetry import telemetry
 
 
-def process_prompt(prompt: str):
+job_manager = JobManager()
+telemetry.track_queue("render", lambda: job_manager.stats()["in_flight"])
+
+
+async def stream_prompt(prompt: str):
+    """Generate an animation, yielding (video, code, status, job id) updates as it progresses."""
     max_attempts = 2
-    attempts = 0
-
-    while attempts < max_attempts:
-        try:
-            processor = ManimProcessor()
-            with processor.create_temp_dir() as temp_dir:
-                scene_description = process_prompt_scene(prompt)
-                response = generate_animation_response(scene_description)
-                code = processor.extract_code(response)
-
-                if not code:
-                    attempts += 1
-                    if attempts < max_attempts:
-                        continue
-                    return (
-                        None,
-                        None,
-                        "No valid Manim code generated after multiple attempts",
-                    )
-
-                class_match = re.search(r"class (\w+)\(Scene\)", code)
-                if not class_match:
-                    attempts += 1
-                    if attempts < max_attempts:
-                        continue
-                    return None, None, "No Scene class found after multiple attempts"
-
-                scene_name = class_match.group(1)
-                scene_file = processor.save_code(code, temp_dir)
-                video_path = processor.render_scene(scene_file, scene_name, temp_dir)
-
-                if not video_path:
-                    return None, None, "Failed to render animation"
-
-                return video_path, code, "Animation generated successfully!"
-
-        except Exception as e:
-            attempts += 1
-            if attempts < max_attempts:
-                continue
-            return None, None, f"Error after multiple attempts: {str(e)}"
-
-
-def process_pdf(file_path: str):
+    code = None
+    error = None
+    job_id = None
+
+    yield None, None, "Generating scene description...", job_id
+    try:
+        scene_description = await process_prompt_scene(prompt)
+    except Exception as e:
+        yield None, None, f"Error generating scene description: {e}", job_id
+        return
+
+    # Failing code is repaired on the render worker; only when repairs run out
+    # is the code regenerated, reusing the same scene description
+    for attempt in range(max_attempts):
+        # A retry must not be served the response that just failed
+        use_cache = attempt == 0
+        code = None
+        partial_code = ""
+        # The code is editable, so render in a session re-renders can reuse
+        async for event in stream_animation_events(
+            prompt,
+            job_manager,
+            use_cache=use_cache,
+            session=True,
+            description=scene_description,
+        ):
+            data = event["data"]
+            if event["event"] == "token":
+                partial_code += data["text"]
+                yield None, partial_code, "Generating Manim code...", job_id
+            elif event["event"] == "code":
+                code = data["code"]
+                yield None, code, "Rendering animation...", job_id
+            elif event["event"] == "job":
+                job_id = data["job_id"]
+            else:
+                update = _render_update(event, code, job_id)
+                if update is not None:
+                    yield update
+                if event["event"] == "done":
+                    return
+                if event["event"] == "error":
+                    error = data["detail"]
+
+    yield None, code, f"Error after multiple attempts: {error}", job_id
+
+
+def _render_update(event: dict, code: Optional[str], job_id: Optional[str]):
+    """Maps a render job event to a (video, code, status, job id) update."""
+    data = event["data"]
+    if event["event"] == "repair":
+        status = f"Repairing code (attempt {data['attempt']}) after {data['stage']} error..."
+        return None, code, status, job_id
+    if event["event"] == "progress":
+        status = (
+            f"Rendering animation {data['animation']}: "
+            f"frame {data['frame']}/{data['total_frames']}"
+        )
+        return None, code, status, job_id
+    if event["event"] == "done":
+        return data["video_path"], data["code"], "Animation generated successfully!", job_id
+    return None
+
+
+async def rerender_code(code: str, job_id: Optional[str]):
+    """Re-render edited code, reusing the animations that did not change."""
+    if not job_id:
+        yield None, code, "Generate an animation before re-rendering edited code", job_id
+        return
+    try:
+        queue = job_manager.progress_queue()
+        job = await run_in_threadpool(
+            job_manager.rerender, job_id, code, progress_queue=queue
+        )
+    except Exception as e:
+        detail = getattr(e, "detail", str(e))
+        yield None, code, f"Cannot re-render: {detail}", job_id
+        return
+
+    yield None, code, "Re-rendering changed animations...", job_id
+    async for event in relay_job_events(job, queue):
+        update = _render_update(event, code, job.id)
+        if update is not None:
+            yield update
+        elif event["event"] == "error":
+            yield None, code, f"Error re-rendering: {event['data']['detail']}", job_id
+            return
+
+
+async def process_prompt(prompt: str):
+    result = None, None, "No output generated"
+    async for *result, _ in stream_prompt(prompt):
+        pass
+    return tuple(result)
+
+
+async def process_pdf(file_path: str):
     print("file_path", file_path)
     try:
         if not file_path:
             return "Error: No file uploaded"
         with open(file_path, "rb") as file_path:
             file_bytes = file_path.read()
-            scene_description = process_pdf_prompt(file_bytes)
+            scene_description = await process_pdf_prompt(file_bytes)
             print("scene_description", scene_description)
         return scene_description
     except Exception as e:
         return f"Error processing PDF: {str(e)}"
 
 
-def interface_fn(prompt=None, pdf_file=None):
+async def interface_fn(prompt=None, pdf_file=None):
     if prompt:
-        video_path, code, message = process_prompt(prompt)
-        if video_path:
-            return [video_path, code, message]
-        return [None, None, message]
+        async for update in stream_prompt(prompt):
+            yield update
+        return
     elif pdf_file:
-        scene_description = process_pdf(pdf_file)
+        scene_description = await process_pdf(pdf_file)
         if scene_description:
-            video_path, code, message = process_prompt(scene_description)
-            if video_path:
-                return [video_path, code, message]
-            return [None, None, message]
-    return [None, None, "Please provide either a prompt or upload a PDF file"]
+            async for update in stream_prompt(scene_description):
+                yield update
+            return
+    yield None, None, "Please provide either a prompt or upload a PDF file", None
+
+
+async def pdf_interface_fn(pdf_file=None):
+    async for update in interface_fn(prompt=None, pdf_file=pdf_file):
+        yield update
 
 
 description_md = """
@@ -148,17 +211,24 @@ with gr.Blocks(title="manimator") as demo:
                 video_output = gr.Video(label="Generated Animation")
 
             code_output = gr.Code(
-                label="Generated Manim Code",
+                label="Generated Manim Code (edit and re-render)",
                 language="python",
-                interactive=False,
+                interactive=True,
             )
+            rerender_button = gr.Button("Re-render Edited Code")
             status_output = gr.Textbox(
                 label="Status", interactive=False, show_copy_button=True
             )
+            job_state = gr.State(None)
             text_button.click(
                 fn=interface_fn,
                 inputs=[text_input],
-                outputs=[video_output, code_output, status_output],
+                outputs=[video_output, code_output, status_output, job_state],
+            )
+            rerender_button.click(
+                fn=rerender_code,
+                inputs=[code_output, job_state],
+                outputs=[video_output, code_output, status_output, job_state],
             )
 
         with gr.TabItem("📄 PDF Upload"):
@@ -170,17 +240,34 @@ with gr.Blocks(title="manimator") as demo:
                 pdf_video_output = gr.Video(label="Generated Animation")
 
             pdf_code_output = gr.Code(
-                label="Generated Manim Code",
+                label="Generated Manim Code (edit and re-render)",
                 language="python",
-                interactive=False,
+                interactive=True,
             )
+            pdf_rerender_button = gr.Button("Re-render Edited Code")
             pdf_status_output = gr.Textbox(
                 label="Status", interactive=False, show_copy_button=True
             )
+            pdf_job_state = gr.State(None)
             pdf_button.click(
-                fn=lambda pdf: interface_fn(prompt=None, pdf_file=pdf),
+                fn=pdf_interface_fn,
                 inputs=[file_input],
-                outputs=[pdf_video_output, pdf_code_output, pdf_status_output],
+                outputs=[
+                    pdf_video_output,
+                    pdf_code_output,
+                    pdf_status_output,
+                    pdf_job_state,
+                ],
+            )
+            pdf_rerender_button.click(
+                fn=rerender_code,
+                inputs=[pdf_code_output, pdf_job_state],
+                outputs=[
+                    pdf_video_output,
+                    pdf_code_output,
+                    pdf_status_output,
+                    pdf_job_state,
+                ],
             )
 
         with gr.TabItem("Sample Examples"):
@@ -201,6 +288,8 @@ with gr.Blocks(title="manimator") as demo:
 
 def main():
     """Entry point for the Manimator application."""
+    if os.getenv("METRICS_PORT"):
+        telemetry.start_http_server(int(os.getenv("METRICS_PORT")))
     demo.launch()
 
 
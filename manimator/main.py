@@ -1,13 +1,31 @@
 from fastapi import FastAPI, HTTPException, File, UploadFile
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-import re
+from starlette.background import BackgroundTask
+from contextlib import asynccontextmanager
+import os
+import time
+from typing import List, Optional
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
-from manimator.utils.schema import ManimProcessor
-from manimator.utils.helpers import download_arxiv_pdf
-from manimator.api.animation_generation import generate_animation_response
+from manimator.utils.artifacts import artifact_store
+from manimator.utils.batch import BatchManager
+from manimator.utils.code_validator import manim_names
+from manimator.utils.jobs import JobManager
+from manimator.utils.llm_cache import completion_cache
+from manimator.utils.llm_client import llm_client
+from manimator.utils.llm_router import llm_router
+from manimator.utils.render_cache import render_cache
+from manimator.utils.render_worker import warm_render_pool
+from manimator.utils.sandbox import directory_reaper, scratch_pool
+from manimator.utils.schema import QUALITY_PROFILES
+from manimator.utils.semantic_cache import semantic_cache
+from manimator.utils.streaming import stream_animation_events, format_sse
+from manimator.utils.telemetry import telemetry
+from manimator.utils.arxiv_fetcher import arxiv_fetcher
+from manimator.utils.pdf_preprocessing import pdf_prep_pool
 from manimator.api.scene_description import process_prompt_scene, process_pdf_prompt
 
 
@@ -16,9 +34,60 @@ load_dotenv()
 
 class PromptRequest(BaseModel):
     prompt: str
+    bypass_cache: bool = False
 
 
-app = FastAPI()
+class AnimationRequest(PromptRequest):
+    quality: str = "preview"
+    preview_first: bool = False
+    session: bool = False
+
+
+class RerenderRequest(BaseModel):
+    code: str
+    quality: Optional[str] = None
+
+
+class BatchItemRequest(BaseModel):
+    prompt: Optional[str] = None
+    arxiv_id: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItemRequest]
+    quality: str = "preview"
+    bypass_cache: bool = False
+
+
+def validate_quality(quality: str):
+    if quality not in QUALITY_PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown quality {quality!r}, expected one of {list(QUALITY_PROFILES)}",
+        )
+
+
+job_manager = JobManager()
+batch_manager = BatchManager(job_manager)
+telemetry.track_queue("render", lambda: job_manager.stats()["in_flight"])
+telemetry.track_queue("pdf", lambda: pdf_prep_pool.stats()["in_flight"])
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Lists Manim's names in a subprocess on a cold cache, see manim_names
+    await run_in_threadpool(manim_names)
+    yield
+    batch_manager.shutdown()
+    job_manager.shutdown()
+    warm_render_pool.close()
+    scratch_pool.close()
+    pdf_prep_pool.shutdown()
+    directory_reaper.wait()
+    await arxiv_fetcher.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,18 +97,69 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+try:
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+except ImportError:  # request spans are optional, stage spans work without them
+    pass
+else:
+    FastAPIInstrumentor.instrument_app(app)
+
 
 @app.get("/health-check")
 async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/render-cache/stats")
+async def render_cache_stats():
+    return render_cache.stats()
+
+
+@app.get("/semantic-cache/stats")
+async def semantic_cache_stats():
+    return semantic_cache.stats()
+
+
+@app.get("/llm/stats")
+async def llm_stats():
+    return {
+        "client": llm_client.stats(),
+        "router": llm_router.stats(),
+        "cache": completion_cache.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    if not telemetry.metrics_enabled:
+        raise HTTPException(
+            status_code=501, detail="Install prometheus-client to export metrics"
+        )
+    content, content_type = telemetry.latest()
+    return Response(content=content, media_type=content_type)
+
+
 @app.post("/generate-pdf-scene")
-async def generate_pdf_scene(file: UploadFile = File(...)):
+async def generate_pdf_scene(
+    file: UploadFile = File(...), bypass_cache: bool = False
+):
     try:
+        if file.size is not None and file.size > pdf_prep_pool.max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"PDF is {file.size} bytes, the limit is {pdf_prep_pool.max_bytes}",
+            )
         content = await file.read()
-        scene_description = process_pdf_prompt(content)
-        return {"scene_description": scene_description}
+        reports = []
+        scene_description = await process_pdf_prompt(
+            content, use_cache=not bypass_cache, on_prepared=reports.append
+        )
+        return {
+            "scene_description": scene_description,
+            "preprocessing": reports[-1] if reports else None,
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -47,7 +167,10 @@ async def generate_pdf_scene(file: UploadFile = File(...)):
 @app.post("/generate-prompt-scene")
 async def generate_prompt_scene(request: PromptRequest):
     try:
-        return {"scene_description": process_prompt_scene(request.prompt)}
+        scene_description = await process_prompt_scene(
+            request.prompt, use_cache=not request.bypass_cache
+        )
+        return {"scene_description": scene_description}
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error generating scene descriptions: {str(e)}"
@@ -55,44 +178,123 @@ async def generate_prompt_scene(request: PromptRequest):
 
 
 @app.get("/pdf/{arxiv_id}")
-async def process_arxiv_by_id(arxiv_id: str):
+async def process_arxiv_by_id(arxiv_id: str, bypass_cache: bool = False):
     """Process arxiv paper by ID"""
     try:
-        arxiv_url = f"https://arxiv.org/pdf/{arxiv_id}"
-        pdf_content = download_arxiv_pdf(arxiv_url)
-        scene_description = process_pdf_prompt(pdf_content)
-        return {"scene_description": scene_description}
+        pdf_content = await arxiv_fetcher.fetch(arxiv_id)
+        reports = []
+        scene_description = await process_pdf_prompt(
+            pdf_content, use_cache=not bypass_cache, on_prepared=reports.append
+        )
+        return {
+            "scene_description": scene_description,
+            "preprocessing": reports[-1] if reports else None,
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/generate-animation")
-async def generate_animation(request: PromptRequest):
-    processor = ManimProcessor()
+@app.post("/generate-animation", status_code=202)
+async def generate_animation(request: AnimationRequest):
+    """Queue an animation job and return its id immediately"""
+    validate_quality(request.quality)
+    # Runs the semantic cache lookup, which may embed with a local model
+    job = await run_in_threadpool(
+        job_manager.submit,
+        request.prompt,
+        use_cache=not request.bypass_cache,
+        quality=request.quality,
+        preview_first=request.preview_first,
+        session=request.session,
+    )
+    return job.to_dict()
 
-    try:
-        with processor.create_temp_dir() as temp_dir:
-            response = generate_animation_response(request.prompt)
-            code = processor.extract_code(response)
-            if not code:
-                raise HTTPException(
-                    status_code=400, detail="No valid Manim code generated"
-                )
-            class_match = re.search(r"class (\w+)\(Scene\)", code)
-            if not class_match:
-                raise HTTPException(
-                    status_code=400, detail="No Scene class found in code"
-                )
-            scene_name = class_match.group(1)
-            scene_file = processor.save_code(code, temp_dir)
-            video_path = processor.render_scene(scene_file, scene_name, temp_dir)
-            if not video_path:
-                raise HTTPException(
-                    status_code=500, detail="Failed to render animation"
-                )
-            return FileResponse(video_path, media_type="video/mp4")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/generate-animation/stream")
+async def generate_animation_stream(request: AnimationRequest):
+    """Stream code tokens, render progress and the final video URL as SSE"""
+    validate_quality(request.quality)
+
+    async def events():
+        async for event in stream_animation_events(
+            request.prompt,
+            job_manager,
+            use_cache=not request.bypass_cache,
+            quality=request.quality,
+            preview_first=request.preview_first,
+            session=request.session,
+        ):
+            if event["event"] == "done":
+                data = event["data"]
+                event["data"] = {
+                    "job_id": data["job_id"],
+                    "video_url": f"/jobs/{data['job_id']}/video",
+                    "quality": data["quality"],
+                    "upgrade_quality": data["upgrade_quality"],
+                    "code": data["code"],
+                    "repairs": data["repairs"],
+                }
+            yield format_sse(event)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/batch", status_code=202)
+async def create_batch(request: BatchRequest):
+    """Queue a batch of prompts and arXiv papers and return its manifest"""
+    validate_quality(request.quality)
+    batch = batch_manager.submit(
+        [item.model_dump() for item in request.items],
+        quality=request.quality,
+        use_cache=not request.bypass_cache,
+    )
+    return batch.to_dict()
+
+
+@app.get("/batch/{batch_id}")
+async def get_batch(batch_id: str):
+    return batch_manager.get(batch_id).to_dict()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return job_manager.get(job_id).to_dict()
+
+
+@app.post("/jobs/{job_id}/rerender", status_code=202)
+async def rerender_job(job_id: str, request: RerenderRequest):
+    """Re-render edited code of a job, reusing its unchanged animations"""
+    if request.quality is not None:
+        validate_quality(request.quality)
+    job = await run_in_threadpool(
+        job_manager.rerender, job_id, request.code, quality=request.quality
+    )
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}/video")
+async def get_job_video(job_id: str):
+    job = job_manager.get(job_id)
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    if not os.path.exists(job.video_path):
+        raise HTTPException(status_code=410, detail="Video has been evicted")
+    start = time.perf_counter()
+
+    def after_sending():
+        telemetry.observe("video_delivery", time.perf_counter() - start, quality=job.quality)
+        artifact_store.enforce_limit()
+
+    # Served straight from disk with range support; eviction runs after sending
+    return FileResponse(
+        job.video_path,
+        media_type="video/mp4",
+        background=BackgroundTask(after_sending),
+    )
 
 
 def main():
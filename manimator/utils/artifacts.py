@@ -0,0 +1,103 @@
+import errno
+import os
+import shutil
+import tempfile
+import uuid
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ArtifactStore:
+    """Managed directory of finished videos served to clients.
+
+    Rendered videos are moved (or hardlinked, for render cache hits) into the
+    store instead of being copied, so delivering a video never holds it in
+    memory. Total size is capped; the oldest artifacts are evicted first.
+
+    Args:
+        root: Directory holding artifacts. Defaults to env ARTIFACT_DIR or a
+            ``manimator/artifacts`` folder in the system temp dir
+        max_bytes: Disk usage cap. Defaults to env ARTIFACT_MAX_BYTES or 4 GiB
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root or os.getenv(
+            "ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "manimator", "artifacts")
+        )
+        self.max_bytes = (
+            max_bytes
+            if max_bytes is not None
+            else int(os.getenv("ARTIFACT_MAX_BYTES", str(4 * 1024**3)))
+        )
+
+    def _new_path(self, suffix: str) -> str:
+        os.makedirs(self.root, exist_ok=True)
+        return os.path.join(self.root, f"{uuid.uuid4().hex}{suffix}")
+
+    def store(self, path: str) -> str:
+        """Moves a file into the store.
+
+        Args:
+            path (str): File to move, e.g. a video inside a render temp dir
+
+        Returns:
+            str: Path of the artifact
+        """
+
+        target = self._new_path(os.path.splitext(path)[1])
+        try:
+            os.replace(path, target)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            shutil.move(path, target)
+        return target
+
+    def link(self, path: str) -> str:
+        """Adds a file that must stay in place, e.g. a render cache entry.
+
+        The artifact is a hardlink where possible and a copy otherwise.
+
+        Args:
+            path (str): File to link into the store
+
+        Returns:
+            str: Path of the artifact
+        """
+
+        target = self._new_path(os.path.splitext(path)[1])
+        try:
+            os.link(path, target)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+            shutil.copyfile(path, target)
+        return target
+
+    def enforce_limit(self):
+        """Evicts the oldest artifacts until usage is within ``max_bytes``."""
+
+        entries = []
+        try:
+            for entry in os.scandir(self.root):
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        except FileNotFoundError:
+            return
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+artifact_store = ArtifactStore()
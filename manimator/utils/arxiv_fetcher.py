@@ -0,0 +1,186 @@
+import os
+import re
+import tempfile
+import time
+from typing import Optional
+import httpx
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from tenacity import (
+    AsyncRetrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential,
+)
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# New-style (2312.12345) and old-style (math.GT/0309136) ids, optionally versioned
+ARXIV_ID_PATTERN = re.compile(
+    r"^(?P<id>\d{4}\.\d{4,5}|[a-z\-]+(?:\.[A-Z]{2})?/\d{7})(?P<version>v\d+)?$"
+)
+
+
+class _RetryableStatus(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"arXiv responded with status {status_code}")
+        self.status_code = status_code
+
+
+def _is_retryable(error: BaseException) -> bool:
+    return isinstance(error, (httpx.TransportError, _RetryableStatus))
+
+
+class ArxivFetcher:
+    """Downloads arXiv PDFs without blocking the event loop.
+
+    Requests share one pooled ``httpx.AsyncClient``, are bounded by a timeout
+    and a maximum size, and transient failures (network errors, 429 and 5xx
+    responses) are retried with exponential backoff. Downloaded PDFs are kept
+    on disk keyed by arXiv id and version, so repeated papers are served
+    locally. Unversioned ids resolve to the latest version upstream, so their
+    cache entries expire after ``latest_ttl`` seconds.
+
+    Args:
+        base_url: URL prefix PDFs are fetched from. Defaults to env
+            ARXIV_BASE_URL or https://arxiv.org/pdf
+        cache_dir: Directory of cached PDFs. Defaults to env ARXIV_CACHE_DIR
+            or a ``manimator/arxiv`` folder in the system temp dir
+        timeout: Per-request timeout in seconds. Defaults to env
+            ARXIV_TIMEOUT or 30
+        max_bytes: Largest accepted PDF. Defaults to env ARXIV_MAX_BYTES or
+            50 MiB
+        retries: Attempts per download. Defaults to env ARXIV_RETRIES or 3
+        latest_ttl: Lifetime of cached unversioned downloads. Defaults to
+            env ARXIV_LATEST_TTL or 1 day
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        retries: Optional[int] = None,
+        latest_ttl: Optional[float] = None,
+    ):
+        self.base_url = (
+            base_url or os.getenv("ARXIV_BASE_URL", "https://arxiv.org/pdf")
+        ).rstrip("/")
+        self.cache_dir = cache_dir or os.getenv(
+            "ARXIV_CACHE_DIR", os.path.join(tempfile.gettempdir(), "manimator", "arxiv")
+        )
+        self.timeout = timeout or float(os.getenv("ARXIV_TIMEOUT", "30"))
+        self.max_bytes = max_bytes or int(
+            os.getenv("ARXIV_MAX_BYTES", str(50 * 1024**2))
+        )
+        self.retries = retries or int(os.getenv("ARXIV_RETRIES", "3"))
+        self.latest_ttl = (
+            latest_ttl
+            if latest_ttl is not None
+            else float(os.getenv("ARXIV_LATEST_TTL", "86400"))
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            )
+        return self._client
+
+    def _cache_path(self, paper_id: str, version: Optional[str]) -> str:
+        return os.path.join(
+            self.cache_dir, paper_id.replace("/", "_"), f"{version or 'latest'}.pdf"
+        )
+
+    def _read_cache(self, path: str, versioned: bool) -> Optional[bytes]:
+        try:
+            if not versioned and time.time() - os.path.getmtime(path) > self.latest_ttl:
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_cache(self, path: str, content: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    async def _download(self, url: str) -> bytes:
+        async with self.client.stream("GET", url) as response:
+            if response.status_code == 429 or response.status_code >= 500:
+                raise _RetryableStatus(response.status_code)
+            if response.status_code == 404:
+                raise HTTPException(status_code=404, detail="arXiv paper not found")
+            response.raise_for_status()
+
+            declared = int(response.headers.get("content-length") or 0)
+            if declared > self.max_bytes:
+                raise HTTPException(status_code=413, detail="arXiv PDF is too large")
+            chunks = []
+            size = 0
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise HTTPException(status_code=413, detail="arXiv PDF is too large")
+                chunks.append(chunk)
+            return b"".join(chunks)
+
+    async def fetch(self, arxiv_id: str) -> bytes:
+        """Returns the PDF for an arXiv id, from the local cache when possible.
+
+        Args:
+            arxiv_id (str): arXiv identifier, optionally with a version suffix
+
+        Returns:
+            bytes: Raw PDF content
+
+        Raises:
+            HTTPException: 400 for malformed ids, 404 for unknown papers, 413
+                for oversized PDFs and 502 if arXiv keeps failing
+        """
+
+        match = ARXIV_ID_PATTERN.match(arxiv_id)
+        if not match:
+            raise HTTPException(status_code=400, detail=f"Invalid arXiv id: {arxiv_id}")
+        paper_id, version = match.group("id"), match.group("version")
+
+        cache_path = self._cache_path(paper_id, version)
+        cached = await run_in_threadpool(
+            self._read_cache, cache_path, versioned=version is not None
+        )
+        if cached is not None:
+            return cached
+
+        try:
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(self.retries),
+                wait=wait_exponential(multiplier=0.5, max=8),
+                retry=retry_if_exception(_is_retryable),
+                reraise=True,
+            ):
+                with attempt:
+                    content = await self._download(f"{self.base_url}/{arxiv_id}")
+        except (httpx.HTTPError, _RetryableStatus) as e:
+            raise HTTPException(
+                status_code=502, detail=f"Failed to download arxiv PDF: {str(e)}"
+            )
+
+        await run_in_threadpool(self._write_cache, cache_path, content)
+        return content
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+arxiv_fetcher = ArxivFetcher()
@@ -0,0 +1,269 @@
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Dict, List, Optional
+from fastapi import HTTPException
+from dotenv import load_dotenv
+
+from manimator.api.animation_generation import generate_animation_response
+from manimator.api.scene_description import process_pdf_prompt, process_prompt_scene
+from manimator.utils.arxiv_fetcher import arxiv_fetcher
+from manimator.utils.jobs import JobManager, extract_code
+
+load_dotenv()
+
+
+@dataclass
+class BatchItem:
+    """One prompt or paper of a batch and its progress."""
+
+    index: int
+    prompt: Optional[str] = None
+    arxiv_id: Optional[str] = None
+    status: str = "pending"
+    job_id: Optional[str] = None
+    error: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return {
+            "index": self.index,
+            "prompt": self.prompt,
+            "arxiv_id": self.arxiv_id,
+            "status": self.status,
+            "job_id": self.job_id,
+            "video_url": (
+                f"/jobs/{self.job_id}/video" if self.status == "completed" else None
+            ),
+            "error": self.error,
+            "timings": self.timings,
+        }
+
+
+@dataclass
+class Batch:
+    """State of a batch as reported by the batch API."""
+
+    id: str
+    items: List[BatchItem]
+    quality: str = "preview"
+    use_cache: bool = True
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    tasks: List[asyncio.Task] = field(default_factory=list, repr=False)
+
+    @property
+    def status(self) -> str:
+        statuses = {item.status for item in self.items}
+        if statuses - {"completed", "failed"}:
+            return "running"
+        if statuses == {"completed"}:
+            return "completed"
+        if statuses == {"failed"}:
+            return "failed"
+        return "partial"
+
+    def to_dict(self) -> dict:
+        counts: Dict[str, int] = {}
+        for item in self.items:
+            counts[item.status] = counts.get(item.status, 0) + 1
+        return {
+            "batch_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "quality": self.quality,
+            "counts": counts,
+            "items": [item.to_dict() for item in self.items],
+        }
+
+
+class BatchManager:
+    """Runs batches of prompts and arXiv papers through the full pipeline.
+
+    Scene description and code generation calls of all items run
+    concurrently on the event loop, limited per model by the shared
+    :class:`manimator.utils.llm_client.LLMClient`.
+    Renders are queued on the shared :class:`JobManager`, so batch throughput
+    scales with RENDER_WORKERS; when its queue is full, items wait for a free
+    slot instead of failing. Finished batches are forgotten once they are
+    older than ``batch_ttl`` or more than ``max_finished`` have piled up.
+
+    Args:
+        job_manager: Render pool the batch renders are queued on
+        max_items: Largest accepted batch. Defaults to env BATCH_MAX_ITEMS or
+            100
+        batch_ttl: Seconds a finished batch stays queryable. Defaults to env
+            BATCH_TTL or 86400
+        max_finished: Finished batches kept at most. Defaults to env
+            BATCH_MAX_FINISHED or 100
+    """
+
+    def __init__(
+        self,
+        job_manager: JobManager,
+        max_items: Optional[int] = None,
+        batch_ttl: Optional[float] = None,
+        max_finished: Optional[int] = None,
+    ):
+        self.job_manager = job_manager
+        self.max_items = max_items or int(os.getenv("BATCH_MAX_ITEMS", "100"))
+        self.batch_ttl = (
+            batch_ttl
+            if batch_ttl is not None
+            else float(os.getenv("BATCH_TTL", "86400"))
+        )
+        self.max_finished = (
+            max_finished
+            if max_finished is not None
+            else int(os.getenv("BATCH_MAX_FINISHED", "100"))
+        )
+        self.batches: Dict[str, Batch] = {}
+
+    def submit(
+        self, items: List[dict], quality: str = "preview", use_cache: bool = True
+    ) -> Batch:
+        """Starts processing a batch in the background.
+
+        Must be called from the event loop.
+
+        Args:
+            items (List[dict]): Items with either a ``prompt`` or an
+                ``arxiv_id``
+            quality (str): Render quality profile for every item
+            use_cache (bool): Whether cached LLM responses may be reused
+
+        Returns:
+            Batch: The newly created batch
+
+        Raises:
+            HTTPException: 400 if the batch is empty, too large or an item has
+                neither or both of ``prompt`` and ``arxiv_id``
+        """
+
+        if not items:
+            raise HTTPException(status_code=400, detail="Batch has no items")
+        if len(items) > self.max_items:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Batch has {len(items)} items, the limit is {self.max_items}",
+            )
+        batch_items = []
+        for index, item in enumerate(items):
+            if bool(item.get("prompt")) == bool(item.get("arxiv_id")):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Item {index} needs exactly one of prompt or arxiv_id",
+                )
+            batch_items.append(
+                BatchItem(index, prompt=item.get("prompt"), arxiv_id=item.get("arxiv_id"))
+            )
+
+        batch = Batch(
+            id=uuid.uuid4().hex, items=batch_items, quality=quality, use_cache=use_cache
+        )
+        self._prune()
+        self.batches[batch.id] = batch
+        item_tasks = [
+            asyncio.create_task(self._run_item(batch, item)) for item in batch.items
+        ]
+        batch.tasks = item_tasks + [asyncio.create_task(self._finish(batch, item_tasks))]
+        return batch
+
+    def get(self, batch_id: str) -> Batch:
+        """Looks up a batch by id.
+
+        Raises:
+            HTTPException: 404 if the batch does not exist
+        """
+
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            raise HTTPException(status_code=404, detail=f"Batch {batch_id} not found")
+        return batch
+
+    def _prune(self):
+        """Forgets finished batches past ``batch_ttl`` and the oldest beyond
+        ``max_finished``."""
+
+        finished = sorted(
+            (
+                batch
+                for batch in self.batches.values()
+                if batch.finished_at is not None
+            ),
+            key=lambda batch: batch.finished_at,
+        )
+        cutoff = time.time() - self.batch_ttl
+        excess = len(finished) - self.max_finished
+        for index, batch in enumerate(finished):
+            if index >= excess and batch.finished_at > cutoff:
+                break
+            del self.batches[batch.id]
+
+    def shutdown(self):
+        for batch in self.batches.values():
+            for task in batch.tasks:
+                task.cancel()
+
+    async def _finish(self, batch: Batch, item_tasks: List[asyncio.Task]):
+        await asyncio.gather(*item_tasks, return_exceptions=True)
+        batch.finished_at = time.time()
+
+    async def _timed(self, item: BatchItem, stage: str, coro: Awaitable):
+        item.status = stage
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            item.timings[stage] = round(time.perf_counter() - start, 3)
+
+    async def _describe(self, batch: Batch, item: BatchItem) -> str:
+        if item.prompt:
+            return await process_prompt_scene(item.prompt, use_cache=batch.use_cache)
+        content = await arxiv_fetcher.fetch(item.arxiv_id)
+        return await process_pdf_prompt(content, use_cache=batch.use_cache)
+
+    async def _queue_render(
+        self, item: BatchItem, description: str, code: str, quality: str
+    ):
+        while True:
+            try:
+                # Indexed by the item's prompt; papers have none to match
+                return self.job_manager.submit_render(
+                    item.prompt, code, None, quality=quality, description=description
+                )
+            except HTTPException as e:
+                if e.status_code != 503:
+                    raise
+            await asyncio.sleep(1)
+
+    async def _run_item(self, batch: Batch, item: BatchItem):
+        try:
+            description = await self._timed(
+                item, "describing", self._describe(batch, item)
+            )
+            response = await self._timed(
+                item,
+                "generating",
+                generate_animation_response(description, use_cache=batch.use_cache),
+            )
+            code = extract_code(response)
+
+            item.status = "rendering"
+            start = time.perf_counter()
+            job = await self._queue_render(item, description, code, batch.quality)
+            item.job_id = job.id
+            while job.status == "pending":
+                await asyncio.sleep(0.5)
+            item.timings["rendering"] = round(time.perf_counter() - start, 3)
+            if job.status == "completed":
+                item.status = "completed"
+            else:
+                item.status, item.error = "failed", job.error
+        except HTTPException as e:
+            item.status, item.error = "failed", str(e.detail)
+        except Exception as e:
+            item.status, item.error = "failed", str(e)
@@ -0,0 +1,281 @@
+import ast
+import builtins
+import functools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from importlib import metadata, util
+from typing import FrozenSet, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Scene base classes exported by Manim
+MANIM_SCENE_CLASSES = frozenset(
+    {
+        "Scene",
+        "MovingCameraScene",
+        "ThreeDScene",
+        "SpecialThreeDScene",
+        "ZoomedScene",
+        "VectorScene",
+        "LinearTransformationScene",
+    }
+)
+
+# Top-level modules generated scenes may import
+ALLOWED_IMPORTS = frozenset(
+    {
+        "manim",
+        "numpy",
+        "math",
+        "cmath",
+        "random",
+        "itertools",
+        "functools",
+        "operator",
+        "collections",
+        "dataclasses",
+        "enum",
+        "typing",
+        "string",
+        "copy",
+        "fractions",
+        "decimal",
+        "statistics",
+        "colour",
+        "scipy",
+    }
+)
+
+# Builtins a scene has no business calling while it is rendered
+DISALLOWED_CALLS = frozenset(
+    {"eval", "exec", "compile", "__import__", "open", "input", "breakpoint"}
+)
+
+
+class CodeValidationError(ValueError):
+    """Raised when generated scene code fails static validation.
+
+    Attributes:
+        errors: One human readable message per problem found
+    """
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def _allowed_imports() -> FrozenSet[str]:
+    extra = os.getenv("CODE_ALLOWED_IMPORTS", "")
+    return ALLOWED_IMPORTS | {name.strip() for name in extra.split(",") if name.strip()}
+
+
+@functools.lru_cache(maxsize=None)
+def manim_names() -> Optional[FrozenSet[str]]:
+    """Returns the names exported by ``from manim import *``.
+
+    Manim is imported once in a separate interpreter, so this process never
+    pays for the import; the result is cached on disk per Manim version.
+
+    Returns:
+        Optional[FrozenSet[str]]: The exported names, or None if Manim is not
+            installed or cannot be imported
+    """
+
+    if util.find_spec("manim") is None:
+        return None
+    try:
+        version = metadata.version("manim")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    cache_path = os.path.join(
+        tempfile.gettempdir(), "manimator", f"manim_names-{version}.json"
+    )
+    try:
+        with open(cache_path) as f:
+            return frozenset(json.load(f))
+    except (OSError, ValueError):
+        pass
+
+    script = (
+        "import json, manim\n"
+        "names = getattr(manim, '__all__', None) or "
+        "[n for n in dir(manim) if not n.startswith('_')]\n"
+        "print(json.dumps(sorted(names)))"
+    )
+    try:
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            check=True,
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+        names = json.loads(result.stdout.strip().splitlines()[-1])
+    except (subprocess.SubprocessError, ValueError, IndexError) as e:
+        print(f"Could not list Manim names, skipping name checks: {e}")
+        return None
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(names, f)
+    os.replace(tmp_path, cache_path)
+    return frozenset(names)
+
+
+def _base_name(node: ast.expr) -> Optional[str]:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def _scene_classes(tree: ast.Module) -> List[str]:
+    """Returns classes deriving from a Manim scene, directly or indirectly."""
+
+    classes = [node for node in tree.body if isinstance(node, ast.ClassDef)]
+    scenes = set()
+    changed = True
+    while changed:
+        changed = False
+        for node in classes:
+            if node.name in scenes:
+                continue
+            bases = {_base_name(base) for base in node.bases}
+            if bases & (MANIM_SCENE_CLASSES | scenes):
+                scenes.add(node.name)
+                changed = True
+    # Classes other scenes build on are helpers, not the scene to render
+    used_as_base = {
+        _base_name(base) for node in classes if node.name in scenes for base in node.bases
+    }
+    ordered = [node.name for node in classes if node.name in scenes]
+    concrete = [name for name in ordered if name not in used_as_base]
+    return concrete or ordered
+
+
+def _check_imports(tree: ast.Module, errors: List[str]) -> List[str]:
+    """Records disallowed imports and returns the modules star-imported."""
+
+    allowed = _allowed_imports()
+    star_imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                errors.append(f"line {node.lineno}: relative imports are not allowed")
+                continue
+            modules = [node.module or ""]
+            if any(alias.name == "*" for alias in node.names):
+                star_imports.append(node.module or "")
+        else:
+            continue
+        for module in modules:
+            if module.split(".")[0] not in allowed:
+                errors.append(f"line {node.lineno}: import of {module!r} is not allowed")
+    return star_imports
+
+
+def _check_calls(tree: ast.Module, errors: List[str]):
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Call)
+            and isinstance(node.func, ast.Name)
+            and node.func.id in DISALLOWED_CALLS
+        ):
+            errors.append(f"line {node.lineno}: call to {node.func.id}() is not allowed")
+
+
+def _bound_names(tree: ast.Module) -> set:
+    """Names assigned anywhere in the module, in any scope."""
+
+    bound = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            bound.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                bound.add((alias.asname or alias.name).split(".")[0])
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            bound.update(node.names)
+        elif isinstance(node, ast.MatchAs) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, ast.MatchStar) and node.name:
+            bound.add(node.name)
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            bound.add(node.rest)
+    return bound
+
+
+def _check_names(tree: ast.Module, star_imports: List[str], errors: List[str]):
+    if any(module != "manim" for module in star_imports):
+        return  # names from other star imports cannot be resolved statically
+    known = _bound_names(tree) | set(dir(builtins))
+    if "manim" in star_imports:
+        exported = manim_names()
+        if exported is None:
+            return
+        known |= exported
+
+    reported = set()
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Name)
+            and isinstance(node.ctx, ast.Load)
+            and node.id not in known
+            and node.id not in reported
+        ):
+            reported.add(node.id)
+            errors.append(f"line {node.lineno}: name {node.id!r} is not defined")
+
+
+def validate_scene_code(code: str) -> str:
+    """Statically validates generated Manim code before it is rendered.
+
+    Checks, without executing anything, that the code parses, defines a
+    scene deriving from one of Manim's scene classes (``Scene``,
+    ``MovingCameraScene``, ``ThreeDScene``, ...), only imports allowed modules
+    (see ALLOWED_IMPORTS and env CODE_ALLOWED_IMPORTS), does not call
+    builtins such as ``exec`` or ``open``, and only uses names that are
+    defined in the code or exported by the installed Manim.
+
+    Args:
+        code (str): Manim scene code
+
+    Returns:
+        str: Name of the scene class to render. When several scenes are
+            defined, the first one no other scene inherits from
+
+    Raises:
+        CodeValidationError: With every problem found
+    """
+
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        raise CodeValidationError([f"line {e.lineno}: syntax error: {e.msg}"])
+
+    errors: List[str] = []
+    star_imports = _check_imports(tree, errors)
+    # ManimProcessor.save_code prepends "from manim import *" to every scene
+    star_imports.append("manim")
+    _check_calls(tree, errors)
+    _check_names(tree, star_imports, errors)
+    scenes = _scene_classes(tree)
+    if not scenes:
+        errors.append("no class deriving from a Manim Scene found")
+    if errors:
+        raise CodeValidationError(errors)
+    return scenes[0]
@@ -2,7 +2,6 @@ from fastapi import HTTPException
 from PyPDF2 import PdfReader, PdfWriter
 from io import BytesIO
 import base64
-import requests
 from importlib import resources
 from pathlib import Path
 from typing import Optional
@@ -36,55 +35,29 @@ def read_base64_few_shot_file(filename: str = "few_shot_1.pdf") -> str:
         return None
 
 
-def download_arxiv_pdf(url: str) -> bytes:
-    """Downloads a PDF from an arXiv URL.
+def shrink_pdf(content: bytes) -> bytes:
+    """Rewrites a PDF with compressed content streams, keeping the smaller result.
 
     Args:
-        url (str): The arXiv URL to download the PDF from
+        content (bytes): Raw PDF content
 
     Returns:
-        bytes: Raw PDF content
-
-    Raises:
-        HTTPException: If download fails or URL is invalid
-    """
-
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.content
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, detail=f"Failed to download arxiv PDF: {str(e)}"
-        )
-
-
-def compress_pdf(content: bytes, compression_level: int = 5) -> str:
-    """Compresses a PDF and converts it to base64 encoded string.
-
-    Args:
-        content (bytes): Raw PDF content to compress
-        compression_level (int): PDF compression level (1-9). Defaults to 5
-
-    Returns:
-        str: Base64 encoded compressed PDF content
-
-    Note:
-        Falls back to uncompressed base64 encoding if compression fails
+        bytes: The rewritten PDF if it is smaller than ``content``, otherwise
+            ``content`` unchanged
     """
 
     try:
         reader = PdfReader(BytesIO(content))
-        output = BytesIO()
-        writer = PdfWriter(output)
-
+        writer = PdfWriter()
         for page in reader.pages:
             writer.add_page(page)
+        for page in writer.pages:
+            page.compress_content_streams()
 
-        writer.set_compression(compression_level)
+        output = BytesIO()
         writer.write(output)
-
         compressed_bytes = output.getvalue()
-        return base64.b64encode(compressed_bytes).decode("utf-8")
     except Exception as e:
-        return base64.b64encode(content).decode("utf-8")
+        print(f"PDF compression failed, sending it uncompressed: {e}")
+        return content
+    return compressed_bytes if len(compressed_bytes) < len(content) else content
@@ -0,0 +1,850 @@
+import asyncio
+import functools
+import multiprocessing.util
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import Manager
+from typing import Callable, Dict, List, Optional, Tuple
+import litellm
+from fastapi import HTTPException
+
+from manimator.api.animation_generation import generate_animation_response
+from manimator.api.code_repair import repair_animation_code, trim_traceback
+from manimator.utils.artifacts import artifact_store
+from manimator.utils.code_validator import CodeValidationError, validate_scene_code
+from manimator.utils.llm_client import adopt_shared_limits, llm_client
+from manimator.utils.llm_router import llm_router
+from manimator.utils.render_worker import warm_render_pool
+from manimator.utils.sandbox import (
+    LIMIT_MESSAGE_PREFIX,
+    directory_reaper,
+    directory_usage,
+    scratch_pool,
+)
+from manimator.utils.schema import ManimProcessor
+from manimator.utils.semantic_cache import semantic_cache
+from manimator.utils.telemetry import telemetry
+
+RENDER_ERROR_PREFIX = "Render error: "
+
+
+class JobError(Exception):
+    """Picklable stand-in for HTTPException raised inside a worker process."""
+
+    def __init__(self, status_code: int, detail: str, repairs: Optional[list] = None):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.repairs = repairs or []
+        self.telemetry: list = []
+
+
+def _collecting_telemetry(fn: Callable) -> Callable:
+    """Sends the telemetry a worker function records back with its outcome.
+
+    The events end up in the result's ``telemetry`` key or the raised
+    :class:`JobError`'s ``telemetry`` attribute, and are replayed by
+    :class:`JobManager` in the server process.
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with telemetry.collected() as events:
+            try:
+                result = fn(*args, **kwargs)
+            except JobError as e:
+                e.telemetry = events
+                raise
+        return {**result, "telemetry": events}
+
+    return wrapper
+
+
+# Event loop of this worker process, see _run_async
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _init_worker(shared_limits: dict):
+    """Prepares a render worker process before it takes its first job.
+
+    Workers generate and repair code, so they share the server's LLM limits
+    and get the event loop their LLM calls run on. Their scratch directories
+    are created up front so the first render does not wait for them, and
+    :func:`_close_worker` runs when the worker exits.
+    """
+
+    global _worker_loop
+    adopt_shared_limits(shared_limits)
+    # Forked workers inherit LiteLLM clients bound to the server's event loop
+    litellm.in_memory_llm_clients_cache.flush_cache()
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    scratch_pool.prepare()
+    # atexit handlers do not run in pool workers, multiprocessing finalizers do
+    multiprocessing.util.Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker():
+    """Releases what a render worker process holds when it exits.
+
+    Stops its warm Manim workers and removes its idle scratch directories,
+    waiting for the trees it queued for deletion; the reaper's thread would
+    otherwise die with the process and leave them to the next orphan sweep.
+    """
+
+    warm_render_pool.close()
+    scratch_pool.close()
+    directory_reaper.wait()
+
+
+def _run_async(coro):
+    """Runs a coroutine to completion on the worker's event loop.
+
+    LiteLLM caches its async HTTP clients, which stay bound to the loop they
+    were created on, so a worker runs every job's LLM calls on one loop
+    instead of a new ``asyncio.run`` loop per call.
+    """
+
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop.run_until_complete(coro)
+
+
+@_collecting_telemetry
+def run_animation_job(
+    prompt: str,
+    use_cache: bool = True,
+    quality: str = "preview",
+    session_id: Optional[str] = None,
+) -> dict:
+    """Generates and renders an animation inside a render worker process.
+
+    Code that fails validation or rendering is sent back to the code model
+    for repair, see :func:`render_with_repair`.
+
+    Args:
+        prompt (str): Text description of the desired animation
+        use_cache (bool): Whether cached LLM responses may be reused
+        quality (str): Render quality profile
+        session_id (Optional[str]): Render session whose media directory is
+            reused, see :meth:`ManimProcessor.session_dir`
+
+    Returns:
+        dict: ``video_path``, ``code``, ``scene_name``, ``quality``,
+            ``workspace`` and ``repairs``
+
+    Raises:
+        JobError: If code generation or rendering fails
+    """
+
+    try:
+        response = _run_async(generate_animation_response(prompt, use_cache=use_cache))
+    except HTTPException as e:
+        raise JobError(e.status_code, e.detail)
+    return render_with_repair(
+        extract_code(response), prompt, quality, session_id=session_id
+    )
+
+
+@_collecting_telemetry
+def run_render_job(
+    code: str,
+    scene_name: Optional[str],
+    progress_queue=None,
+    quality: str = "preview",
+    description: Optional[str] = None,
+    session_id: Optional[str] = None,
+) -> dict:
+    """Renders already generated scene code inside a render worker process.
+
+    Args:
+        code (str): Manim scene code
+        scene_name (Optional[str]): Name of the scene class to render, found
+            by validating the code when None
+        progress_queue: Optional queue receiving render progress events and
+            ``{"repair": record}`` events for repair attempts
+        quality (str): Render quality profile
+        description (Optional[str]): Scene description the code was generated
+            from. When given, failing code is repaired instead of failing
+            the job
+        session_id (Optional[str]): Render session whose media directory is
+            reused, so unchanged animations are not rendered again
+
+    Returns:
+        dict: ``video_path``, ``code``, ``scene_name``, ``quality``,
+            ``workspace`` and ``repairs``
+
+    Raises:
+        JobError: If rendering fails
+    """
+
+    on_progress = progress_queue.put if progress_queue is not None else None
+    if description is not None:
+        return render_with_repair(
+            code, description, quality, on_progress, session_id=session_id
+        )
+    try:
+        if scene_name is None:
+            scene_name = _validated_scene_name(code)
+        result = _render(code, scene_name, quality, on_progress, session_id)
+        return {**result, "repairs": []}
+    except HTTPException as e:
+        raise JobError(e.status_code, e.detail)
+
+
+def render_with_repair(
+    code: str,
+    description: str,
+    quality: str = "preview",
+    on_progress: Optional[Callable[[dict], None]] = None,
+    max_attempts: Optional[int] = None,
+    time_budget: Optional[float] = None,
+    session_id: Optional[str] = None,
+) -> dict:
+    """Validates and renders scene code, repairing it when it fails.
+
+    Instead of regenerating the scene from scratch, the failing code and the
+    trimmed validation errors or Manim traceback are sent back to the code
+    model for a minimal fix. Every attempt is recorded with its token usage,
+    cost and outcome so repair success can be compared with regeneration.
+
+    Args:
+        code (str): Manim scene code
+        description (str): Scene description the code was generated from
+        quality (str): Render quality profile
+        on_progress (Optional[Callable[[dict], None]]): Receives render
+            progress events and ``{"repair": record}`` after each repair
+        max_attempts (Optional[int]): Maximum repairs. Defaults to env
+            REPAIR_MAX_ATTEMPTS or 2
+        time_budget (Optional[float]): Seconds after which no new repair is
+            started. Defaults to env REPAIR_TIME_BUDGET or 300
+        session_id (Optional[str]): Render session whose media directory is
+            reused across attempts
+
+    Returns:
+        dict: ``video_path``, ``code``, ``scene_name``, ``quality``,
+            ``workspace`` (files and bytes the render wrote) and
+            ``repairs``, the list of repair records
+
+    Raises:
+        JobError: If the code still fails once attempts or time run out,
+            carrying the repair records
+    """
+
+    if max_attempts is None:
+        max_attempts = int(os.getenv("REPAIR_MAX_ATTEMPTS", "2"))
+    if time_budget is None:
+        time_budget = float(os.getenv("REPAIR_TIME_BUDGET", "300"))
+    deadline = time.monotonic() + time_budget
+    repairs: List[dict] = []
+
+    while True:
+        try:
+            scene_name = _validated_scene_name(code)
+            result = _render(code, scene_name, quality, on_progress, session_id)
+        except HTTPException as e:
+            if repairs:
+                repairs[-1]["outcome"] = "failed"
+            if e.status_code == 400:
+                stage, error = "validate", e.detail
+            elif e.detail.startswith(RENDER_ERROR_PREFIX):
+                stage = "render"
+                error = trim_traceback(e.detail[len(RENDER_ERROR_PREFIX) :])
+            else:
+                raise JobError(e.status_code, e.detail, repairs)
+            if len(repairs) >= max_attempts or time.monotonic() >= deadline:
+                raise JobError(e.status_code, e.detail, repairs)
+        else:
+            if repairs:
+                repairs[-1]["outcome"] = "fixed"
+            return {**result, "repairs": repairs}
+
+        record = {"attempt": len(repairs) + 1, "stage": stage, "error": error}
+        try:
+            response, usage = _run_async(
+                repair_animation_code(description, code, error)
+            )
+        except Exception as e:
+            record.update(outcome="failed", repair_error=str(e))
+            repairs.append(record)
+            raise JobError(500, f"Failed to repair animation code: {e}", repairs)
+        record.update(usage)
+        repairs.append(record)
+        if on_progress is not None:
+            on_progress({"repair": record})
+        try:
+            code = extract_code(response)
+        except HTTPException as e:
+            record["outcome"] = "failed"
+            raise JobError(e.status_code, e.detail, repairs)
+
+
+def extract_code(response: str) -> str:
+    """Extracts the scene code from a model response.
+
+    Raises:
+        HTTPException: 400 if the response contains no python code block
+    """
+
+    with telemetry.span("code_extraction"):
+        code = ManimProcessor().extract_code(response)
+    if not code:
+        raise HTTPException(status_code=400, detail="No valid Manim code generated")
+    return code
+
+
+def _validated_scene_name(code: str) -> str:
+    try:
+        with telemetry.span("code_validation"):
+            return validate_scene_code(code)
+    except CodeValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid Manim code: {e}")
+
+
+def _render(
+    code: str,
+    scene_name: str,
+    quality: str,
+    on_progress: Optional[Callable[[dict], None]] = None,
+    session_id: Optional[str] = None,
+) -> dict:
+    processor = ManimProcessor()
+    if session_id:
+        work_dir = processor.session_dir(session_id)
+    else:
+        work_dir = processor.create_temp_dir()
+    with work_dir as temp_dir:
+        started = time.time()
+        scene_file = processor.save_code(code, temp_dir)
+        with telemetry.span("render", quality=quality):
+            video_path = processor.render_scene(
+                scene_file,
+                scene_name,
+                temp_dir,
+                on_progress=on_progress,
+                quality=quality,
+                incremental=bool(session_id),
+            )
+        # Session directories hold earlier renders, only count this one's files
+        files, size = directory_usage(temp_dir, since=started if session_id else None)
+        telemetry.count_workspace(files, size)
+        if not video_path:
+            raise HTTPException(status_code=500, detail="Failed to render animation")
+        return {
+            "video_path": video_path,
+            "code": code,
+            "scene_name": scene_name,
+            "quality": quality,
+            "workspace": {"files": files, "bytes": size},
+        }
+
+
+@dataclass
+class Job:
+    """State of a single animation job as reported by the jobs API."""
+
+    id: str
+    # None for jobs not generated from a user prompt, e.g. arXiv papers;
+    # only prompted jobs are indexed by the semantic cache
+    prompt: Optional[str]
+    status: str = "pending"
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    video_path: Optional[str] = None
+    error: Optional[str] = None
+    quality: Optional[str] = None
+    code: Optional[str] = None
+    scene_name: Optional[str] = None
+    # Set for "preview first" jobs: the quality the preview is upgraded to
+    upgrade_quality: Optional[str] = None
+    upgrade_status: Optional[str] = None
+    upgrade_error: Optional[str] = None
+    # Code repair attempts made by render_with_repair
+    repairs: List[dict] = field(default_factory=list)
+    # Renders sharing a session reuse its media directory, see
+    # JobManager.rerender; None renders in a throwaway scratch directory
+    session_id: Optional[str] = None
+    # Job whose code this job re-renders
+    parent_id: Optional[str] = None
+    # Files and bytes the last render wrote to its working directory
+    workspace: Optional[dict] = None
+    # Earlier job with a near-duplicate prompt, see JobManager.match_prompt
+    semantic_match: Optional[dict] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "quality": self.quality,
+            "upgrade_quality": self.upgrade_quality,
+            "upgrade_status": self.upgrade_status,
+            "upgrade_error": self.upgrade_error,
+            "repairs": self.repairs,
+            "session_id": self.session_id,
+            "parent_id": self.parent_id,
+            "workspace": self.workspace,
+            "semantic_match": self.semantic_match,
+        }
+
+
+class JobManager:
+    """Runs animation jobs on a bounded pool of render worker processes.
+
+    Jobs are accepted until ``workers + queue_size`` jobs are in flight; beyond
+    that, submissions are rejected so callers can back off instead of piling
+    renders onto an overloaded host. Finished jobs are forgotten once they
+    are older than ``job_ttl`` or more than ``max_finished`` have piled up.
+
+    Args:
+        workers: Number of render worker processes. Defaults to env
+            RENDER_WORKERS or 2
+        queue_size: Number of jobs allowed to wait for a free worker.
+            Defaults to env RENDER_QUEUE_SIZE or 8
+        job_ttl: Seconds a finished job stays queryable. Defaults to env
+            JOB_TTL or 86400
+        max_finished: Finished jobs kept at most. Defaults to env
+            JOB_MAX_FINISHED or 1000
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        job_ttl: Optional[float] = None,
+        max_finished: Optional[int] = None,
+    ):
+        self.workers = workers or int(os.getenv("RENDER_WORKERS", "2"))
+        self.queue_size = (
+            queue_size
+            if queue_size is not None
+            else int(os.getenv("RENDER_QUEUE_SIZE", "8"))
+        )
+        self.job_ttl = (
+            job_ttl if job_ttl is not None else float(os.getenv("JOB_TTL", "86400"))
+        )
+        self.max_finished = (
+            max_finished
+            if max_finished is not None
+            else int(os.getenv("JOB_MAX_FINISHED", "1000"))
+        )
+        self.jobs: Dict[str, Job] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_size
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(llm_client.share_limits(llm_router.models()),),
+            )
+        return self._executor
+
+    def submit(
+        self,
+        prompt: str,
+        use_cache: bool = True,
+        quality: str = "preview",
+        preview_first: bool = False,
+        session: bool = False,
+    ) -> Job:
+        """Queues a new animation job.
+
+        Args:
+            prompt (str): Text description of the desired animation
+            use_cache (bool): Whether cached LLM responses may be reused
+            quality (str): Render quality profile
+            preview_first (bool): Render a "preview" quality video first and
+                make it available immediately, then queue the requested
+                quality and swap it in under the same job once done
+            session (bool): Render in a persistent session directory, so
+                :meth:`rerender` of edited code can reuse unchanged
+                animations. Without it, re-renders start from scratch
+
+        Returns:
+            Job: The newly created job, or an already completed one when the
+                semantic cache serves a near-duplicate prompt
+
+        Raises:
+            HTTPException: 503 if the render queue is full
+        """
+
+        upgrade_quality = None
+        if preview_first and quality != "preview":
+            quality, upgrade_quality = "preview", quality
+        match = None
+        if use_cache:
+            served, match = self.match_prompt(prompt, upgrade_quality or quality)
+            if served is not None:
+                return served
+        job = Job(
+            id=uuid.uuid4().hex,
+            prompt=prompt,
+            upgrade_quality=upgrade_quality,
+            semantic_match=match,
+        )
+        if session:
+            job.session_id = job.id
+        return self._submit(
+            job, run_animation_job, prompt, use_cache, quality, job.session_id
+        )
+
+    def match_prompt(self, prompt: str, quality: str) -> Tuple[Optional[Job], Optional[dict]]:
+        """Looks up a finished job whose prompt is a near duplicate.
+
+        See :class:`manimator.utils.semantic_cache.SemanticCache`. When the
+        cache serves matches, the earlier video is returned as a new job
+        that is already completed, without generating or rendering anything.
+
+        Args:
+            prompt (str): Text description of the desired animation
+            quality (str): Render quality profile the video must have
+
+        Returns:
+            Tuple[Optional[Job], Optional[dict]]: The completed job if the
+                match was served, and the match (``job_id``, ``prompt``,
+                ``similarity`` and ``served``) or None
+        """
+
+        found = semantic_cache.lookup(prompt, quality)
+        if found is None:
+            return None, None
+        entry, similarity = found
+        match = {
+            "job_id": entry.job_id,
+            "prompt": entry.prompt,
+            "similarity": round(similarity, 4),
+            "served": False,
+        }
+        if not semantic_cache.serves:
+            return None, match
+        try:
+            video_path = artifact_store.link(entry.video_path)
+        except FileNotFoundError:
+            return None, match  # evicted since the lookup
+        match["served"] = True
+        job = Job(
+            id=uuid.uuid4().hex,
+            prompt=prompt,
+            status="completed",
+            finished_at=time.time(),
+            video_path=video_path,
+            quality=entry.quality,
+            code=entry.code,
+            scene_name=entry.scene_name,
+            semantic_match=match,
+        )
+        with self._lock:
+            self._prune()
+            self.jobs[job.id] = job
+        artifact_store.enforce_limit()
+        return job, match
+
+    def _remember(self, job: Job):
+        # Re-renders of edited code no longer match their prompt
+        if job.parent_id is None:
+            semantic_cache.add(
+                job.prompt,
+                job.quality,
+                job.id,
+                job.video_path,
+                job.code,
+                job.scene_name,
+            )
+
+    def submit_render(
+        self,
+        prompt: Optional[str],
+        code: str,
+        scene_name: Optional[str],
+        progress_queue=None,
+        quality: str = "preview",
+        preview_first: bool = False,
+        session: bool = False,
+        description: Optional[str] = None,
+    ) -> Job:
+        """Queues a render of already generated scene code.
+
+        Failing code is repaired against the scene description, see
+        :func:`render_with_repair`. The finished video is indexed by the
+        semantic cache under ``prompt``, never under the description.
+
+        Args:
+            prompt (Optional[str]): User prompt the code was generated from,
+                or None if there is none, e.g. for arXiv papers
+            code (str): Manim scene code
+            scene_name (Optional[str]): Name of the scene class to render,
+                found by validating the code when None
+            progress_queue: Optional queue from :meth:`progress_queue`
+                receiving render progress events
+            quality (str): Render quality profile
+            preview_first (bool): Render at "preview" quality first, then
+                upgrade to ``quality``, as in :meth:`submit`
+            session (bool): Render in a persistent session directory, as in
+                :meth:`submit`
+            description (Optional[str]): Scene description the code was
+                generated from. Defaults to ``prompt``
+
+        Returns:
+            Job: The newly created job
+
+        Raises:
+            HTTPException: 503 if the render queue is full
+        """
+
+        upgrade_quality = None
+        if preview_first and quality != "preview":
+            quality, upgrade_quality = "preview", quality
+        job = Job(id=uuid.uuid4().hex, prompt=prompt, upgrade_quality=upgrade_quality)
+        if session:
+            job.session_id = job.id
+        return self._submit(
+            job,
+            run_render_job,
+            code,
+            scene_name,
+            progress_queue,
+            quality,
+            description or prompt,
+            job.session_id,
+        )
+
+    def rerender(
+        self,
+        job_id: str,
+        code: str,
+        quality: Optional[str] = None,
+        progress_queue=None,
+    ) -> Job:
+        """Queues a render of edited code for an existing job.
+
+        The new job shares the original job's render session, so Manim only
+        renders the animations whose code or inputs changed and reuses the
+        partial movie files of the rest. A job submitted without a session
+        gets one here: its first re-render starts from scratch, later ones
+        reuse it. Edited code is not repaired.
+
+        Args:
+            job_id (str): Job whose code was edited
+            code (str): The edited Manim scene code
+            quality (Optional[str]): Render quality profile. Defaults to the
+                original job's quality
+            progress_queue: Optional queue from :meth:`progress_queue`
+                receiving render progress events
+
+        Returns:
+            Job: The newly created job
+
+        Raises:
+            HTTPException: 404 if the job does not exist, 400 if the code
+                fails validation, 503 if the render queue is full
+        """
+
+        parent = self.get(job_id)
+        scene_name = _validated_scene_name(code)
+        quality = quality or parent.quality or "preview"
+        if parent.session_id is None:
+            parent.session_id = parent.id
+        job = Job(
+            id=uuid.uuid4().hex,
+            prompt=parent.prompt,
+            session_id=parent.session_id,
+            parent_id=parent.id,
+        )
+        return self._submit(
+            job,
+            run_render_job,
+            code,
+            scene_name,
+            progress_queue,
+            quality,
+            None,
+            job.session_id,
+        )
+
+    def progress_queue(self):
+        """Returns a queue that render workers can publish progress to."""
+
+        with self._lock:
+            if self._manager is None:
+                self._manager = Manager()
+        return self._manager.Queue()
+
+    def _submit(self, job: Job, fn: Callable, *args) -> Job:
+        with self._lock:
+            if self._in_flight >= self.capacity:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Render queue is full, try again later",
+                    headers={"Retry-After": "30"},
+                )
+            self._in_flight += 1
+            self._prune()
+            self.jobs[job.id] = job
+
+        future = self._get_executor().submit(fn, *args)
+        future.add_done_callback(lambda f: self._finish(job, f))
+        return job
+
+    def _prune(self):
+        """Forgets finished jobs past ``job_ttl`` and the oldest beyond
+        ``max_finished``.
+
+        Must be called with the lock held. Jobs still waiting for a quality
+        upgrade are kept; videos stay in the artifact store until it evicts
+        them.
+        """
+
+        finished = sorted(
+            (
+                job
+                for job in self.jobs.values()
+                if job.finished_at is not None and job.upgrade_status != "pending"
+            ),
+            key=lambda job: job.finished_at,
+        )
+        cutoff = time.time() - self.job_ttl
+        excess = len(finished) - self.max_finished
+        for index, job in enumerate(finished):
+            if index >= excess and job.finished_at > cutoff:
+                break
+            del self.jobs[job.id]
+
+    def _submit_upgrade(self, job: Job):
+        # Upgrades were promised when the job was accepted, so they bypass
+        # the capacity check and simply queue behind other work
+        with self._lock:
+            self._in_flight += 1
+        job.upgrade_status = "pending"
+        future = self._get_executor().submit(
+            run_render_job,
+            job.code,
+            job.scene_name,
+            None,
+            job.upgrade_quality,
+            None,
+            job.session_id,
+        )
+        future.add_done_callback(lambda f: self._finish_upgrade(job, f))
+
+    @staticmethod
+    def _error_detail(error: BaseException) -> str:
+        if isinstance(error, JobError):
+            return error.detail
+        return str(error) or type(error).__name__
+
+    @classmethod
+    def _record_telemetry(cls, outcome, repairs: List[dict]):
+        """Replays a worker's telemetry and counts its repairs and failure cause.
+
+        Args:
+            outcome: The worker's result dict, or the exception it raised
+            repairs (List[dict]): Repair records of the job
+        """
+
+        failed = isinstance(outcome, BaseException)
+        events = getattr(outcome, "telemetry", None) if failed else outcome.get("telemetry")
+        telemetry.replay(events)
+        for record in repairs:
+            telemetry.count_repair(record.get("stage"), record.get("outcome"))
+        if not failed:
+            return
+        detail = cls._error_detail(outcome)
+        if getattr(outcome, "status_code", None) == 400:
+            cause = "invalid_code"
+        elif detail.startswith(RENDER_ERROR_PREFIX) and LIMIT_MESSAGE_PREFIX in detail:
+            cause = "render_limit"
+        elif detail.startswith(RENDER_ERROR_PREFIX):
+            cause = "render_error"
+        elif detail.startswith(("Failed to generate", "Failed to repair")):
+            cause = "llm"
+        else:
+            cause = "other"
+        telemetry.count_failure(cause)
+
+    def _finish(self, job: Job, future: Future):
+        try:
+            result = future.result()
+        except BaseException as e:
+            job.status = "failed"
+            job.error = self._error_detail(e)
+            job.repairs = getattr(e, "repairs", [])
+            self._record_telemetry(e, job.repairs)
+        else:
+            job.repairs = result["repairs"]
+            self._record_telemetry(result, job.repairs)
+            job.video_path = result["video_path"]
+            job.code = result["code"]
+            job.scene_name = result["scene_name"]
+            job.quality = result["quality"]
+            job.workspace = result["workspace"]
+            job.status = "completed"
+            self._remember(job)
+            if job.upgrade_quality:
+                self._submit_upgrade(job)
+            artifact_store.enforce_limit()
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._in_flight -= 1
+
+    def _finish_upgrade(self, job: Job, future: Future):
+        try:
+            result = future.result()
+        except BaseException as e:
+            job.upgrade_status = "failed"
+            job.upgrade_error = self._error_detail(e)
+            self._record_telemetry(e, [])
+        else:
+            self._record_telemetry(result, [])
+            job.video_path = result["video_path"]
+            job.quality = result["quality"]
+            job.workspace = result["workspace"]
+            job.upgrade_status = "completed"
+            self._remember(job)
+            artifact_store.enforce_limit()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def get(self, job_id: str) -> Job:
+        """Looks up a job by id.
+
+        Raises:
+            HTTPException: 404 if the job does not exist
+        """
+
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+        return job
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self._in_flight,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
@@ -0,0 +1,296 @@
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+from dotenv import load_dotenv
+
+from manimator.utils.llm_router import llm_router
+from manimator.utils.telemetry import telemetry
+
+load_dotenv()
+
+# Completion parameters that change the generated output and therefore
+# belong in the cache key. Transport options such as num_retries do not.
+SAMPLING_PARAMS = (
+    "temperature",
+    "top_p",
+    "max_tokens",
+    "seed",
+    "stop",
+    "n",
+    "presence_penalty",
+    "frequency_penalty",
+    "response_format",
+)
+
+
+class MemoryCacheBackend:
+    """In-process LRU tier holding ``(created_at, value)`` pairs.
+
+    Args:
+        max_entries: Maximum number of entries kept before evicting the least
+            recently used one
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, created_at: float, value: str):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (created_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteCacheBackend:
+    """Persistent tier shared by every process pointing at the same file.
+
+    Args:
+        path: Path of the SQLite database file
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions "
+                "(key TEXT PRIMARY KEY, created_at REAL, value TEXT)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT created_at, value FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def set(self, key: str, created_at: float, value: str):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?)",
+                (key, created_at, value),
+            )
+
+    def delete(self, key: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+
+
+def _digest_payloads(value: Any) -> Any:
+    """Replaces inline ``data:`` payloads with their digest for keying."""
+
+    if isinstance(value, str) and value.startswith("data:"):
+        return "sha256:" + hashlib.sha256(value.encode("utf-8")).hexdigest()
+    if isinstance(value, dict):
+        return {k: _digest_payloads(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_digest_payloads(v) for v in value]
+    return value
+
+
+class CompletionCache:
+    """Two-tier cache of LLM completions.
+
+    Lookups go to an in-memory LRU first and then to an optional SQLite tier,
+    promoting persistent hits into memory. Entries expire after ``ttl``
+    seconds.
+
+    Args:
+        backends: Cache tiers in lookup order. Defaults to an in-memory LRU of
+            env LLM_CACHE_MAX_ENTRIES (256) entries, followed by a SQLite tier
+            when env LLM_CACHE_DB is set
+        ttl: Entry lifetime in seconds. Defaults to env LLM_CACHE_TTL or 1 day
+    """
+
+    def __init__(self, backends: Optional[List[Any]] = None, ttl: Optional[float] = None):
+        if backends is None:
+            backends = [
+                MemoryCacheBackend(int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256")))
+            ]
+            if os.getenv("LLM_CACHE_DB"):
+                backends.append(SQLiteCacheBackend(os.getenv("LLM_CACHE_DB")))
+        self.backends = backends
+        self.ttl = ttl if ttl is not None else float(os.getenv("LLM_CACHE_TTL", "86400"))
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, model: str, messages: List[Dict], params: Dict) -> str:
+        """Computes the cache key for a completion request.
+
+        Args:
+            model (str): LiteLLM model name
+            messages (List[Dict]): Chat messages; inline ``data:`` payloads are
+                keyed by digest
+            params (Dict): Completion parameters; only sampling parameters
+                contribute to the key
+
+        Returns:
+            str: Hex digest identifying the request
+        """
+
+        sampling = {k: params[k] for k in SAMPLING_PARAMS if k in params}
+        payload = json.dumps(
+            [model, _digest_payloads(messages), sampling],
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        for i, backend in enumerate(self.backends):
+            entry = backend.get(key)
+            if entry is None:
+                continue
+            created_at, value = entry
+            if now - created_at > self.ttl:
+                backend.delete(key)
+                continue
+            for faster in self.backends[:i]:
+                faster.set(key, created_at, value)
+            self.hits += 1
+            telemetry.count_cache("llm", True)
+            return value
+        self.misses += 1
+        telemetry.count_cache("llm", False)
+        return None
+
+    def set(self, key: str, value: str):
+        created_at = time.time()
+        for backend in self.backends:
+            backend.set(key, created_at, value)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+completion_cache = CompletionCache()
+
+
+async def cached_completion(
+    models: Sequence[str],
+    messages: Union[List[Dict], Callable[[], Union[List[Dict], Awaitable[List[Dict]]]]],
+    key_messages: Optional[List[Dict]] = None,
+    use_cache: bool = True,
+    **params,
+) -> str:
+    """Calls a model chain through the completion cache and the LLM router.
+
+    Responses are cached under the first model of the chain, whichever model
+    actually answered.
+
+    Args:
+        models: Fallback chain of LiteLLM model names, see
+            :meth:`manimator.utils.llm_router.LLMRouter.chain`
+        messages: Chat messages sent to the model, or a callable (sync or
+            async) building them so that expensive payloads are only prepared
+            on a cache miss. They are built once and reused for every model
+            tried
+        key_messages: Lighter stand-in for ``messages`` used only to build the
+            cache key, e.g. with a PDF body replaced by its digest. Required
+            when ``messages`` is a callable
+        use_cache: Set to False to bypass the cache for this request. The
+            fresh response still refreshes the cached entry
+        **params: Extra arguments, e.g. ``stage`` and ``cache_prefix``,
+            forwarded to :meth:`manimator.utils.llm_client.LLMClient.complete`
+
+    Returns:
+        str: Content of the first choice
+    """
+
+    primary = models[0] if models else ""
+    key = completion_cache.key(primary, key_messages or messages, params)
+    if use_cache:
+        cached = completion_cache.get(key)
+        if cached is not None:
+            return cached
+
+    if callable(messages):
+        messages = messages()
+        if inspect.isawaitable(messages):
+            messages = await messages
+    response = await llm_router.complete(models, messages, **params)
+    content = response.choices[0].message.content
+    if content:
+        completion_cache.set(key, content)
+    return content
+
+
+async def stream_cached_completion(
+    models: Sequence[str],
+    messages: List[Dict],
+    use_cache: bool = True,
+    **params,
+) -> AsyncIterator[str]:
+    """Streams a model chain's output through the completion cache and router.
+
+    A cache hit is yielded as a single chunk. On a miss, content deltas are
+    yielded as they arrive and the assembled response is cached at the end.
+
+    Args:
+        models: Fallback chain of LiteLLM model names
+        messages: Chat messages sent to the model
+        use_cache: Set to False to bypass the cache for this request
+        **params: Extra arguments, e.g. ``stage`` and ``cache_prefix``,
+            forwarded to :meth:`manimator.utils.llm_client.LLMClient.complete`
+
+    Yields:
+        str: Content chunks of the first choice
+    """
+
+    key = completion_cache.key(models[0] if models else "", messages, params)
+    if use_cache:
+        cached = completion_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    chunks = []
+    async for delta in llm_router.stream(models, messages, **params):
+        chunks.append(delta)
+        yield delta
+    if chunks:
+        completion_cache.set(key, "".join(chunks))
@@ -0,0 +1,415 @@
+import asyncio
+import multiprocessing
+import os
+import random
+import time
+import weakref
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+import litellm
+from litellm.utils import supports_prompt_caching
+from dotenv import load_dotenv
+
+from manimator.utils.telemetry import telemetry
+
+load_dotenv()
+
+# Errors worth retrying: throttling, timeouts and provider side failures
+RETRYABLE_ERRORS = (
+    litellm.RateLimitError,
+    litellm.Timeout,
+    litellm.APIConnectionError,
+    litellm.ServiceUnavailableError,
+    litellm.InternalServerError,
+)
+
+# Providers that only cache a prompt prefix marked with cache_control.
+# OpenAI, DeepSeek and others cache long shared prefixes automatically.
+CACHE_CONTROL_PROVIDERS = frozenset({"anthropic", "bedrock", "vertex_ai", "vertex_ai_beta"})
+
+# Seconds between attempts to take a free slot of a cross-process limit
+SHARED_SLOT_POLL = 0.05
+
+
+def with_cache_control(model: str, messages: List[Dict], cache_prefix: int) -> List[Dict]:
+    """Marks the end of a static prompt prefix for provider prompt caching.
+
+    Only applies to models LiteLLM reports as supporting prompt caching on
+    providers that need explicit ``cache_control`` markers, and can be turned
+    off with env LLM_PROMPT_CACHING=0.
+
+    Args:
+        model: LiteLLM model name
+        messages: Chat messages, not modified
+        cache_prefix: Number of leading messages that are identical across
+            calls
+
+    Returns:
+        List[Dict]: The messages, with the last prefix message converted to
+            content blocks carrying an ephemeral ``cache_control`` marker
+    """
+
+    if not cache_prefix or os.getenv("LLM_PROMPT_CACHING", "1") == "0":
+        return messages
+    try:
+        provider = litellm.get_llm_provider(model)[1]
+        if provider not in CACHE_CONTROL_PROVIDERS or not supports_prompt_caching(model):
+            return messages
+    except Exception:
+        return messages  # unknown to LiteLLM's model map
+
+    marked = list(messages)
+    last = dict(marked[cache_prefix - 1])
+    content = last["content"]
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    last["content"] = [
+        *content[:-1],
+        {**content[-1], "cache_control": {"type": "ephemeral"}},
+    ]
+    marked[cache_prefix - 1] = last
+    return marked
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Returns the delay in seconds requested by a 429 response, if any.
+
+    Reads ``retry-after-ms`` and ``retry-after`` (seconds or an HTTP date)
+    from the response headers LiteLLM attaches to the exception.
+    """
+
+    headers = getattr(error, "litellm_response_headers", None) or getattr(
+        getattr(error, "response", None), "headers", None
+    )
+    if not headers:
+        return None
+    headers = {str(k).lower(): v for k, v in dict(headers).items()}
+    try:
+        if headers.get("retry-after-ms"):
+            return max(float(headers["retry-after-ms"]) / 1000, 0.0)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _model_limits() -> Dict[str, int]:
+    """Parses env LLM_MODEL_CONCURRENCY, e.g. ``groq/llama-3.3-70b-versatile=2``."""
+
+    limits = {}
+    for entry in os.getenv("LLM_MODEL_CONCURRENCY", "").split(","):
+        model, _, limit = entry.strip().rpartition("=")
+        if model and limit.strip().isdigit():
+            limits[model.strip()] = int(limit)
+    return limits
+
+
+class LLMClient:
+    """Shared async client for every LiteLLM call made by manimator.
+
+    Each model gets its own concurrency limit, so a burst of requests queues
+    here instead of tripping provider rate limits. Throttled and transient
+    failures are retried with exponential backoff; a 429 carrying a
+    ``retry-after`` header pauses all calls to that model for the requested
+    time. Choosing between models is left to
+    :class:`manimator.utils.llm_router.LLMRouter`.
+
+    Limits start out per process. :meth:`share_limits` switches them to
+    primitives shared with the render worker processes (see
+    :class:`manimator.utils.jobs.JobManager`), so the concurrency limit and
+    429 pause of a model hold across the server and all workers.
+
+    Args:
+        max_concurrency: Concurrent calls per model. Defaults to env
+            LLM_MAX_CONCURRENCY or 4. Individual models can be given their
+            own limit with env LLM_MODEL_CONCURRENCY, a comma separated list
+            of ``model=limit`` pairs
+        max_retries: Retries after the first attempt. Defaults to env
+            LLM_MAX_RETRIES or 3
+        backoff: Base delay in seconds of the exponential backoff. Defaults
+            to env LLM_BACKOFF or 1
+        max_retry_after: Longest ``retry-after`` honoured, in seconds.
+            Defaults to env LLM_MAX_RETRY_AFTER or 60
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        backoff: Optional[float] = None,
+        max_retry_after: Optional[float] = None,
+    ):
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("LLM_MAX_CONCURRENCY", "4")
+        )
+        self.model_limits = _model_limits()
+        self.max_retries = (
+            max_retries
+            if max_retries is not None
+            else int(os.getenv("LLM_MAX_RETRIES", "3"))
+        )
+        self.backoff = (
+            backoff if backoff is not None else float(os.getenv("LLM_BACKOFF", "1"))
+        )
+        self.max_retry_after = (
+            max_retry_after
+            if max_retry_after is not None
+            else float(os.getenv("LLM_MAX_RETRY_AFTER", "60"))
+        )
+        # asyncio primitives belong to one event loop; worker processes run
+        # each job in a fresh loop
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._paused_until: Dict[str, float] = {}
+        # Per model: semaphore and paused-until timestamp shared by processes
+        self._shared: Dict[str, Tuple] = {}
+        self.counters = {"calls": 0, "retries": 0, "rate_limited": 0}
+        self.usage: Dict[str, Dict[str, int]] = {}
+
+    def limit_for(self, model: str) -> int:
+        return self.model_limits.get(model, self.max_concurrency)
+
+    def share_limits(self, models: Iterable[str]) -> Dict[str, Tuple]:
+        """Enforces the limits of ``models`` across processes from now on.
+
+        Must be called before the processes that should share the limits are
+        started; they take them over with :meth:`adopt_limits`. Models with
+        their own LLM_MODEL_CONCURRENCY entry are always included.
+
+        Args:
+            models: LiteLLM model names, e.g. every model of every stage
+
+        Returns:
+            Dict[str, Tuple]: The shared limits, to pass to
+                :func:`adopt_shared_limits` as worker initializer
+        """
+
+        for model in dict.fromkeys([*models, *self.model_limits]):
+            if model not in self._shared:
+                self._shared[model] = (
+                    multiprocessing.BoundedSemaphore(self.limit_for(model)),
+                    multiprocessing.Value("d", 0.0),
+                )
+        return dict(self._shared)
+
+    def adopt_limits(self, shared: Dict[str, Tuple]):
+        """Takes over limits created by :meth:`share_limits` in another process."""
+
+        self._shared = shared
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        if model not in semaphores:
+            semaphores[model] = asyncio.Semaphore(self.limit_for(model))
+        return semaphores[model]
+
+    @asynccontextmanager
+    async def _slot(self, model: str):
+        shared = self._shared.get(model)
+        if shared is None:
+            async with self._semaphore(model):
+                yield
+            return
+        semaphore = shared[0]
+        # A blocking acquire would stall the event loop
+        while not semaphore.acquire(block=False):
+            await asyncio.sleep(SHARED_SLOT_POLL)
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def _delay(self, model: str, attempt: int, error: Exception) -> float:
+        delay = None
+        if isinstance(error, litellm.RateLimitError):
+            self.counters["rate_limited"] += 1
+            delay = retry_after(error)
+        if delay is None:
+            # Full jitter keeps concurrent retries from arriving together
+            delay = random.uniform(0, self.backoff * 2**attempt)
+        else:
+            delay = min(delay, self.max_retry_after)
+            self._pause(model, time.monotonic() + delay)
+        return delay
+
+    def _pause(self, model: str, until: float):
+        # The monotonic clock is system wide, so shared timestamps compare
+        shared = self._shared.get(model)
+        if shared is None:
+            self._paused_until[model] = max(self._paused_until.get(model, 0.0), until)
+            return
+        paused_until = shared[1]
+        with paused_until.get_lock():
+            paused_until.value = max(paused_until.value, until)
+
+    def paused_for(self, model: str) -> float:
+        """Seconds until calls to a rate limited model resume, 0 if not paused."""
+
+        shared = self._shared.get(model)
+        until = shared[1].value if shared else self._paused_until.get(model, 0.0)
+        return max(until - time.monotonic(), 0.0)
+
+    async def _wait_until_unpaused(self, model: str):
+        pause = self.paused_for(model)
+        if pause > 0:
+            await asyncio.sleep(pause)
+
+    def _record_usage(self, stage: Optional[str], response=None):
+        totals = self.usage.setdefault(
+            stage or "other",
+            {
+                "calls": 0,
+                "prompt_tokens": 0,
+                "cached_prompt_tokens": 0,
+                "completion_tokens": 0,
+            },
+        )
+        totals["calls"] += 1
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return  # streamed responses carry no usage
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) or getattr(
+            usage, "cache_read_input_tokens", None
+        )
+        counts = {
+            "prompt": getattr(usage, "prompt_tokens", None) or 0,
+            "cached_prompt": cached or 0,
+            "completion": getattr(usage, "completion_tokens", None) or 0,
+        }
+        totals["prompt_tokens"] += counts["prompt"]
+        totals["cached_prompt_tokens"] += counts["cached_prompt"]
+        totals["completion_tokens"] += counts["completion"]
+        telemetry.count_tokens(stage or "other", **counts)
+
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict],
+        max_retries: Optional[int] = None,
+        stage: Optional[str] = None,
+        cache_prefix: int = 0,
+        **params,
+    ):
+        """Runs a completion within the model's limits, retrying on failure.
+
+        Args:
+            model: LiteLLM model name
+            messages: Chat messages sent to the model
+            max_retries: Retries for this call. Defaults to the client's
+                ``max_retries``
+            stage: Pipeline stage the token usage is reported under
+            cache_prefix: Number of leading messages shared by every call of
+                the stage, marked for prompt caching, see
+                :func:`with_cache_control`
+            **params: Extra arguments forwarded to ``litellm.acompletion``
+
+        Returns:
+            ModelResponse: The model's response
+
+        Raises:
+            Exception: The last error once retries are exhausted, or the
+                first non-retryable one
+        """
+
+        if max_retries is None:
+            max_retries = self.max_retries
+        messages = with_cache_control(model, messages, cache_prefix)
+        attempt = 0
+        while True:
+            await self._wait_until_unpaused(model)
+            try:
+                async with self._slot(model):
+                    self.counters["calls"] += 1
+                    response = await litellm.acompletion(
+                        model=model, messages=messages, **params
+                    )
+                self._record_usage(stage, response)
+                return response
+            except RETRYABLE_ERRORS as e:
+                if attempt >= max_retries:
+                    raise
+                delay = self._delay(model, attempt, e)
+                print(f"LLM call to {model} failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                self.counters["retries"] += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def stream(
+        self,
+        model: str,
+        messages: List[Dict],
+        max_retries: Optional[int] = None,
+        stage: Optional[str] = None,
+        cache_prefix: int = 0,
+        **params,
+    ) -> AsyncIterator[str]:
+        """Streams the content deltas of a completion within the model's limits.
+
+        Failures before the first chunk are retried like :meth:`complete`;
+        once content has been yielded, errors propagate.
+
+        Args:
+            model: LiteLLM model name
+            messages: Chat messages sent to the model
+            max_retries: Retries before the first chunk. Defaults to the
+                client's ``max_retries``
+            stage: Pipeline stage the call is counted under
+            cache_prefix: See :meth:`complete`
+            **params: Extra arguments forwarded to ``litellm.acompletion``
+
+        Yields:
+            str: Content chunks of the first choice
+        """
+
+        if max_retries is None:
+            max_retries = self.max_retries
+        messages = with_cache_control(model, messages, cache_prefix)
+        attempt = 0
+        while True:
+            await self._wait_until_unpaused(model)
+            started = False
+            try:
+                async with self._slot(model):
+                    self.counters["calls"] += 1
+                    response = await litellm.acompletion(
+                        model=model, messages=messages, stream=True, **params
+                    )
+                    async for chunk in response:
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            started = True
+                            yield delta
+                self._record_usage(stage)
+                return
+            except RETRYABLE_ERRORS as e:
+                if started or attempt >= max_retries:
+                    raise
+                delay = self._delay(model, attempt, e)
+                print(f"LLM stream from {model} failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                self.counters["retries"] += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {**self.counters, "usage": self.usage}
+
+
+llm_client = LLMClient()
+
+
+def adopt_shared_limits(shared: Dict[str, Tuple]):
+    """Process pool initializer making workers use the server's LLM limits.
+
+    Args:
+        shared: Limits returned by :meth:`LLMClient.share_limits`
+    """
+
+    llm_client.adopt_limits(shared)
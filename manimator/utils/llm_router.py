@@ -0,0 +1,354 @@
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+from dotenv import load_dotenv
+
+from manimator.utils.llm_client import llm_client
+from manimator.utils.telemetry import telemetry
+
+load_dotenv()
+
+# Per stage: env var of the primary model and env var of its comma separated
+# fallback chain
+STAGE_MODELS = {
+    "scene": ("PROMPT_SCENE_GEN_MODEL", "PROMPT_SCENE_FALLBACK_MODELS"),
+    "pdf": ("PDF_SCENE_GEN_MODEL", "PDF_SCENE_FALLBACK_MODELS"),
+    "code": ("CODE_GEN_MODEL", "CODE_GEN_FALLBACK_MODELS"),
+    "repair": ("REPAIR_MODEL", "REPAIR_FALLBACK_MODELS"),
+}
+
+
+class AllModelsFailedError(RuntimeError):
+    """Raised when every model of a fallback chain failed.
+
+    Attributes:
+        errors: ``(model, error)`` pairs in the order the models were tried
+    """
+
+    def __init__(self, errors: List[tuple]):
+        super().__init__(
+            "; ".join(f"{model}: {error}" for model, error in errors)
+            or "No model configured"
+        )
+        self.errors = errors
+
+
+class CircuitBreaker:
+    """Tracks the health of one model.
+
+    A call counts as bad when it fails or takes longer than ``slow_seconds``.
+    After ``failure_threshold`` bad calls in a row the breaker opens and the
+    router skips the model for ``cooldown`` seconds, then lets calls through
+    again (half-open). The first good call closes it; a bad one reopens it.
+
+    Args:
+        failure_threshold: Consecutive bad calls that open the breaker.
+            Defaults to env LLM_BREAKER_FAILURES or 3
+        slow_seconds: Latency above which a successful call still counts as
+            bad; 0 disables. Defaults to env LLM_BREAKER_SLOW_SECONDS or 60
+        cooldown: Seconds the breaker stays open. Defaults to env
+            LLM_BREAKER_COOLDOWN or 60
+    """
+
+    def __init__(
+        self,
+        failure_threshold: Optional[int] = None,
+        slow_seconds: Optional[float] = None,
+        cooldown: Optional[float] = None,
+    ):
+        self.failure_threshold = failure_threshold or int(
+            os.getenv("LLM_BREAKER_FAILURES", "3")
+        )
+        self.slow_seconds = (
+            slow_seconds
+            if slow_seconds is not None
+            else float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "60"))
+        )
+        self.cooldown = (
+            cooldown
+            if cooldown is not None
+            else float(os.getenv("LLM_BREAKER_COOLDOWN", "60"))
+        )
+        self.consecutive_bad = 0
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def record(self, ok: bool, latency: float):
+        """Records the outcome and latency in seconds of a call."""
+
+        if ok and not (self.slow_seconds and latency > self.slow_seconds):
+            self.consecutive_bad = 0
+            self.opened_at = None
+            return
+        self.consecutive_bad += 1
+        if self.consecutive_bad >= self.failure_threshold and self.state != "open":
+            self.opened_at = time.monotonic()
+            self.trips += 1
+
+    def to_dict(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_bad": self.consecutive_bad,
+            "trips": self.trips,
+        }
+
+
+class LLMRouter:
+    """Routes each LLM call along its stage's ordered fallback chain.
+
+    Models whose circuit breaker is open, or that are paused by a 429, move
+    to the back of the chain; they are only tried once every healthy model
+    has failed. A failing model is retried ``fallback_retries`` times before
+    the next one is tried, while the last model of the chain gets the
+    client's full retry budget. Calls to a non-final model are abandoned
+    after ``attempt_timeout`` seconds, and with ``hedge_after`` set, a call
+    still unanswered after that long is duplicated on the next model, the
+    first answer winning. The messages are built once by the caller and
+    reused for every attempt.
+
+    Args:
+        fallback_retries: Retries before falling back. Defaults to env
+            LLM_FALLBACK_RETRIES or 1
+        attempt_timeout: Seconds before a non-final model is given up on;
+            0 disables. Defaults to env LLM_ATTEMPT_TIMEOUT or 120
+        hedge_after: Seconds after which a call is hedged to the next model;
+            0 disables. Defaults to env LLM_HEDGE_AFTER or 0
+    """
+
+    def __init__(
+        self,
+        fallback_retries: Optional[int] = None,
+        attempt_timeout: Optional[float] = None,
+        hedge_after: Optional[float] = None,
+    ):
+        self.fallback_retries = (
+            fallback_retries
+            if fallback_retries is not None
+            else int(os.getenv("LLM_FALLBACK_RETRIES", "1"))
+        )
+        self.attempt_timeout = (
+            attempt_timeout
+            if attempt_timeout is not None
+            else float(os.getenv("LLM_ATTEMPT_TIMEOUT", "120"))
+        )
+        self.hedge_after = (
+            hedge_after
+            if hedge_after is not None
+            else float(os.getenv("LLM_HEDGE_AFTER", "0"))
+        )
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.counters = {"routed": 0, "fallbacks": 0, "hedged": 0, "failed": 0}
+
+    def chain(self, stage: str) -> List[str]:
+        """Returns the ordered models configured for a stage.
+
+        Args:
+            stage (str): One of ``scene``, ``pdf``, ``code`` or ``repair``.
+                ``pdf`` falls back to env PDF_RETRY_MODEL when
+                PDF_SCENE_FALLBACK_MODELS is unset, and ``repair`` defaults to
+                the ``code`` chain when REPAIR_MODEL is unset
+
+        Returns:
+            List[str]: Primary model followed by its fallbacks, without
+                duplicates
+        """
+
+        primary_env, fallbacks_env = STAGE_MODELS[stage]
+        if stage == "repair" and not os.getenv(primary_env):
+            return self.chain("code")
+        fallbacks = os.getenv(fallbacks_env)
+        if fallbacks is None and stage == "pdf":
+            fallbacks = os.getenv("PDF_RETRY_MODEL")
+        models = [os.getenv(primary_env, "")] + (fallbacks or "").split(",")
+        chain = []
+        for model in models:
+            model = model.strip()
+            if model and model not in chain:
+                chain.append(model)
+        return chain
+
+    def models(self) -> List[str]:
+        """Returns the models configured for any stage, without duplicates."""
+
+        models = [model for stage in STAGE_MODELS for model in self.chain(stage)]
+        return list(dict.fromkeys(models))
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        if model not in self.breakers:
+            self.breakers[model] = CircuitBreaker()
+        return self.breakers[model]
+
+    def _record(self, model: str, ok: bool, latency: float):
+        self.breaker(model).record(ok, latency)
+        telemetry.observe_llm(model, latency, ok)
+
+    def _order(self, models: Sequence[str]) -> List[str]:
+        healthy = [
+            model
+            for model in models
+            if self.breaker(model).state != "open" and not llm_client.paused_for(model)
+        ]
+        return healthy + [model for model in models if model not in healthy]
+
+    async def _attempt(self, model: str, messages: List[Dict], final: bool, **params):
+        call = llm_client.complete(
+            model,
+            messages,
+            max_retries=None if final else self.fallback_retries,
+            **params,
+        )
+        if final or not self.attempt_timeout:
+            return await call
+        return await asyncio.wait_for(call, self.attempt_timeout)
+
+    async def complete(self, models: Sequence[str], messages: List[Dict], **params):
+        """Runs a completion on the first healthy model that answers.
+
+        Args:
+            models: Fallback chain, usually from :meth:`chain`
+            messages: Chat messages, reused for every attempt
+            **params: Extra arguments forwarded to
+                :meth:`manimator.utils.llm_client.LLMClient.complete`
+
+        Returns:
+            ModelResponse: The first successful response
+
+        Raises:
+            AllModelsFailedError: If every model failed
+        """
+
+        candidates = self._order(models)
+        if not candidates:
+            raise AllModelsFailedError([])
+        self.counters["routed"] += 1
+        pending: Dict[asyncio.Future, tuple] = {}
+        errors: List[tuple] = []
+
+        def launch():
+            model = candidates[len(pending) + len(errors)]
+            final = len(pending) + len(errors) == len(candidates) - 1
+            task = asyncio.ensure_future(self._attempt(model, messages, final, **params))
+            pending[task] = (model, time.monotonic())
+
+        launch()
+        try:
+            while pending:
+                can_hedge = (
+                    self.hedge_after > 0
+                    and len(pending) == 1
+                    and len(pending) + len(errors) < len(candidates)
+                )
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=self.hedge_after if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    self.counters["hedged"] += 1
+                    print(f"LLM call exceeded {self.hedge_after}s, hedging to the next model")
+                    launch()
+                    continue
+                for task in done:
+                    model, start = pending.pop(task)
+                    latency = time.monotonic() - start
+                    if task.exception() is None:
+                        self._record(model, True, latency)
+                        for loser_model, loser_start in pending.values():
+                            # A call started before the winner was too slow;
+                            # a later hedge only counts once it ran too long
+                            breaker = self.breaker(loser_model)
+                            elapsed = time.monotonic() - loser_start
+                            if loser_start < start or (
+                                breaker.slow_seconds and elapsed > breaker.slow_seconds
+                            ):
+                                breaker.record(False, elapsed)
+                        return task.result()
+                    self._record(model, False, latency)
+                    error = task.exception()
+                    if isinstance(error, asyncio.TimeoutError):
+                        error = f"no response after {self.attempt_timeout}s"
+                    errors.append((model, error))
+                    print(f"LLM call to {model} failed: {error}")
+                if not pending and len(errors) < len(candidates):
+                    self.counters["fallbacks"] += 1
+                    launch()
+            self.counters["failed"] += 1
+            raise AllModelsFailedError(errors)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream(
+        self, models: Sequence[str], messages: List[Dict], **params
+    ) -> AsyncIterator[str]:
+        """Streams from the first healthy model that starts answering.
+
+        A model that fails before its first chunk is skipped for the next
+        one; once content has been yielded, errors propagate. Its breaker is
+        given the time to the first chunk, so long generations are not slow.
+
+        Args:
+            models: Fallback chain, usually from :meth:`chain`
+            messages: Chat messages, reused for every attempt
+            **params: Extra arguments forwarded to
+                :meth:`manimator.utils.llm_client.LLMClient.complete`
+
+        Yields:
+            str: Content chunks of the first choice
+
+        Raises:
+            AllModelsFailedError: If every model failed before streaming
+        """
+
+        candidates = self._order(models)
+        self.counters["routed"] += 1
+        errors: List[tuple] = []
+        for index, model in enumerate(candidates):
+            if index:
+                self.counters["fallbacks"] += 1
+            final = index == len(candidates) - 1
+            start = time.monotonic()
+            first_chunk: Optional[float] = None
+            try:
+                async for delta in llm_client.stream(
+                    model,
+                    messages,
+                    max_retries=None if final else self.fallback_retries,
+                    **params,
+                ):
+                    if first_chunk is None:
+                        first_chunk = time.monotonic() - start
+                    yield delta
+            except Exception as e:
+                self._record(model, False, time.monotonic() - start)
+                if first_chunk is not None:
+                    raise
+                errors.append((model, e))
+                print(f"LLM stream from {model} failed: {e}")
+                continue
+            if first_chunk is None:
+                first_chunk = time.monotonic() - start
+            self._record(model, True, first_chunk)
+            return
+        self.counters["failed"] += 1
+        raise AllModelsFailedError(errors)
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "breakers": {
+                model: breaker.to_dict() for model, breaker in self.breakers.items()
+            },
+        }
+
+
+llm_router = LLMRouter()
@@ -0,0 +1,172 @@
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from manimator.utils.sandbox import render_sandbox
+from manimator.utils.tex_cache import tex_cache
+
+load_dotenv()
+
+
+def count_animations(scene_file: str, scene_name: str, media_dir: str) -> int:
+    """Counts the ``play``/``wait`` calls of a scene with a Manim dry run.
+
+    The scene's ``construct`` runs without rendering any frames, in a
+    separate sandboxed interpreter so the calling process never imports
+    Manim. It still compiles the scene's formulas into ``media_dir``.
+
+    Args:
+        scene_file (str): Path to the Python file containing the scene
+        scene_name (str): Name of the scene class
+        media_dir (str): Media directory for the dry run
+
+    Returns:
+        int: Number of animations the scene plays
+
+    Raises:
+        subprocess.CalledProcessError: If the scene fails to run
+    """
+
+    output = render_sandbox.run(
+        [sys.executable, "-m", "manimator.utils.parallel_render"]
+        + [scene_file, scene_name, media_dir]
+    )
+    # The count is the last line, after Manim's console output
+    return int(output.strip().splitlines()[-1])
+
+
+def split_ranges(total: int, chunks: int) -> List[Tuple[int, int]]:
+    """Splits animations ``0..total-1`` into contiguous inclusive ranges.
+
+    Args:
+        total (int): Number of animations
+        chunks (int): Maximum number of ranges
+
+    Returns:
+        List[Tuple[int, int]]: ``(first, last)`` animation indices per range
+    """
+
+    if total <= 0:
+        return []
+    chunks = max(1, min(chunks, total))
+    size, extra = divmod(total, chunks)
+    ranges = []
+    start = 0
+    for i in range(chunks):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append((start, end - 1))
+        start = end
+    return ranges
+
+
+def concat_videos(video_paths: List[str], output_path: str):
+    """Concatenates videos with identical encoding using ffmpeg stream copy.
+
+    Raises:
+        subprocess.CalledProcessError: If ffmpeg fails
+    """
+
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=".txt", dir=os.path.dirname(output_path), delete=False
+    ) as f:
+        for path in video_paths:
+            f.write(f"file '{path}'\n")
+        list_file = f.name
+    try:
+        subprocess.run(
+            ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0"]
+            + ["-i", list_file, "-c", "copy", output_path],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+    finally:
+        os.remove(list_file)
+
+
+def render_in_chunks(
+    scene_file: str,
+    scene_name: str,
+    temp_dir: str,
+    build_cmd: Callable[[str, List[str]], List[str]],
+    video_path: Callable[[str], str],
+    chunks: int,
+    run: Callable[[List[str]], None],
+) -> Optional[str]:
+    """Renders a scene as animation ranges on parallel manim processes.
+
+    Every process executes the full ``construct`` (so scene state stays
+    correct) but only encodes frames for its own range of animations, selected
+    with Manim's ``--from_animation_number``. The partial videos are then
+    joined with ffmpeg stream copy. The animation count's dry run compiles
+    the scene's formulas first, so with ``build_cmd`` pointing every chunk at
+    the render's Tex folder, chunks never compile the same formula at once.
+
+    Args:
+        scene_file (str): Path to the Python file containing the scene
+        scene_name (str): Name of the scene class to render
+        temp_dir (str): Directory for output media files
+        build_cmd (Callable): Builds the manim command for a media directory
+            and extra CLI arguments
+        video_path (Callable): Maps a media directory to the rendered video
+        chunks (int): Maximum number of parallel renders
+        run (Callable): Runs a manim command, raising on failure
+
+    Returns:
+        Optional[str]: Path to the concatenated video, None if nothing rendered
+    """
+
+    total = count_animations(scene_file, scene_name, temp_dir)
+    ranges = split_ranges(total, chunks)
+    if len(ranges) <= 1:
+        run(build_cmd(temp_dir, []))
+        path = video_path(temp_dir)
+        return path if os.path.exists(path) else None
+
+    def render_range(index: int, first: int, last: int) -> str:
+        media_dir = os.path.join(temp_dir, f"chunk_{index}")
+        run(build_cmd(media_dir, ["--from_animation_number", f"{first},{last}"]))
+        return video_path(media_dir)
+
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = [
+            executor.submit(render_range, i, first, last)
+            for i, (first, last) in enumerate(ranges)
+        ]
+        parts = [future.result() for future in futures]
+
+    parts = [part for part in parts if os.path.exists(part)]
+    if not parts:
+        return None
+    output_path = os.path.join(temp_dir, f"{scene_name}.mp4")
+    concat_videos(parts, output_path)
+    return output_path
+
+
+def _print_animation_count(scene_file: str, scene_name: str, media_dir: str):
+    from manimator.utils.render_worker import run_scene
+
+    # Keep Manim's console output away from the count printed on stdout
+    stdout = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    tex_cache.install_hook()
+    scene = run_scene(
+        scene_file,
+        scene_name,
+        {
+            "media_dir": media_dir,
+            "dry_run": True,
+            "disable_caching": True,
+            "no_latex_cleanup": True,
+        },
+    )
+    stdout.write(f"{scene.renderer.num_plays}\n")
+    stdout.flush()
+
+
+if __name__ == "__main__":
+    _print_animation_count(*sys.argv[1:4])
@@ -0,0 +1,432 @@
+import asyncio
+import base64
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from PyPDF2 import PdfReader, PdfWriter
+from dotenv import load_dotenv
+
+from manimator.utils.helpers import shrink_pdf
+
+load_dotenv()
+
+PDF_PREP_MODES = ("pdf", "trimmed", "text")
+
+# Rough characters-per-token ratio of English prose for common tokenizers
+CHARS_PER_TOKEN = 4
+
+# Heading keywords and how strongly they mark a page worth animating
+SECTION_WEIGHTS = [
+    (re.compile(r"^\s*(\d+\.?\s*)?abstract\b", re.I | re.M), 6),
+    (re.compile(r"^\s*(\d+\.?\s*)?introduction\b", re.I | re.M), 2),
+    (
+        re.compile(
+            r"^\s*(\d+(\.\d+)*\.?\s*)?(method(s|ology)?|approach|model|architecture"
+            r"|algorithm|framework|proposed|formulation)\b",
+            re.I | re.M,
+        ),
+        4,
+    ),
+    (re.compile(r"^\s*(\d+\.?\s*)?(conclusions?|discussion)\b", re.I | re.M), 2),
+    (re.compile(r"^\s*(\d+\.?\s*)?(experiments?|results|evaluation)\b", re.I | re.M), 1),
+    (re.compile(r"^\s*(\d+\.?\s*)?related work\b", re.I | re.M), -1),
+    (re.compile(r"^\s*(acknowledge?ments?)\b", re.I | re.M), -3),
+    (re.compile(r"^\s*(appendix|supplementary)\b", re.I | re.M), -3),
+]
+REFERENCES_PATTERN = re.compile(r"^\s*(\d+\.?\s*)?(references|bibliography)\b", re.I | re.M)
+FIGURE_PATTERN = re.compile(r"^\s*(figure|fig\.)\s*\d+", re.I | re.M)
+TABLE_PATTERN = re.compile(r"^\s*table\s*\d+", re.I | re.M)
+
+# Below this many characters per page the PDF is likely scanned; send it whole
+MIN_TEXT_CHARS_PER_PAGE = 200
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of tokens a model needs for ``text``."""
+
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def score_pages(texts: List[str]) -> List[float]:
+    """Scores how useful each page is for describing a paper visually.
+
+    The first page (title and abstract) ranks highest, followed by pages
+    introducing the method and pages with figure captions. References,
+    acknowledgements, appendices and everything after the references rank
+    lowest.
+
+    Args:
+        texts (List[str]): Extracted text of each page
+
+    Returns:
+        List[float]: Score per page, higher is more relevant
+    """
+
+    scores = []
+    after_references = False
+    for index, text in enumerate(texts):
+        score = 10.0 if index == 0 else 0.0
+        for pattern, weight in SECTION_WEIGHTS:
+            if pattern.search(text):
+                score += weight
+        score += min(len(FIGURE_PATTERN.findall(text)), 3) * 2
+        score += min(len(TABLE_PATTERN.findall(text)), 2)
+        if after_references:
+            score -= 6
+        if REFERENCES_PATTERN.search(text):
+            score -= 4
+            after_references = True
+        # Prefer earlier pages on ties, where the core ideas usually are
+        scores.append(score - index * 0.01)
+    return scores
+
+
+def select_pages(texts: List[str], token_budget: int) -> List[int]:
+    """Picks the highest scoring pages that fit within a token budget.
+
+    The first page is always selected.
+
+    Args:
+        texts (List[str]): Extracted text of each page
+        token_budget (int): Maximum estimated tokens of the selected pages
+
+    Returns:
+        List[int]: Zero-based indices of the selected pages, in page order
+    """
+
+    if not texts:
+        return []
+    scores = score_pages(texts)
+    selected = [0]
+    used = estimate_tokens(texts[0])
+    for index in sorted(range(1, len(texts)), key=lambda i: scores[i], reverse=True):
+        tokens = estimate_tokens(texts[index])
+        if used + tokens <= token_budget:
+            selected.append(index)
+            used += tokens
+    return sorted(selected)
+
+
+@dataclass
+class PreparedPdf:
+    """A PDF reduced to what is sent to the model, plus what it saved."""
+
+    mode: str
+    content: str
+    pages_total: int
+    pages_sent: List[int] = field(default_factory=list)
+    bytes_original: int = 0
+    bytes_sent: int = 0
+    tokens_original: int = 0
+    tokens_sent: int = 0
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+
+    def message(self) -> dict:
+        """Returns the user message carrying the prepared PDF."""
+
+        if self.mode == "text":
+            pages = ", ".join(str(page) for page in self.pages_sent)
+            return {
+                "role": "user",
+                "content": (
+                    f"Extracted text of the paper (pages {pages} of "
+                    f"{self.pages_total}):\n\n{self.content}"
+                ),
+            }
+        return {
+            "role": "user",
+            "content": [
+                {
+                    "type": "image_url",
+                    "image_url": f"data:application/pdf;base64,{self.content}",
+                }
+            ],
+        }
+
+    def report(self) -> dict:
+        """Summarises the pages kept and the bytes and tokens saved."""
+
+        return {
+            "mode": self.mode,
+            "pages_total": self.pages_total,
+            "pages_sent": self.pages_sent,
+            "bytes_original": self.bytes_original,
+            "bytes_sent": self.bytes_sent,
+            "bytes_saved": self.bytes_original - self.bytes_sent,
+            "tokens_original": self.tokens_original,
+            "tokens_sent": self.tokens_sent,
+            "tokens_saved": self.tokens_original - self.tokens_sent,
+            "timings_ms": self.timings_ms,
+        }
+
+
+def _extract_texts(reader: PdfReader) -> List[str]:
+    texts = []
+    for page in reader.pages:
+        try:
+            texts.append(page.extract_text() or "")
+        except Exception:
+            texts.append("")
+    return texts
+
+
+def _write_pages(reader: PdfReader, pages: List[int]) -> bytes:
+    writer = PdfWriter()
+    for index in pages:
+        writer.add_page(reader.pages[index])
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+class PdfTooLargeError(ValueError):
+    """Raised when a PDF has more pages than preprocessing accepts."""
+
+
+@contextmanager
+def _stage(timings: Dict[str, float], name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+
+
+def _encoded(pdf: bytes, timings: Dict[str, float]) -> Tuple[str, int]:
+    with _stage(timings, "compress"):
+        pdf = shrink_pdf(pdf)
+    with _stage(timings, "encode"):
+        return base64.b64encode(pdf).decode("utf-8"), len(pdf)
+
+
+def _whole_pdf(
+    content: bytes, pages_total: int, tokens: int, timings: Dict[str, float]
+) -> PreparedPdf:
+    encoded, size = _encoded(content, timings)
+    return PreparedPdf(
+        mode="pdf",
+        content=encoded,
+        pages_total=pages_total,
+        pages_sent=list(range(1, pages_total + 1)),
+        bytes_original=len(content),
+        bytes_sent=size,
+        tokens_original=tokens,
+        tokens_sent=tokens,
+        timings_ms=timings,
+    )
+
+
+def prepare_pdf(
+    content: bytes,
+    mode: Optional[str] = None,
+    token_budget: Optional[int] = None,
+    max_pages: Optional[int] = None,
+) -> PreparedPdf:
+    """Reduces a PDF to its most relevant pages before it is sent to a model.
+
+    Text is extracted per page, pages are scored by the sections and figures
+    they contain, and the best pages within the token budget are kept. In
+    ``trimmed`` mode those pages are sent as a smaller PDF, so figures are
+    preserved; in ``text`` mode only their extracted text is sent. ``pdf``
+    mode sends the whole document as before. PDFs without extractable text,
+    such as scans, are always sent whole. PDFs are only re-compressed when
+    that makes them smaller.
+
+    This is CPU bound; servers should run it through :data:`pdf_prep_pool`.
+
+    Args:
+        content (bytes): Raw PDF content
+        mode (Optional[str]): One of ``pdf``, ``trimmed`` or ``text``.
+            Defaults to env PDF_PREP_MODE or ``trimmed``
+        token_budget (Optional[int]): Maximum estimated tokens of the kept
+            pages. Defaults to env PDF_TOKEN_BUDGET or 16000
+        max_pages (Optional[int]): Largest accepted page count. Defaults to
+            env PDF_MAX_PAGES or 100
+
+    Returns:
+        PreparedPdf: The content to send, a report of what was saved and the
+            time spent in each stage
+
+    Raises:
+        ValueError: If ``mode`` is not a known mode
+        PdfTooLargeError: If the PDF has more than ``max_pages`` pages
+    """
+
+    mode = mode or os.getenv("PDF_PREP_MODE", "trimmed")
+    token_budget = token_budget or int(os.getenv("PDF_TOKEN_BUDGET", "16000"))
+    max_pages = max_pages or int(os.getenv("PDF_MAX_PAGES", "100"))
+    if mode not in PDF_PREP_MODES:
+        raise ValueError(f"Unknown PDF preprocessing mode {mode!r}")
+
+    timings: Dict[str, float] = {}
+    try:
+        with _stage(timings, "parse"):
+            reader = PdfReader(BytesIO(content))
+            pages_total = len(reader.pages)
+    except Exception:
+        # Unreadable by PyPDF2; let the model try the original document
+        return _whole_pdf(content, 0, 0, timings)
+    if pages_total > max_pages:
+        raise PdfTooLargeError(
+            f"PDF has {pages_total} pages, the limit is {max_pages}"
+        )
+
+    with _stage(timings, "extract"):
+        texts = _extract_texts(reader)
+    tokens_original = sum(estimate_tokens(text) for text in texts)
+    has_text = sum(len(text) for text in texts) >= MIN_TEXT_CHARS_PER_PAGE * pages_total
+    if mode == "pdf" or not pages_total or not has_text:
+        return _whole_pdf(content, pages_total, tokens_original, timings)
+
+    with _stage(timings, "select"):
+        pages = select_pages(texts, token_budget)
+    if mode == "text":
+        text = "\n\n".join(f"--- Page {i + 1} ---\n{texts[i].strip()}" for i in pages)
+        # Even the first page alone can exceed a small budget
+        text = text[: token_budget * CHARS_PER_TOKEN]
+        return PreparedPdf(
+            mode="text",
+            content=text,
+            pages_total=pages_total,
+            pages_sent=[i + 1 for i in pages],
+            bytes_original=len(content),
+            bytes_sent=len(text.encode("utf-8")),
+            tokens_original=tokens_original,
+            tokens_sent=estimate_tokens(text),
+            timings_ms=timings,
+        )
+
+    if len(pages) == pages_total:
+        return _whole_pdf(content, pages_total, tokens_original, timings)
+    with _stage(timings, "trim"):
+        trimmed = _write_pages(reader, pages)
+    encoded, size = _encoded(trimmed, timings)
+    return PreparedPdf(
+        mode="trimmed",
+        content=encoded,
+        pages_total=pages_total,
+        pages_sent=[i + 1 for i in pages],
+        bytes_original=len(content),
+        bytes_sent=size,
+        tokens_original=tokens_original,
+        tokens_sent=sum(estimate_tokens(texts[i]) for i in pages),
+        timings_ms=timings,
+    )
+
+
+def _timed_prepare(submitted_at: float, *args) -> PreparedPdf:
+    queued_ms = round((time.time() - submitted_at) * 1000, 1)
+    prepared = prepare_pdf(*args)
+    prepared.timings_ms = {"queue": queued_ms, **prepared.timings_ms}
+    return prepared
+
+
+class PdfPrepPool:
+    """Runs :func:`prepare_pdf` on a bounded pool of worker processes.
+
+    PyPDF2 parsing, text extraction and compression are CPU bound and hold the
+    GIL, so running them in the server process stalls every other request.
+    At most ``workers + queue_size`` PDFs are in flight; beyond that callers
+    get a 503 so they can back off.
+
+    Args:
+        workers: Number of worker processes. Defaults to env PDF_PREP_WORKERS
+            or 2
+        queue_size: Number of PDFs allowed to wait for a free worker.
+            Defaults to env PDF_PREP_QUEUE_SIZE or 8
+        max_bytes: Largest accepted PDF. Defaults to env PDF_MAX_BYTES or
+            50 MiB
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.workers = workers or int(os.getenv("PDF_PREP_WORKERS", "2"))
+        self.queue_size = (
+            queue_size
+            if queue_size is not None
+            else int(os.getenv("PDF_PREP_QUEUE_SIZE", "8"))
+        )
+        self.max_bytes = max_bytes or int(os.getenv("PDF_MAX_BYTES", str(50 * 1024**2)))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def prepare(
+        self,
+        content: bytes,
+        mode: Optional[str] = None,
+        token_budget: Optional[int] = None,
+    ) -> PreparedPdf:
+        """Prepares a PDF on a worker process without blocking the event loop.
+
+        Args:
+            content (bytes): Raw PDF content
+            mode (Optional[str]): Preprocessing mode, see :func:`prepare_pdf`
+            token_budget (Optional[int]): Token budget, see :func:`prepare_pdf`
+
+        Returns:
+            PreparedPdf: The prepared PDF, with queue and total timings added
+
+        Raises:
+            HTTPException: 413 if the PDF exceeds the byte or page limits, 503
+                if the pool is full
+        """
+
+        if len(content) > self.max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"PDF is {len(content)} bytes, the limit is {self.max_bytes}",
+            )
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_size:
+                raise HTTPException(
+                    status_code=503,
+                    detail="PDF processing queue is full, try again later",
+                    headers={"Retry-After": "10"},
+                )
+            self._in_flight += 1
+
+        start = time.perf_counter()
+        try:
+            future = self._get_executor().submit(
+                _timed_prepare, time.time(), content, mode, token_budget
+            )
+            prepared = await asyncio.wrap_future(future)
+        except PdfTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        prepared.timings_ms["total"] = round((time.perf_counter() - start) * 1000, 1)
+        return prepared
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self._in_flight,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+pdf_prep_pool = PdfPrepPool()
@@ -0,0 +1,211 @@
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from importlib import metadata
+from typing import List, Optional
+from dotenv import load_dotenv
+
+from manimator.utils.telemetry import telemetry
+
+load_dotenv()
+
+
+def _manim_version() -> str:
+    try:
+        return metadata.version("manim")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+class RenderCache:
+    """Content-addressed on-disk cache of rendered Manim videos.
+
+    Entries are keyed on the scene code, scene name, installed Manim version
+    and render flags, so byte-identical code rendered with the same settings
+    is served from disk without spawning ``manim``. The cache is bounded by
+    total size and evicts least recently used entries first. Hit and miss
+    counters are persisted next to the entries so they are shared by every
+    render worker process.
+
+    Args:
+        cache_dir: Directory holding cached videos. Defaults to env
+            RENDER_CACHE_DIR or a ``manimator/render_cache`` folder in the
+            system temp dir
+        max_bytes: Maximum total size of cached videos. Defaults to env
+            RENDER_CACHE_MAX_BYTES or 2 GiB. A value of 0 disables the cache
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir or os.getenv(
+            "RENDER_CACHE_DIR",
+            os.path.join(tempfile.gettempdir(), "manimator", "render_cache"),
+        )
+        self.max_bytes = (
+            max_bytes
+            if max_bytes is not None
+            else int(os.getenv("RENDER_CACHE_MAX_BYTES", str(2 * 1024**3)))
+        )
+        self.manim_version = _manim_version()
+        self._stats_path = os.path.join(self.cache_dir, "stats.json")
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def key(self, code: str, scene_name: str, flags: List[str]) -> str:
+        """Computes the cache key for a render.
+
+        Args:
+            code (str): Full contents of the scene file
+            scene_name (str): Name of the scene class to render
+            flags (List[str]): Manim CLI flags affecting the output
+
+        Returns:
+            str: Hex digest identifying the render
+        """
+
+        digest = hashlib.sha256()
+        for part in (code, scene_name, self.manim_version, " ".join(flags)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.mp4")
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached video path for ``key`` or None on a miss."""
+
+        if not self.enabled:
+            return None
+        path = self._entry_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self._record("misses")
+            telemetry.count_cache("render", False)
+            return None
+        self._record("hits")
+        telemetry.count_cache("render", True)
+        return path
+
+    def put(self, key: str, video_path: str) -> Optional[str]:
+        """Stores a rendered video and evicts old entries over the size limit.
+
+        The entry is hardlinked to ``video_path`` when both live on the same
+        filesystem, so caching does not copy the video.
+
+        Args:
+            key (str): Cache key from :meth:`key`
+            video_path (str): Path of the freshly rendered video
+
+        Returns:
+            Optional[str]: Path of the cached copy, None if caching is disabled
+        """
+
+        if not self.enabled:
+            return None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._entry_path(key)
+        tmp_path = os.path.join(self.cache_dir, f"{key}.{os.getpid()}.tmp")
+        try:
+            try:
+                os.link(video_path, tmp_path)
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                    raise
+                shutil.copyfile(video_path, tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict()
+        return path
+
+    def _entries(self) -> List[os.DirEntry]:
+        try:
+            return [
+                entry
+                for entry in os.scandir(self.cache_dir)
+                if entry.name.endswith(".mp4")
+            ]
+        except FileNotFoundError:
+            return []
+
+    def evict(self):
+        """Removes least recently used entries until under ``max_bytes``."""
+
+        entries = []
+        for entry in self._entries():
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self._record("evictions")
+            except FileNotFoundError:
+                pass
+
+    @contextmanager
+    def _locked_stats(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(self._stats_path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                try:
+                    stats = json.loads(raw) if raw else {}
+                except json.JSONDecodeError:
+                    stats = {}
+                yield stats
+                f.seek(0)
+                f.truncate()
+                json.dump(stats, f)
+                # Flush while still holding the lock, not when the file closes
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _record(self, counter: str):
+        with self._locked_stats() as stats:
+            stats[counter] = stats.get(counter, 0) + 1
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and current cache occupancy."""
+
+        counters = {"hits": 0, "misses": 0, "evictions": 0}
+        try:
+            with open(self._stats_path) as f:
+                counters.update(json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        sizes = []
+        for entry in self._entries():
+            try:
+                sizes.append(entry.stat().st_size)
+            except FileNotFoundError:
+                pass
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "hit_rate": counters["hits"] / lookups if lookups else 0.0,
+            "entries": len(sizes),
+            "bytes": sum(sizes),
+            "max_bytes": self.max_bytes,
+        }
+
+
+render_cache = RenderCache()
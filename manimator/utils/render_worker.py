@@ -0,0 +1,272 @@
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import traceback
+from collections import deque
+from typing import Callable, List, Optional
+from dotenv import load_dotenv
+
+from manimator.utils.sandbox import render_sandbox
+
+load_dotenv()
+
+# Runs the manim CLI through run_cli, so the Tex cache hook is installed,
+# unless env MANIM_COMMAND names the command to run instead
+MANIM_CLI = shlex.split(os.getenv("MANIM_COMMAND", "")) or [
+    sys.executable,
+    "-m",
+    "manimator.utils.render_worker",
+    "--cli",
+]
+
+
+def run_cli(args: List[str]):
+    """Runs the manim CLI in this process with the Tex cache hook installed.
+
+    Execs the ``manim`` executable on the PATH instead when Manim cannot be
+    imported here, e.g. when the CLI is installed in another environment.
+
+    Args:
+        args (List[str]): Command line arguments for ``manim``
+    """
+
+    from manimator.utils.tex_cache import tex_cache
+
+    try:
+        tex_cache.install_hook()
+    except ImportError:
+        os.execvp("manim", ["manim", *args])
+    from manim.__main__ import main
+
+    sys.argv = ["manim", *args]
+    main()
+
+
+def run_scene(scene_file: str, scene_name: str, config: dict):
+    """Executes a scene file and renders one of its scenes in this process.
+
+    Args:
+        scene_file (str): Path to the Python file containing the scene
+        scene_name (str): Name of the scene class to render
+        config (dict): Manim config overrides applied for this render only
+
+    Returns:
+        Scene: The rendered scene instance
+    """
+
+    from manim import tempconfig
+
+    with open(scene_file) as f:
+        code = f.read()
+    with tempconfig({"input_file": scene_file, "preview": False, **config}):
+        # Each job gets a fresh namespace so scenes cannot see each other
+        namespace = {"__name__": "scene"}
+        exec(compile(code, scene_file, "exec"), namespace)
+        scene = namespace[scene_name]()
+        scene.render()
+        return scene
+
+
+def _render_request(request: dict) -> str:
+    scene = run_scene(
+        request["scene_file"],
+        request["scene_name"],
+        {
+            "media_dir": request["media_dir"],
+            "quality": request["quality"],
+            "no_latex_cleanup": True,
+        },
+    )
+    return str(scene.renderer.file_writer.movie_file_path)
+
+
+def serve():
+    """Worker loop: imports Manim once, then renders requests until stdin closes."""
+
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    import manim  # noqa: F401  (the expensive import this worker exists to amortise)
+    from manimator.utils.tex_cache import tex_cache
+
+    tex_cache.install_hook()
+
+    protocol.write(json.dumps({"ready": True}) + "\n")
+    protocol.flush()
+    for line in sys.stdin:
+        render_sandbox.limit_cpu_from_now()
+        try:
+            reply = {"ok": True, "video_path": _render_request(json.loads(line))}
+        except Exception:
+            reply = {"ok": False, "error": traceback.format_exc()}
+        protocol.write(json.dumps(reply) + "\n")
+        protocol.flush()
+
+
+class RenderWorkerError(Exception):
+    """Raised when a warm worker fails to render a scene or dies."""
+
+
+class RenderWorker:
+    """Client handle for one warm worker process.
+
+    The worker runs in its own process group within the limits of the
+    render sandbox; CPU time is limited per job. A job that overruns the
+    wall-clock timeout kills the worker, which the pool then replaces.
+    """
+
+    def __init__(self):
+        self.jobs_done = 0
+        self.on_output: Optional[Callable[[str], None]] = None
+        self.output_tail = deque(maxlen=50)
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "manimator.utils.render_worker"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            **render_sandbox.popen_kwargs(cpu_seconds=False),
+        )
+        threading.Thread(target=self._pump_output, daemon=True).start()
+        self._read_reply()
+
+    def _pump_output(self):
+        # Text mode turns tqdm's carriage returns into separate lines
+        for line in self.proc.stderr:
+            self.output_tail.append(line)
+            if self.on_output is not None:
+                self.on_output(line)
+
+    def _read_reply(self, timed_out: Optional[threading.Event] = None) -> dict:
+        line = self.proc.stdout.readline()
+        if not line:
+            output = "".join(self.output_tail)
+            limit = render_sandbox.exceeded_limit(
+                self.proc.wait(), timed_out is not None and timed_out.is_set(), output
+            )
+            if limit is not None:
+                raise RenderWorkerError(f"{output}\n{render_sandbox.limit_message(limit)}")
+            raise RenderWorkerError("Render worker exited unexpectedly:\n" + output)
+        return json.loads(line)
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def render(self, request: dict, on_output: Optional[Callable[[str], None]]) -> str:
+        self.output_tail.clear()
+        self.on_output = on_output
+        try:
+            with render_sandbox.deadline(self.proc) as timed_out:
+                self.proc.stdin.write(json.dumps(request) + "\n")
+                self.proc.stdin.flush()
+                reply = self._read_reply(timed_out)
+        except BrokenPipeError:
+            raise RenderWorkerError("Render worker is not running")
+        finally:
+            self.on_output = None
+            self.jobs_done += 1
+        if not reply["ok"]:
+            raise RenderWorkerError(reply["error"])
+        return reply["video_path"]
+
+    def close(self):
+        if self.alive:
+            self.proc.stdin.close()
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                render_sandbox.kill_group(self.proc)
+
+
+class WarmRenderPool:
+    """Pool of warm workers, recycled after a fixed number of jobs.
+
+    Spawning the ``manim`` CLI per render pays for interpreter startup and the
+    Manim import every time. A warm worker imports Manim once and then renders
+    scenes sent to it as JSON lines over its stdin, replying on its stdout;
+    Manim's own console output is redirected to stderr.
+
+    Args:
+        max_jobs: Jobs a worker renders before it is replaced, bounding leaks
+            in Manim's global state. Defaults to env RENDER_WORKER_MAX_JOBS
+            or 20
+    """
+
+    def __init__(self, max_jobs: Optional[int] = None):
+        self.max_jobs = max_jobs or int(os.getenv("RENDER_WORKER_MAX_JOBS", "20"))
+        self._idle: List[RenderWorker] = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> RenderWorker:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.alive:
+                    return worker
+        return RenderWorker()
+
+    def _release(self, worker: RenderWorker):
+        if not worker.alive or worker.jobs_done >= self.max_jobs:
+            worker.close()
+            return
+        with self._lock:
+            self._idle.append(worker)
+
+    def render(
+        self,
+        scene_file: str,
+        scene_name: str,
+        media_dir: str,
+        quality: str,
+        on_output: Optional[Callable[[str], None]] = None,
+    ) -> str:
+        """Renders a scene on a warm worker.
+
+        Args:
+            scene_file (str): Path to the Python file containing the scene
+            scene_name (str): Name of the scene class to render
+            media_dir (str): Manim media directory for the render
+            quality (str): Manim quality name, e.g. ``low_quality``
+            on_output (Optional[Callable[[str], None]]): Called with each line
+                of Manim console output
+
+        Returns:
+            str: Path to the rendered video
+
+        Raises:
+            RenderWorkerError: If the render fails or the worker dies
+        """
+
+        worker = self._acquire()
+        try:
+            return worker.render(
+                {
+                    "scene_file": scene_file,
+                    "scene_name": scene_name,
+                    "media_dir": media_dir,
+                    "quality": quality,
+                },
+                on_output,
+            )
+        finally:
+            self._release(worker)
+
+    def close(self):
+        with self._lock:
+            workers, self._idle = self._idle, []
+        for worker in workers:
+            worker.close()
+
+
+warm_render_pool = WarmRenderPool()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--cli"]:
+        run_cli(sys.argv[2:])
+    else:
+        serve()
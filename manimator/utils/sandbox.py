@@ -0,0 +1,504 @@
+import os
+import queue
+import resource
+import shutil
+import signal
+import stat
+import subprocess
+import tempfile
+import threading
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Starts the line appended to the output of a render stopped by a limit
+LIMIT_MESSAGE_PREFIX = "Render stopped: "
+
+# Memory-backed filesystem used for scratch directories in tmpfs mode
+TMPFS_ROOT = "/dev/shm"
+
+# Longest console line kept; longer ones are split, so output cannot pile up
+MAX_LINE_CHARS = 8192
+
+
+class RenderLimitError(subprocess.CalledProcessError):
+    """Raised when a sandboxed render is stopped for exceeding a limit.
+
+    Attributes:
+        limit: ``timeout``, ``cpu``, ``memory`` or ``file_size``
+    """
+
+    def __init__(self, limit: str, returncode: int, cmd: list, output: str):
+        super().__init__(returncode, cmd, stderr=output)
+        self.limit = limit
+
+
+def _env_number(name: str, default: str) -> float:
+    return float(os.getenv(name, default) or 0)
+
+
+class RenderSandbox:
+    """Runs render commands on untrusted scene code with resource limits.
+
+    Every command runs in its own process group with rlimits on CPU time,
+    address space and file size (inherited by the processes it spawns, e.g.
+    LaTeX) and a wall-clock timeout. On overrun the whole process group is
+    killed, and leftover processes are killed once the command exits. Only
+    the tail of the console output is kept in memory.
+
+    Args:
+        timeout: Wall-clock seconds per command. Defaults to env
+            RENDER_TIMEOUT or 600
+        cpu_seconds: CPU seconds per process. Defaults to env
+            RENDER_CPU_SECONDS or 900
+        memory_bytes: Address space per process. Defaults to env
+            RENDER_MEMORY_LIMIT or 8 GiB
+        max_file_bytes: Largest file a render may write. Defaults to env
+            RENDER_MAX_FILE_BYTES or 2 GiB
+
+    Any limit set to 0 is disabled.
+    """
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        cpu_seconds: Optional[int] = None,
+        memory_bytes: Optional[int] = None,
+        max_file_bytes: Optional[int] = None,
+    ):
+        self.timeout = (
+            timeout if timeout is not None else _env_number("RENDER_TIMEOUT", "600")
+        )
+        self.cpu_seconds = int(
+            cpu_seconds
+            if cpu_seconds is not None
+            else _env_number("RENDER_CPU_SECONDS", "900")
+        )
+        self.memory_bytes = int(
+            memory_bytes
+            if memory_bytes is not None
+            else _env_number("RENDER_MEMORY_LIMIT", str(8 * 1024**3))
+        )
+        self.max_file_bytes = int(
+            max_file_bytes
+            if max_file_bytes is not None
+            else _env_number("RENDER_MAX_FILE_BYTES", str(2 * 1024**3))
+        )
+
+    def apply_limits(self, cpu_seconds: bool = True):
+        """Sets the rlimits on the calling process, e.g. as a ``preexec_fn``.
+
+        Args:
+            cpu_seconds: Whether to limit CPU time. Long-lived processes
+                limit it per job instead, see :meth:`limit_cpu_from_now`
+        """
+
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        if self.memory_bytes:
+            resource.setrlimit(resource.RLIMIT_AS, (self.memory_bytes, self.memory_bytes))
+        if self.max_file_bytes:
+            resource.setrlimit(
+                resource.RLIMIT_FSIZE, (self.max_file_bytes, self.max_file_bytes)
+            )
+        if cpu_seconds and self.cpu_seconds:
+            # SIGXCPU at the soft limit, SIGKILL shortly after if it is ignored
+            resource.setrlimit(
+                resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds + 5)
+            )
+
+    def limit_cpu_from_now(self):
+        """Allows the calling process ``cpu_seconds`` more CPU time."""
+
+        if not self.cpu_seconds:
+            return
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime)
+        resource.setrlimit(
+            resource.RLIMIT_CPU, (used + self.cpu_seconds, resource.RLIM_INFINITY)
+        )
+
+    def popen_kwargs(self, cpu_seconds: bool = True) -> dict:
+        """Arguments making ``subprocess.Popen`` start a limited process group."""
+
+        return {
+            "preexec_fn": lambda: self.apply_limits(cpu_seconds),
+            "start_new_session": True,
+        }
+
+    @staticmethod
+    def kill_group(proc: subprocess.Popen):
+        """Kills the process group led by ``proc``, ignoring if it is gone."""
+
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    @contextmanager
+    def deadline(self, proc: subprocess.Popen) -> Iterator[threading.Event]:
+        """Kills ``proc``'s process group once the timeout expires.
+
+        Yields:
+            threading.Event: Set if the timeout expired
+        """
+
+        expired = threading.Event()
+
+        def expire():
+            expired.set()
+            self.kill_group(proc)
+
+        timer = threading.Timer(self.timeout, expire) if self.timeout else None
+        if timer is not None:
+            timer.daemon = True
+            timer.start()
+        try:
+            yield expired
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    def limit_message(self, limit: str) -> str:
+        """Describes a limit for the error shown to users and the repair model."""
+
+        if limit == "timeout":
+            description = f"wall-clock limit of {self.timeout:g}s"
+        elif limit == "cpu":
+            description = f"CPU time limit of {self.cpu_seconds}s"
+        elif limit == "memory":
+            description = f"memory limit of {self.memory_bytes // 1024**2} MiB"
+        else:
+            description = f"file size limit of {self.max_file_bytes // 1024**2} MiB"
+        return f"{LIMIT_MESSAGE_PREFIX}exceeded the {description}"
+
+    def exceeded_limit(
+        self, returncode: int, timed_out: bool, output: str
+    ) -> Optional[str]:
+        """Returns the limit a failed process exceeded, if any."""
+
+        if timed_out:
+            return "timeout"
+        if returncode == -signal.SIGXCPU:
+            return "cpu"
+        # Python ignores SIGXFSZ, so its writes fail with EFBIG instead
+        if returncode == -signal.SIGXFSZ or "File too large" in output:
+            return "file_size"
+        if self.memory_bytes and "MemoryError" in output:
+            return "memory"
+        return None
+
+    def run(
+        self,
+        cmd: List[str],
+        on_output: Optional[Callable[[str], None]] = None,
+        tail_lines: int = 50,
+    ) -> str:
+        """Runs a command inside the sandbox.
+
+        Args:
+            cmd (List[str]): Command to run
+            on_output (Optional[Callable[[str], None]]): Called with each line
+                of the command's combined stdout and stderr
+            tail_lines (int): Lines of output kept for the return value and
+                errors
+
+        Returns:
+            str: The last ``tail_lines`` lines of output
+
+        Raises:
+            RenderLimitError: If the command exceeded a limit
+            subprocess.CalledProcessError: If the command failed otherwise,
+                with the tail of its output as ``stderr``
+        """
+
+        tail = deque(maxlen=tail_lines)
+        # Text mode translates tqdm's carriage returns into line breaks
+        with subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",
+            **self.popen_kwargs(),
+        ) as proc:
+            try:
+                with self.deadline(proc) as expired:
+                    for line in iter(lambda: proc.stdout.readline(MAX_LINE_CHARS), ""):
+                        tail.append(line)
+                        if on_output is not None:
+                            on_output(line)
+                    proc.wait()
+            finally:
+                self.kill_group(proc)
+
+        output = "".join(tail)
+        if proc.returncode:
+            limit = self.exceeded_limit(proc.returncode, expired.is_set(), output)
+            if limit is not None:
+                raise RenderLimitError(
+                    limit, proc.returncode, cmd, f"{output}\n{self.limit_message(limit)}"
+                )
+            raise subprocess.CalledProcessError(proc.returncode, cmd, stderr=output)
+        return output
+
+
+def remove_tree(path: str):
+    """Deletes a directory tree, including read-only files and directories."""
+
+    def make_writable(function, failed_path, exc_info):
+        if isinstance(exc_info[1], FileNotFoundError):
+            return
+        try:
+            os.chmod(os.path.dirname(failed_path), stat.S_IRWXU)
+            if os.path.isdir(failed_path) and not os.path.islink(failed_path):
+                os.chmod(failed_path, stat.S_IRWXU)
+            function(failed_path)
+        except OSError:
+            pass  # left for the next orphan sweep
+
+    shutil.rmtree(path, onerror=make_writable)
+
+
+def directory_usage(path: str, since: Optional[float] = None) -> Tuple[int, int]:
+    """Counts the files in a directory tree and their total size.
+
+    Args:
+        path (str): Root of the tree
+        since (Optional[float]): Only count files modified at or after this
+            timestamp, e.g. to measure one render in a reused directory
+
+    Returns:
+        Tuple[int, int]: Number of files and their total size in bytes
+    """
+
+    files = size = 0
+    pending = [path]
+    while pending:
+        try:
+            entries = list(os.scandir(pending.pop()))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                pending.append(entry.path)
+                continue
+            try:
+                info = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if since is None or info.st_mtime >= since:
+                files += 1
+                size += info.st_size
+    return files, size
+
+
+def _owner_alive(name: str) -> bool:
+    """Whether the process whose pid starts ``name`` is still running."""
+
+    pid = name.split("-", 1)[0]
+    if not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # alive, owned by another user
+    return True
+
+
+class DirectoryReaper:
+    """Deletes directory trees on a background thread.
+
+    A tree is first renamed into a ``.trash`` folder beside it, which is
+    instant, so callers never wait for thousands of partial movie files to
+    be unlinked. Trees a dead process left in the trash are removed by
+    :meth:`sweep`.
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        # Threads do not survive a fork, so forked workers start their own
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            try:
+                remove_tree(path)
+            finally:
+                self._queue.task_done()
+
+    def reap(self, path: str):
+        """Moves ``path`` out of the way and deletes it in the background."""
+
+        trash = os.path.join(os.path.dirname(path), ".trash")
+        target = os.path.join(trash, f"{os.getpid()}-{uuid.uuid4().hex}")
+        try:
+            os.makedirs(trash, exist_ok=True)
+            os.rename(path, target)
+        except FileNotFoundError:
+            return
+        except OSError:
+            target = path  # e.g. a mount point, deleted in place
+        self._ensure_thread()
+        self._queue.put(target)
+
+    def sweep(self, root: str):
+        """Deletes trees in ``root``'s trash whose process is gone."""
+
+        try:
+            entries = list(os.scandir(os.path.join(root, ".trash")))
+        except FileNotFoundError:
+            return
+        stale = [entry.path for entry in entries if not _owner_alive(entry.name)]
+        if stale:
+            self._ensure_thread()
+            for path in stale:
+                self._queue.put(path)
+
+    def wait(self):
+        """Blocks until every queued tree is deleted."""
+
+        if self._queue.unfinished_tasks:
+            self._ensure_thread()  # the trees may have been queued before a fork
+        self._queue.join()
+
+
+class ScratchPool:
+    """Pre-created scratch directories for renders, deleted in the background.
+
+    Renders get an empty directory created ahead of time. On release the
+    directory is handed to the :class:`DirectoryReaper` and a fresh one takes
+    its place, so neither creating nor deleting a tree is on the critical
+    path. Directories are owned by the process that created them (their
+    names start with its pid), so the render worker processes never share
+    one; directories left behind by processes that died are removed.
+
+    With ``tmpfs`` the directories live in ``/dev/shm``, keeping Manim's
+    partial movie files and caches off the disk. A render falls back to the
+    on-disk root when less than ``tmpfs_min_free`` bytes are free there.
+
+    Args:
+        root: Parent of the on-disk scratch directories. Defaults to env
+            RENDER_SCRATCH_DIR or a ``manimator/scratch`` folder in the
+            system temp directory
+        size: Empty directories kept ready per process. Defaults to env
+            RENDER_SCRATCH_POOL or 4
+        tmpfs: Whether to use ``/dev/shm``. Defaults to env
+            RENDER_SCRATCH_TMPFS or off
+        tmpfs_min_free: Defaults to env RENDER_TMPFS_MIN_FREE or 1 GiB
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        size: Optional[int] = None,
+        tmpfs: Optional[bool] = None,
+        tmpfs_min_free: Optional[int] = None,
+    ):
+        self.disk_root = root or os.getenv(
+            "RENDER_SCRATCH_DIR",
+            os.path.join(tempfile.gettempdir(), "manimator", "scratch"),
+        )
+        self.size = size if size is not None else int(os.getenv("RENDER_SCRATCH_POOL", "4"))
+        if tmpfs is None:
+            tmpfs = os.getenv("RENDER_SCRATCH_TMPFS", "0") == "1"
+        self.tmpfs = tmpfs and os.path.isdir(TMPFS_ROOT)
+        if tmpfs and not self.tmpfs:
+            print(f"{TMPFS_ROOT} is not available, render scratch stays on disk")
+        self.tmpfs_min_free = tmpfs_min_free or int(
+            os.getenv("RENDER_TMPFS_MIN_FREE", str(1024**3))
+        )
+        self.root = (
+            os.path.join(TMPFS_ROOT, "manimator", "scratch") if self.tmpfs else self.disk_root
+        )
+        self._idle: List[str] = []
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _new_dir(self, root: Optional[str] = None) -> str:
+        root = root or self.root
+        os.makedirs(root, exist_ok=True)
+        return tempfile.mkdtemp(prefix=f"{os.getpid()}-", dir=root)
+
+    def _remove_orphans(self):
+        for root in {self.root, self.disk_root}:
+            try:
+                entries = list(os.scandir(root))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.name != ".trash" and not _owner_alive(entry.name):
+                    directory_reaper.reap(entry.path)
+            directory_reaper.sweep(root)
+
+    def _ensure_owned(self):
+        # Forked workers inherit the parent's idle list, which is not theirs
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = []
+            self._remove_orphans()
+            self._idle = [self._new_dir() for _ in range(self.size)]
+
+    def prepare(self):
+        """Creates this process's idle directories ahead of its first render."""
+
+        with self._lock:
+            self._ensure_owned()
+
+    def tmpfs_full(self) -> bool:
+        """Whether renders should fall back to disk for lack of tmpfs space."""
+
+        usage = os.statvfs(TMPFS_ROOT)
+        return usage.f_bavail * usage.f_frsize < self.tmpfs_min_free
+
+    @contextmanager
+    def acquire(self) -> Iterator[str]:
+        """Lends an empty scratch directory for the duration of the context.
+
+        Yields:
+            str: Path to the directory
+        """
+
+        with self._lock:
+            self._ensure_owned()
+            path = self._idle.pop() if self._idle else None
+        if self.tmpfs and self.tmpfs_full():
+            if path is not None:
+                with self._lock:
+                    self._idle.append(path)
+            path = self._new_dir(self.disk_root)
+        elif path is None or not os.path.isdir(path):
+            path = self._new_dir()
+        try:
+            yield path
+        finally:
+            directory_reaper.reap(path)
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(self._new_dir())
+
+    def close(self):
+        """Removes this process's idle directories."""
+
+        with self._lock:
+            paths, self._idle = self._idle, []
+        for path in paths:
+            directory_reaper.reap(path)
+
+
+directory_reaper = DirectoryReaper()
+render_sandbox = RenderSandbox()
+scratch_pool = ScratchPool()
@@ -1,11 +1,102 @@
+import fcntl
 import os
 import re
 import subprocess
 import tempfile
+import time
 from contextlib import contextmanager
-from typing import Optional
+from typing import Callable, Optional
 from fastapi import HTTPException
 
+from manimator.utils.artifacts import artifact_store
+from manimator.utils.parallel_render import render_in_chunks
+from manimator.utils.render_cache import render_cache
+from manimator.utils.render_worker import (
+    MANIM_CLI,
+    RenderWorkerError,
+    warm_render_pool,
+)
+from manimator.utils.sandbox import (
+    TMPFS_ROOT,
+    directory_reaper,
+    directory_usage,
+    render_sandbox,
+    scratch_pool,
+)
+from manimator.utils.telemetry import telemetry
+from manimator.utils.tex_cache import tex_cache
+
+# Named render profiles mapped to Manim quality names and their CLI letter
+QUALITY_PROFILES = {
+    "preview": ("low_quality", "l"),  # 854x480, 15fps
+    "720p30": ("medium_quality", "m"),
+    "1080p60": ("high_quality", "h"),
+    "4k": ("fourk_quality", "k"),
+}
+
+# Output layout written to each render's manim.cfg. Videos land directly in
+# {media_dir}/videos regardless of quality, so their path never needs guessing.
+# Parallel chunks have media directories of their own but share the render's
+# Tex and text folders. LaTeX intermediates are kept: the scratch directory is
+# deleted anyway, and their .tex files tell the Tex cache which formulas a
+# render used.
+MANIM_CFG = """[CLI]
+video_dir = {{media_dir}}/videos
+tex_dir = {render_dir}/Tex
+text_dir = {render_dir}/texts
+no_latex_cleanup = True
+"""
+
+# Session ids become directory names
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# tqdm progress bar line, e.g. "Animation 3: Create(Circle):  50%|##  | 30/60 [...]"
+PROGRESS_PATTERN = re.compile(r"Animation (\d+)\s*:.*\|\s*(\d+)/(\d+)")
+
+
+def parse_render_progress(line: str) -> Optional[dict]:
+    """Parses a line of Manim output into a progress event.
+
+    Args:
+        line (str): A single line (or carriage-return segment) of output
+
+    Returns:
+        Optional[dict]: ``animation``, ``frame`` and ``total_frames`` if the
+            line is a progress bar update, None otherwise
+    """
+
+    match = PROGRESS_PATTERN.search(line)
+    if not match:
+        return None
+    animation, frame, total = (int(group) for group in match.groups())
+    return {"animation": animation, "frame": frame, "total_frames": total}
+
+
+def progress_line_handler(on_progress: Callable[[dict], None]) -> Callable[[str], None]:
+    """Wraps a progress callback into a handler for raw Manim output lines.
+
+    Events are throttled to roughly every 10% of an animation.
+    """
+
+    last = None
+
+    def handle(line: str):
+        nonlocal last
+        event = parse_render_progress(line)
+        if event is None:
+            return
+        step = max(event["total_frames"] // 10, 1)
+        if (
+            last is None
+            or event["animation"] != last["animation"]
+            or event["frame"] == event["total_frames"]
+            or event["frame"] - last["frame"] >= step
+        ):
+            on_progress(event)
+            last = event
+
+    return handle
+
 
 class ManimProcessor:
     """Handles Manim animation processing, including code extraction and video rendering.
@@ -14,30 +105,149 @@ class ManimProcessor:
     - Creating temporary directories for processing
     - Extracting Python code from model response
     - Saving and rendering Manim scenes
+    - Serving repeated renders of identical code from the render cache
+
+    Scenes are rendered by spawning the ``manim`` CLI, or, with env
+    RENDER_MODE=warm, on long-lived workers that keep Manim imported, both
+    inside the resource limits of
+    :class:`manimator.utils.sandbox.RenderSandbox`. With
+    env RENDER_PARALLEL_CHUNKS above 1, CLI renders are split into that many
+    animation ranges rendered on separate cores and concatenated.
+
+    Renders belonging to a session (a job that asked for one and its
+    re-renders) share a persistent media directory under env
+    RENDER_SESSION_DIR, so Manim's partial movie cache skips ``play`` calls
+    unchanged since the previous render. In tmpfs mode (see
+    :class:`manimator.utils.sandbox.ScratchPool`) new sessions start in
+    ``/dev/shm`` instead. Sessions idle for longer than env
+    RENDER_SESSION_TTL seconds are removed, as are the least recently used
+    ones once all sessions together exceed env RENDER_SESSION_MAX_BYTES.
+
+    Compiled ``Tex``, ``MathTex`` and ``Text`` SVGs are shared between
+    renders through :class:`manimator.utils.tex_cache.TexCache`.
     """
 
+    def __init__(
+        self, render_mode: Optional[str] = None, parallel_chunks: Optional[int] = None
+    ):
+        self.render_mode = render_mode or os.getenv("RENDER_MODE", "cli")
+        self.parallel_chunks = parallel_chunks or int(
+            os.getenv("RENDER_PARALLEL_CHUNKS", "1")
+        )
+        self.session_root = os.getenv(
+            "RENDER_SESSION_DIR",
+            os.path.join(tempfile.gettempdir(), "manimator", "sessions"),
+        )
+        self.session_roots = [self.session_root]
+        if scratch_pool.tmpfs:
+            tmpfs_root = os.path.join(TMPFS_ROOT, "manimator", "sessions")
+            self.session_roots.insert(0, tmpfs_root)
+        self.session_ttl = float(os.getenv("RENDER_SESSION_TTL", "21600"))
+        self.session_max_bytes = int(
+            os.getenv("RENDER_SESSION_MAX_BYTES", str(2 * 1024**3))
+        )
+
     @contextmanager
     def create_temp_dir(self):
-        """Creates and manages a temporary directory for processing Manim files.
+        """Provides an empty scratch directory for processing Manim files.
 
         Yields:
-            str: Path to the temporary directory
+            str: Path to the scratch directory
 
         Note:
-            Automatically cleans up directory and contents when context exits
+            The directory comes from a pool of pre-created ones and is
+            deleted in the background when the context exits, see
+            :class:`manimator.utils.sandbox.ScratchPool`
         """
 
-        temp_dir = tempfile.mkdtemp()
-        try:
+        with scratch_pool.acquire() as temp_dir:
             yield temp_dir
-        finally:
-            if os.path.exists(temp_dir):
-                for root, dirs, files in os.walk(temp_dir, topdown=False):
-                    for name in files:
-                        os.remove(os.path.join(root, name))
-                    for name in dirs:
-                        os.rmdir(os.path.join(root, name))
-                os.rmdir(temp_dir)
+
+    @contextmanager
+    def session_dir(self, session_id: str):
+        """Provides the persistent media directory of a render session.
+
+        The directory is locked for the duration of the context, so renders
+        of the same session running in different processes take turns.
+        Sessions are pruned on exit, see :meth:`prune_sessions`.
+
+        Args:
+            session_id (str): Identifier of the session, e.g. a job id
+
+        Yields:
+            str: Path to the session directory
+
+        Raises:
+            ValueError: If ``session_id`` is not a safe directory name
+        """
+
+        if not SESSION_ID_PATTERN.match(session_id):
+            raise ValueError(f"Invalid render session id: {session_id!r}")
+        path = self._session_path(session_id)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                os.utime(path)
+                yield path
+            finally:
+                os.utime(path)
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        self.prune_sessions()
+
+    def _session_path(self, session_id: str) -> str:
+        # A session stays in the root it started in
+        for root in self.session_roots:
+            path = os.path.join(root, session_id)
+            if os.path.isdir(path):
+                return path
+        if scratch_pool.tmpfs and scratch_pool.tmpfs_full():
+            return os.path.join(self.session_root, session_id)
+        return os.path.join(self.session_roots[0], session_id)
+
+    def prune_sessions(self):
+        """Deletes session directories unused for longer than ``session_ttl``.
+
+        Then deletes the least recently used sessions until the rest fit
+        ``session_max_bytes`` (0 disables the cap). Sessions that are
+        rendering right now are skipped. Sessions in tmpfs and on disk
+        count towards the same cap. Deleted sessions a dead process left in
+        the trash are removed too.
+        """
+
+        entries = []
+        for root in self.session_roots:
+            directory_reaper.sweep(root)
+            try:
+                entries += [
+                    entry
+                    for entry in os.scandir(root)
+                    if entry.is_dir() and entry.name != ".trash"
+                ]
+            except FileNotFoundError:
+                continue
+        sessions = []
+        for entry in entries:
+            try:
+                sessions.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+        sessions.sort()
+        sizes = {}
+        if self.session_max_bytes > 0:
+            sizes = {path: directory_usage(path)[1] for _, path in sessions}
+        total = sum(sizes.values())
+        cutoff = time.time() - self.session_ttl
+        for mtime, path in sessions:
+            if mtime > cutoff and total <= self.session_max_bytes:
+                break
+            try:
+                with open(os.path.join(path, ".lock"), "a") as lock:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    directory_reaper.reap(path)
+            except (BlockingIOError, FileNotFoundError):
+                continue
+            total -= sizes.get(path, 0)
 
     def extract_code(self, response: str) -> Optional[str]:
         """Extracts Python code blocks from the model's response.
@@ -71,7 +281,13 @@ class ManimProcessor:
         return scene_file
 
     def render_scene(
-        self, scene_file: str, scene_name: str, temp_dir: str
+        self,
+        scene_file: str,
+        scene_name: str,
+        temp_dir: str,
+        on_progress: Optional[Callable[[dict], None]] = None,
+        quality: str = "preview",
+        incremental: bool = False,
     ) -> Optional[str]:
         """Renders a Manim scene to video.
 
@@ -79,36 +295,100 @@ class ManimProcessor:
             scene_file (str): Path to the Python file containing the scene
             scene_name (str): Name of the scene class to render
             temp_dir (str): Directory for output media files
+            on_progress (Optional[Callable[[dict], None]]): Called with events
+                from :func:`parse_render_progress` while manim renders
+            quality (str): Name of a profile in ``QUALITY_PROFILES``.
+                Defaults to "preview"
+            incremental (bool): ``temp_dir`` is a session directory holding
+                the partial movie files of earlier renders. The scene is then
+                rendered in one piece, since parallel chunk boundaries shift
+                between edits and would scatter the partial movie cache
 
         Returns:
-            Optional[str]: Path to rendered video file if successful, None otherwise
+            Optional[str]: Path to the rendered video in the artifact store if
+                successful, None otherwise
 
         Raises:
             HTTPException: If rendering fails with status code 500
+
+        Note:
+            Renders of byte-identical code with the same settings are served
+            from the render cache without invoking manim
         """
 
-        cmd = [
-            "manim",
-            "-pql",
-            "--media_dir",
-            temp_dir,
-            scene_file,
-            scene_name,
-        ]
+        quality_name, quality_flag = QUALITY_PROFILES[quality]
+        flags = ["--quality", quality_flag]
+        config_file = os.path.join(temp_dir, "manim.cfg")
+        with open(config_file, "w") as f:
+            f.write(MANIM_CFG.format(render_dir=temp_dir))
+
+        def build_cmd(media_dir: str, extra_args: list) -> list:
+            return [
+                *MANIM_CLI,
+                *flags,
+                "--config_file",
+                config_file,
+                "--media_dir",
+                media_dir,
+                *extra_args,
+                scene_file,
+                scene_name,
+            ]
+
+        def video_path_in(media_dir: str) -> str:
+            return os.path.join(media_dir, "videos", f"{scene_name}.mp4")
+
+        with open(scene_file) as f:
+            cache_key = render_cache.key(f.read(), scene_name, flags)
+        cached_path = render_cache.get(cache_key)
+        if cached_path:
+            try:
+                with telemetry.span("artifact_store", cached=True):
+                    return artifact_store.link(cached_path)
+            except FileNotFoundError:
+                pass  # evicted between lookup and copy, render it again
 
+        on_output = progress_line_handler(on_progress) if on_progress else None
         try:
-            subprocess.run(cmd, check=True, capture_output=True, text=True)
-            video_path = os.path.join(
-                temp_dir, "videos", "scene", "480p15", f"{scene_name}.mp4"
-            )
+            if self.render_mode == "warm":
+                video_path = warm_render_pool.render(
+                    scene_file, scene_name, temp_dir, quality_name, on_output
+                )
+            elif self.parallel_chunks > 1 and not incremental:
+                video_path = render_in_chunks(
+                    scene_file,
+                    scene_name,
+                    temp_dir,
+                    build_cmd,
+                    video_path_in,
+                    self.parallel_chunks,
+                    lambda cmd: self._run_manim(cmd, on_output),
+                )
+            else:
+                self._run_manim(build_cmd(temp_dir, []), on_output)
+                video_path = video_path_in(temp_dir)
 
-            if not os.path.exists(video_path):
+            if not video_path or not os.path.exists(video_path):
                 return None
 
-            temp_video = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-            with open(video_path, "rb") as f:
-                temp_video.write(f.read())
-            return temp_video.name
+            render_cache.put(cache_key, video_path)
+            with telemetry.span("artifact_store", cached=False):
+                return artifact_store.store(video_path)
 
         except subprocess.CalledProcessError as e:
             raise HTTPException(status_code=500, detail=f"Render error: {e.stderr}")
+        except RenderWorkerError as e:
+            raise HTTPException(status_code=500, detail=f"Render error: {e}")
+        finally:
+            # Formulas compiled before a failure are still worth keeping
+            tex_cache.publish(temp_dir)
+
+    def _run_manim(self, cmd: list, on_output: Optional[Callable[[str], None]]):
+        """Runs manim in the render sandbox.
+
+        Raises:
+            subprocess.CalledProcessError: If manim fails or exceeds a limit,
+                with the tail of its output as ``stderr``
+        """
+
+        render_sandbox.run(cmd, on_output)
@@ -0,0 +1,308 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from manimator.utils.telemetry import telemetry
+
+load_dotenv()
+
+# Filler words of animation requests, ignored by the TF-IDF embedder so that
+# "Explain X" and "Create an animation of X" compare on X alone
+STOP_WORDS = frozenset(
+    """
+    a about an and animate animation are as at be can create describe do does
+    explain for from how i illustrate in is it make me of on please show that
+    the this to video visualise visualize what with you
+    """.split()
+)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class TfidfEmbedder:
+    """Dependency free embedder comparing prompts by TF-IDF weighted words.
+
+    Document frequencies are taken from the indexed prompts, so words shared
+    by many past prompts count for little. Only catches rewordings that
+    share their key terms; paraphrases need :class:`SentenceEmbedder`.
+    """
+
+    name = "tfidf"
+
+    def __init__(self):
+        self.documents = 0
+        self.document_frequency: Counter = Counter()
+
+    @staticmethod
+    def embed(text: str) -> Counter:
+        terms = Counter()
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            if token in STOP_WORDS:
+                continue
+            if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+                token = token[:-1]
+            terms[token] += 1
+        return terms
+
+    def add(self, vector: Counter):
+        self.documents += 1
+        self.document_frequency.update(vector.keys())
+
+    def remove(self, vector: Counter):
+        self.documents -= 1
+        self.document_frequency.subtract(vector.keys())
+
+    def _weigh(self, vector: Counter) -> Tuple[dict, float]:
+        weights = {
+            term: count
+            * (math.log((1 + self.documents) / (1 + self.document_frequency[term])) + 1)
+            for term, count in vector.items()
+        }
+        return weights, math.sqrt(sum(w * w for w in weights.values()))
+
+    def similarities(self, query: Counter, vectors: List[Counter]) -> List[float]:
+        query_weights, query_norm = self._weigh(query)
+        scores = []
+        for vector in vectors:
+            weights, norm = self._weigh(vector)
+            dot = sum(w * weights.get(term, 0.0) for term, w in query_weights.items())
+            scores.append(dot / (query_norm * norm) if query_norm and norm else 0.0)
+        return scores
+
+
+class SentenceEmbedder:
+    """Embeds prompts with a local ``sentence-transformers`` model.
+
+    The model is only loaded from disk (or the Hugging Face cache), never
+    downloaded, so lookups work offline.
+
+    Args:
+        model_name: Model name or path, e.g. ``all-MiniLM-L6-v2``
+
+    Raises:
+        ImportError: If ``sentence-transformers`` is not installed
+        OSError: If the model is not available locally
+    """
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.name = model_name
+        self.model = SentenceTransformer(model_name, local_files_only=True)
+
+    def embed(self, text: str):
+        return self.model.encode(text, normalize_embeddings=True)
+
+    def add(self, vector):
+        pass
+
+    def remove(self, vector):
+        pass
+
+    def similarities(self, query, vectors: list) -> List[float]:
+        import numpy as np
+
+        if not vectors:
+            return []
+        return [float(score) for score in np.vstack(vectors) @ query]
+
+
+@dataclass
+class SemanticEntry:
+    """A finished video indexed by the prompt it was generated from."""
+
+    prompt: str
+    quality: str
+    job_id: str
+    video_path: str
+    code: Optional[str]
+    scene_name: Optional[str]
+    vector: Any = field(repr=False)
+    created_at: float = field(default_factory=time.time)
+
+
+class SemanticCache:
+    """In-memory index of past prompts and their finished videos.
+
+    Exact-match caches miss paraphrased prompts ("What is a CNN?" and
+    "Explain convolutional neural networks"). This index embeds every prompt
+    whose job completed and, for a new prompt, finds the most similar one
+    rendered at the same quality. In ``offer`` mode the match is only
+    reported to the client; in ``serve`` mode its video is returned instead
+    of generating a new one. Lookups are timed as the ``semantic_lookup``
+    stage and counted as the ``semantic`` cache.
+
+    Prompts are embedded with a local ``sentence-transformers`` model when
+    one is configured, otherwise with :class:`TfidfEmbedder`. Like the jobs
+    it points at, the index lives in the server process.
+
+    Args:
+        mode: ``off``, ``offer`` or ``serve``. Defaults to env SEMANTIC_CACHE
+            or ``off``
+        threshold: Cosine similarity a match needs. Defaults to env
+            SEMANTIC_CACHE_THRESHOLD or 0.85
+        model_name: ``sentence-transformers`` model name or path; TF-IDF is
+            used when unset or when the model cannot be loaded. Defaults to
+            env SEMANTIC_CACHE_MODEL
+        max_entries: Prompts kept before the oldest is dropped. Defaults to
+            env SEMANTIC_CACHE_MAX_ENTRIES or 1000
+    """
+
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        threshold: Optional[float] = None,
+        model_name: Optional[str] = None,
+        max_entries: Optional[int] = None,
+    ):
+        self.mode = (mode or os.getenv("SEMANTIC_CACHE", "off")).lower()
+        self.threshold = (
+            threshold
+            if threshold is not None
+            else float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+        )
+        self.model_name = model_name or os.getenv("SEMANTIC_CACHE_MODEL", "")
+        self.max_entries = max_entries or int(
+            os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000")
+        )
+        self.entries: "OrderedDict[Tuple[str, str], SemanticEntry]" = OrderedDict()
+        self._embedder = None
+        self._embedder_lock = threading.Lock()
+        # Guards the entries; prompts are embedded before taking it, so
+        # lookups never wait for another thread's embedding
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+        self._lookup_seconds: List[float] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("offer", "serve")
+
+    @property
+    def serves(self) -> bool:
+        return self.mode == "serve"
+
+    @property
+    def embedder(self):
+        # Loaded on first use so importing the API stays fast
+        with self._embedder_lock:
+            if self._embedder is None:
+                embedder = None
+                if self.model_name:
+                    try:
+                        embedder = SentenceEmbedder(self.model_name)
+                    except Exception as e:
+                        print(f"Semantic cache falls back to TF-IDF, cannot load {self.model_name}: {e}")
+                self._embedder = embedder or TfidfEmbedder()
+            return self._embedder
+
+    @staticmethod
+    def _key(prompt: str, quality: str) -> Tuple[str, str]:
+        return " ".join(prompt.lower().split()), quality
+
+    def _drop(self, key: Tuple[str, str]):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.embedder.remove(entry.vector)
+
+    def add(
+        self,
+        prompt: str,
+        quality: str,
+        job_id: str,
+        video_path: str,
+        code: Optional[str] = None,
+        scene_name: Optional[str] = None,
+    ):
+        """Indexes the video a prompt produced, replacing an identical prompt.
+
+        Args:
+            prompt (str): Prompt of the finished job
+            quality (str): Quality profile the video was rendered at
+            job_id (str): The finished job
+            video_path (str): Artifact path of its video
+            code (Optional[str]): Scene code of the video
+            scene_name (Optional[str]): Name of its scene class
+        """
+
+        if not self.enabled or not prompt:
+            return
+        key = self._key(prompt, quality)
+        vector = self.embedder.embed(prompt)
+        with self._lock:
+            self._drop(key)
+            self.entries[key] = SemanticEntry(
+                prompt, quality, job_id, video_path, code, scene_name, vector
+            )
+            self.embedder.add(vector)
+            while len(self.entries) > self.max_entries:
+                self._drop(next(iter(self.entries)))
+
+    def lookup(self, prompt: str, quality: str) -> Optional[Tuple[SemanticEntry, float]]:
+        """Finds the most similar indexed prompt rendered at ``quality``.
+
+        Entries whose video has been evicted are dropped on the way.
+
+        Args:
+            prompt (str): Incoming prompt
+            quality (str): Quality profile the caller wants
+
+        Returns:
+            Optional[Tuple[SemanticEntry, float]]: The best entry and its
+                cosine similarity, None when nothing reaches ``threshold``
+        """
+
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        with telemetry.span("semantic_lookup", backend=self.embedder.name):
+            query = self.embedder.embed(prompt)
+            with self._lock:
+                candidates = []
+                for key, entry in list(self.entries.items()):
+                    if entry.quality != quality:
+                        continue
+                    if not os.path.exists(entry.video_path):
+                        self._drop(key)
+                        continue
+                    candidates.append(entry)
+                best = None
+                if candidates:
+                    scores = self.embedder.similarities(
+                        query, [entry.vector for entry in candidates]
+                    )
+                    score, entry = max(
+                        zip(scores, candidates), key=lambda pair: pair[0]
+                    )
+                    if score >= self.threshold:
+                        best = entry, score
+                        self.entries.move_to_end(self._key(entry.prompt, entry.quality))
+                self.counters["hits" if best else "misses"] += 1
+                self._lookup_seconds = self._lookup_seconds[-999:] + [
+                    time.perf_counter() - start
+                ]
+        telemetry.count_cache("semantic", best is not None)
+        return best
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        seconds = sorted(self._lookup_seconds)
+        return {
+            "mode": self.mode,
+            "backend": self._embedder.name if self._embedder else None,
+            "threshold": self.threshold,
+            "entries": len(self.entries),
+            **self.counters,
+            "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+            "lookup_ms_p50": seconds[len(seconds) // 2] * 1000 if seconds else None,
+            "lookup_ms_max": seconds[-1] * 1000 if seconds else None,
+        }
+
+
+semantic_cache = SemanticCache()
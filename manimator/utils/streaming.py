@@ -0,0 +1,149 @@
+import json
+from queue import Empty
+from typing import AsyncIterator, Optional
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from manimator.api.animation_generation import stream_animation_response
+from manimator.utils.jobs import Job, JobManager, extract_code
+from manimator.utils.code_validator import CodeValidationError, validate_scene_code
+
+
+async def stream_animation_events(
+    prompt: str,
+    job_manager: JobManager,
+    use_cache: bool = True,
+    quality: str = "preview",
+    preview_first: bool = False,
+    session: bool = False,
+    description: Optional[str] = None,
+) -> AsyncIterator[dict]:
+    """Generates and renders an animation, reporting each phase as it happens.
+
+    Code generation streams model tokens as they arrive; the render then runs
+    on the job manager's worker pool while its progress is relayed. Code that
+    fails validation or rendering is repaired on the worker rather than
+    regenerated, and each repair attempt is reported.
+
+    Args:
+        prompt (str): Text description of the desired animation
+        job_manager (JobManager): Pool the render is queued on
+        use_cache (bool): Whether cached LLM responses may be reused
+        quality (str): Render quality profile
+        preview_first (bool): Render at "preview" quality first and report
+            ``done`` for it; the requested quality replaces the job's video
+            in the background, see :meth:`JobManager.submit`
+        session (bool): Render in a persistent session directory so
+            re-renders of edited code are incremental
+        description (Optional[str]): Scene description to generate the code
+            from. Defaults to ``prompt``, which the semantic cache matches
+            and indexes either way
+
+    Yields:
+        dict: Events with an ``event`` name and a ``data`` payload, in order:
+            ``similar`` when the semantic cache found a near-duplicate
+            prompt, ``token`` (repeated), ``code``, ``job``, ``progress`` and
+            ``repair`` (repeated, interleaved) and finally ``done`` or
+            ``error``. ``done`` carries the final, possibly repaired, code.
+            A served semantic match skips straight to ``job`` and ``done``
+    """
+
+    if use_cache:
+        served, match = await run_in_threadpool(
+            job_manager.match_prompt, prompt, quality
+        )
+        if match is not None:
+            yield {"event": "similar", "data": match}
+        if served is not None:
+            yield {"event": "job", "data": served.to_dict()}
+            yield _done_event(served)
+            return
+
+    try:
+        chunks = []
+        async for text in stream_animation_response(
+            description or prompt, use_cache=use_cache
+        ):
+            chunks.append(text)
+            yield {"event": "token", "data": {"text": text}}
+
+        code = extract_code("".join(chunks))
+        try:
+            scene_name = await run_in_threadpool(validate_scene_code, code)
+        except CodeValidationError:
+            scene_name = None  # the worker repairs it before rendering
+        yield {"event": "code", "data": {"code": code, "scene_name": scene_name}}
+
+        queue = job_manager.progress_queue()
+        job = job_manager.submit_render(
+            prompt,
+            code,
+            scene_name,
+            queue,
+            quality,
+            preview_first=preview_first,
+            session=session,
+            description=description,
+        )
+    except HTTPException as e:
+        yield {"event": "error", "data": {"detail": e.detail}}
+        return
+
+    async for event in relay_job_events(job, queue):
+        yield event
+
+
+async def relay_job_events(job: Job, queue) -> AsyncIterator[dict]:
+    """Reports a queued render job until it finishes.
+
+    Args:
+        job (Job): The queued job
+        queue: Progress queue the job's worker publishes to
+
+    Yields:
+        dict: ``job``, then ``progress`` and ``repair`` events (repeated,
+            interleaved) and finally ``done`` or ``error``
+    """
+
+    yield {"event": "job", "data": job.to_dict()}
+    while True:
+        # Workers publish before the job finishes, so once it has, whatever
+        # is left in the queue is drained without waiting
+        finished = job.status != "pending"
+        try:
+            progress = await run_in_threadpool(
+                queue.get, block=not finished, timeout=0.5
+            )
+        except Empty:
+            if finished:
+                break
+            continue
+        if "repair" in progress:
+            yield {"event": "repair", "data": progress["repair"]}
+        else:
+            yield {"event": "progress", "data": progress}
+
+    if job.status == "completed":
+        yield _done_event(job)
+    else:
+        yield {"event": "error", "data": {"detail": job.error, "repairs": job.repairs}}
+
+
+def _done_event(job: Job) -> dict:
+    return {
+        "event": "done",
+        "data": {
+            "job_id": job.id,
+            "video_path": job.video_path,
+            "quality": job.quality,
+            "upgrade_quality": job.upgrade_quality,
+            "code": job.code,
+            "repairs": job.repairs,
+        },
+    }
+
+
+def format_sse(event: dict) -> str:
+    """Formats an event from :func:`stream_animation_events` for SSE."""
+
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
@@ -1,3 +1,20 @@
+import os
+
+# Prompt sets selectable with env PROMPT_VARIANT
+PROMPT_VARIANTS = ("full", "compact")
+
+
+def prompt_variant() -> str:
+    """Returns the prompt set selected by env PROMPT_VARIANT, ``full`` by default."""
+
+    variant = os.getenv("PROMPT_VARIANT", "full")
+    if variant not in PROMPT_VARIANTS:
+        raise ValueError(
+            f"Unknown PROMPT_VARIANT {variant!r}, expected one of {PROMPT_VARIANTS}"
+        )
+    return variant
+
+
 MANIM_SYSTEM_PROMPT = """```You are an expert in creating educational animations using Manim. Your task is to generate Python code for a Manim animation that visually explains a given topic or concept. Follow these steps:
 
 1. **Understand the Topic**:
@@ -277,3 +294,54 @@ When processing input:
 3. Develop appropriate visual representations
 4. Define suitable style approach
 5. Review for completeness and consistency"""
+
+
+# Compact variants of the prompts above (PROMPT_VARIANT=compact): the same
+# rules, stated once, without the worked example
+MANIM_SYSTEM_PROMPT_COMPACT = """You are an expert in creating educational animations using Manim. Write Python code for a Manim Community animation that visually explains the given topic.
+
+Plan:
+- Break the topic into its key concepts and storyboard them in a logical order.
+- Pick visual elements (shapes, graphs, formulas, text) for each concept.
+
+Layout:
+- Keep every element inside the frame: x from -7.5 to 7.5, y from -4 to 4.
+- Space elements so no objects or text overlap at any point in the video.
+
+Code:
+- One Scene subclass whose construct() calls a helper method per concept.
+- Use a consistent 3Blue1Brown style with clear colors and labels.
+- Add self.wait() after important animations for pacing.
+- End every section with self.play(FadeOut(*self.mobjects)) so each scene is cleaned up before the next one.
+- Comment each step.
+
+Output the complete script in a single ```python code block starting with `from manim import *`."""
+
+SCENE_SYSTEM_PROMPT_COMPACT = """Turn the given research paper, topic, question or material into this structure:
+
+*Topic*: [Subject name]
+*Key Points*:
+* 3-4 foundational concepts, with precise mathematical formulas where relevant
+*Visual Elements*:
+* 2-3 specific, dynamic visualizations, each starting with an action verb (Show, Animate, Demonstrate) and tied to a key point
+*Style*: 1-2 sentences on the visual approach and effects, matched to the subject
+
+Prefer foundational concepts over advanced applications and keep the depth consistent across points."""
+
+CODE_REPAIR_PROMPT = """The Manim code below was written for this animation request:
+
+{description}
+
+It failed with the following error:
+
+```
+{error}
+```
+
+Failing code:
+
+```python
+{code}
+```
+
+Fix the error with the smallest possible change. Keep the scene class name, the animations and the layout as they are unless they cause the error. Respond with the complete corrected code in a single ```python code block."""
@@ -0,0 +1,242 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+
+try:
+    import prometheus_client
+except ImportError:  # metrics are optional
+    prometheus_client = None
+
+try:
+    from opentelemetry import trace
+except ImportError:  # tracing is optional
+    trace = None
+
+# Stage latencies range from milliseconds (code extraction) to minutes (renders)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+
+class Telemetry:
+    """Per-stage metrics and traces for the generation pipeline.
+
+    Stage latencies, LLM token counts, cache hits, render failures and queue
+    depths are exported as Prometheus metrics when ``prometheus_client`` is
+    installed, and every stage becomes an OpenTelemetry span when
+    ``opentelemetry-api`` is installed (spans are only exported once an SDK
+    is configured, e.g. by running under ``opentelemetry-instrument``).
+    Without either package all calls are cheap no-ops.
+
+    Render workers run in separate processes, so work done there is
+    recorded into a buffer (see :meth:`collected`) that travels back with
+    the job result and is replayed in the server process.
+    """
+
+    def __init__(self):
+        self.tracer = trace.get_tracer("manimator") if trace else None
+        self._collected: Optional[List[Tuple]] = None
+        self._subscribers: List[Callable[[Tuple], None]] = []
+        if prometheus_client is None:
+            return
+        self.stage_seconds = prometheus_client.Histogram(
+            "manimator_stage_seconds",
+            "Duration of each pipeline stage",
+            ["stage", "outcome"],
+            buckets=STAGE_BUCKETS,
+        )
+        self.llm_seconds = prometheus_client.Histogram(
+            "manimator_llm_call_seconds",
+            "Duration of LLM calls per model, including retries",
+            ["model", "outcome"],
+            buckets=STAGE_BUCKETS,
+        )
+        self.llm_tokens = prometheus_client.Counter(
+            "manimator_llm_tokens",
+            "LLM tokens per stage; kind is prompt, cached_prompt or completion",
+            ["stage", "kind"],
+        )
+        self.cache_lookups = prometheus_client.Counter(
+            "manimator_cache_lookups",
+            "Cache lookups by cache and result",
+            ["cache", "result"],
+        )
+        self.render_failures = prometheus_client.Counter(
+            "manimator_render_failures",
+            "Failed render jobs by cause",
+            ["cause"],
+        )
+        self.repairs = prometheus_client.Counter(
+            "manimator_code_repairs",
+            "Code repair attempts by failing stage and outcome",
+            ["stage", "outcome"],
+        )
+        self.workspace_files = prometheus_client.Histogram(
+            "manimator_render_workspace_files",
+            "Files a render wrote to its working directory",
+            buckets=(10, 100, 500, 1000, 5000, 10000, 50000),
+        )
+        self.workspace_bytes = prometheus_client.Histogram(
+            "manimator_render_workspace_bytes",
+            "Bytes a render wrote to its working directory",
+            buckets=tuple(2**power for power in range(20, 35, 2)),
+        )
+        self.queue_depth = prometheus_client.Gauge(
+            "manimator_queue_depth",
+            "Work admitted to a pool and not yet finished",
+            ["queue"],
+        )
+
+    @property
+    def metrics_enabled(self) -> bool:
+        return prometheus_client is not None
+
+    def _emit(self, event: Tuple):
+        if self._collected is not None:
+            self._collected.append(event)
+        else:
+            self._apply(event)
+
+    def _apply(self, event: Tuple):
+        for subscriber in self._subscribers:
+            subscriber(event)
+        kind, *args = event
+        if kind == "stage":
+            stage, seconds, outcome, start_ns, attributes = args
+            if self.tracer is not None and start_ns is not None:
+                span = self.tracer.start_span(
+                    stage, start_time=start_ns, attributes=attributes
+                )
+                span.set_attribute("outcome", outcome)
+                span.end(end_time=start_ns + int(seconds * 1e9))
+            if prometheus_client is not None:
+                self.stage_seconds.labels(stage, outcome).observe(seconds)
+        elif prometheus_client is None:
+            return
+        elif kind == "llm":
+            model, seconds, outcome = args
+            self.llm_seconds.labels(model, outcome).observe(seconds)
+        elif kind == "tokens":
+            stage, counts = args
+            for token_kind, count in counts.items():
+                if count:
+                    self.llm_tokens.labels(stage, token_kind).inc(count)
+        elif kind == "cache":
+            cache, hit = args
+            self.cache_lookups.labels(cache, "hit" if hit else "miss").inc()
+        elif kind == "failure":
+            self.render_failures.labels(args[0]).inc()
+        elif kind == "repair":
+            stage, outcome = args
+            self.repairs.labels(stage, outcome or "unknown").inc()
+        elif kind == "workspace":
+            files, size = args
+            self.workspace_files.observe(files)
+            self.workspace_bytes.observe(size)
+
+    @contextmanager
+    def span(self, stage: str, **attributes) -> Iterator[None]:
+        """Times a pipeline stage and traces it as the current span.
+
+        Args:
+            stage: Stage name, used as the metric label and span name
+            **attributes: Span attributes, e.g. the model or quality
+        """
+
+        start = time.perf_counter()
+        outcome = "ok"
+        otel_span = (
+            self.tracer.start_as_current_span(stage, attributes=attributes)
+            if self.tracer is not None and self._collected is None
+            else None
+        )
+        try:
+            if otel_span is None:
+                yield
+            else:
+                with otel_span:
+                    yield
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            # Without a live span (e.g. in worker processes), the span is
+            # created from the start time when the event is applied
+            start_ns = time.time_ns() - int(seconds * 1e9) if otel_span is None else None
+            self._emit(("stage", stage, seconds, outcome, start_ns, attributes))
+
+    def observe(self, stage: str, seconds: float, outcome: str = "ok", **attributes):
+        """Records a stage timed elsewhere, e.g. in a PDF worker or a generator."""
+
+        start_ns = time.time_ns() - int(seconds * 1e9)
+        self._emit(("stage", stage, seconds, outcome, start_ns, attributes))
+
+    def observe_llm(self, model: str, seconds: float, ok: bool):
+        self._emit(("llm", model, seconds, "ok" if ok else "error"))
+
+    def count_tokens(self, stage: str, **counts: int):
+        """Counts LLM tokens of a stage, e.g. ``prompt=100, completion=20``."""
+
+        self._emit(("tokens", stage, counts))
+
+    def count_cache(self, cache: str, hit: bool):
+        self._emit(("cache", cache, hit))
+
+    def count_failure(self, cause: str):
+        self._emit(("failure", cause))
+
+    def count_repair(self, stage: str, outcome: Optional[str]):
+        self._emit(("repair", stage, outcome))
+
+    def count_workspace(self, files: int, size: int):
+        """Records the files and bytes a render wrote to its working directory."""
+
+        self._emit(("workspace", files, size))
+
+    def track_queue(self, queue: str, depth: Callable[[], float]):
+        """Reports ``depth()`` as the queue's depth whenever metrics are scraped."""
+
+        if prometheus_client is not None:
+            self.queue_depth.labels(queue).set_function(depth)
+
+    @contextmanager
+    def collected(self) -> Iterator[List[Tuple]]:
+        """Buffers everything recorded in this block for :meth:`replay`
+        instead of recording it.
+
+        Used by render worker processes, whose own metrics are never scraped.
+        """
+
+        previous, self._collected = self._collected, []
+        try:
+            yield self._collected
+        finally:
+            self._collected = previous
+
+    def subscribe(self, callback: Callable[[Tuple], None]):
+        """Calls ``callback(event)`` for every event recorded by this process.
+
+        Events replayed from workers are included. Stage events are
+        ``("stage", stage, seconds, outcome, start_ns, attributes)`` tuples.
+        """
+
+        self._subscribers.append(callback)
+
+    def replay(self, events: List[Tuple]):
+        """Applies events recorded by a worker process to this process."""
+
+        for event in events or []:
+            self._apply(event)
+
+    def latest(self) -> Tuple[bytes, str]:
+        """Returns the Prometheus exposition of all metrics and its content type."""
+
+        return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
+
+    def start_http_server(self, port: int):
+        """Serves metrics on their own port, for apps without a /metrics route."""
+
+        if prometheus_client is not None:
+            prometheus_client.start_http_server(port)
+
+
+telemetry = Telemetry()
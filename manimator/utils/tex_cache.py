@@ -0,0 +1,359 @@
+import argparse
+import fcntl
+import filecmp
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from typing import Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from manimator.utils.render_worker import MANIM_CLI
+from manimator.utils.sandbox import render_sandbox, scratch_pool
+from manimator.utils.telemetry import telemetry
+
+load_dotenv()
+
+# Manim's default cache folders inside a media directory
+CACHE_SUBDIRS = ("Tex", "texts")
+
+# Inline and display LaTeX in the few-shot scene descriptions
+FORMULA_PATTERN = re.compile(r"\\\((.+?)\\\)|\\\[(.+?)\\\]", re.DOTALL)
+
+WARMUP_SCENE = '''from manim import *
+
+FORMULAS = {formulas!r}
+
+
+class TexCacheWarmup(Scene):
+    def construct(self):
+        for formula in FORMULAS:
+            try:
+                MathTex(formula)
+            except Exception as e:
+                print(f"Skipping {{formula!r}}: {{e}}")
+'''
+
+
+class TexCache:
+    """Shared cache of the SVGs Manim compiles for ``Tex``, ``MathTex`` and ``Text``.
+
+    Manim keeps these under ``{media_dir}/Tex`` and ``{media_dir}/texts``,
+    named by a hash of their source, and skips LaTeX and dvisvgm (or Pango)
+    when the SVG already exists. Renders use throwaway media directories,
+    so without sharing, every formula is compiled again on every request.
+
+    Renders never write to the shared directory directly, since Manim gives
+    no guarantee that a concurrent render does not read a half written file.
+    Instead the Manim process runs with :meth:`install_hook`, which fetches
+    each SVG a scene needs into its media directory right before Manim
+    looks for it. After the render, new SVGs are published with an atomic
+    rename. Fetched and published files are hard links, or complete copies
+    across filesystems, so eviction never pulls an SVG from under a render.
+    Beyond ``max_bytes`` the least recently used entries are evicted.
+
+    Args:
+        root: Shared cache directory. Defaults to env RENDER_TEX_CACHE_DIR
+            or a ``manimator/tex_cache`` folder in the system temp directory
+        max_bytes: Size cap; 0 disables the cache. Defaults to env
+            RENDER_TEX_CACHE_MAX_BYTES or 256 MiB
+    """
+
+    def __init__(self, root: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.root = root or os.getenv(
+            "RENDER_TEX_CACHE_DIR",
+            os.path.join(tempfile.gettempdir(), "manimator", "tex_cache"),
+        )
+        self.max_bytes = (
+            max_bytes
+            if max_bytes is not None
+            else int(os.getenv("RENDER_TEX_CACHE_MAX_BYTES", str(256 * 1024**2)))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _entries(self, subdir: str) -> List[os.DirEntry]:
+        try:
+            return [
+                entry
+                for entry in os.scandir(os.path.join(self.root, subdir))
+                if entry.name.endswith(".svg")
+            ]
+        except FileNotFoundError:
+            return []
+
+    def fetch(self, subdir: str, name: str, destination: str) -> bool:
+        """Places one cached SVG where Manim is about to look for it.
+
+        Args:
+            subdir (str): Cache folder, one of ``CACHE_SUBDIRS``
+            name (str): File name of the SVG
+            destination (str): Path in the render's media directory
+
+        Returns:
+            bool: Whether the SVG was cached
+        """
+
+        if not self.enabled:
+            return False
+        try:
+            self._place(os.path.join(self.root, subdir, name), destination)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            print(f"Failed to fetch {name} from the Tex cache: {e}")
+            return False
+        return True
+
+    def install_hook(self):
+        """Makes Manim in this process fetch missing SVGs from the cache.
+
+        Wraps Manim's ``tex_to_svg_file`` and the Pango SVG generation of
+        ``Text`` and ``MarkupText``. Each computes the SVG's file name as
+        Manim does and calls :meth:`fetch` before handing over to Manim,
+        which then finds the SVG and skips compiling it. Only the SVGs a
+        scene uses are fetched.
+
+        Raises:
+            ImportError: If Manim is not installed
+        """
+
+        from manim import config
+        from manim.mobject.text import tex_mobject, text_mobject
+        from manim.utils import tex_file_writing
+
+        if not self.enabled:
+            return
+        tex_to_svg_file = tex_file_writing.tex_to_svg_file
+
+        def cached_tex_to_svg_file(expression, environment=None, tex_template=None):
+            tex_file = tex_file_writing.generate_tex_file(
+                expression, environment, tex_template
+            )
+            svg_file = tex_file.with_suffix(".svg")
+            if not svg_file.exists():
+                self.fetch("Tex", svg_file.name, str(svg_file))
+            return tex_to_svg_file(expression, environment, tex_template)
+
+        def cached_text2svg(text2svg):
+            def wrapper(mobject, color):
+                text_dir = config.get_dir("text_dir")
+                svg_file = text_dir / f"{mobject._text2hash(color)}.svg"
+                if not svg_file.exists():
+                    text_dir.mkdir(parents=True, exist_ok=True)
+                    self.fetch("texts", svg_file.name, str(svg_file))
+                return text2svg(mobject, color)
+
+            return wrapper
+
+        # tex_mobject imported the function by name
+        tex_file_writing.tex_to_svg_file = cached_tex_to_svg_file
+        tex_mobject.tex_to_svg_file = cached_tex_to_svg_file
+        for cls in (text_mobject.Text, text_mobject.MarkupText):
+            cls._text2svg = cached_text2svg(cls._text2svg)
+
+    def publish(self, media_dir: str) -> Tuple[int, int]:
+        """Adds the SVGs compiled in a media directory to the shared cache.
+
+        Also refreshes the recency of cached formulas the render used and
+        evicts entries beyond ``max_bytes``.
+
+        Args:
+            media_dir (str): Manim media directory after rendering
+
+        Returns:
+            Tuple[int, int]: Formulas served from the cache and SVGs added
+        """
+
+        if not self.enabled:
+            return 0, 0
+        hits = added = 0
+        for subdir in CACHE_SUBDIRS:
+            private = os.path.join(media_dir, subdir)
+            shared = os.path.join(self.root, subdir)
+            try:
+                entries = list(os.scandir(private))
+            except FileNotFoundError:
+                continue
+            names = {entry.name for entry in entries}
+            os.makedirs(shared, exist_ok=True)
+            # Count hits before this render's own SVGs are published
+            entries.sort(key=lambda entry: not entry.name.endswith(".tex"))
+            for entry in entries:
+                if entry.name.endswith(".tex"):
+                    # Manim writes a .tex file for every formula it uses,
+                    # compiled or not (latex cleanup is turned off)
+                    svg = entry.name[:-4] + ".svg"
+                    hit = svg in names and self._is_cached(
+                        os.path.join(private, svg), os.path.join(shared, svg)
+                    )
+                    hits += hit
+                    telemetry.count_cache("tex", hit)
+                    if hit:
+                        self._touch(os.path.join(shared, svg))
+                elif entry.name.endswith(".svg") and entry.is_file():
+                    shared_path = os.path.join(shared, entry.name)
+                    if self._is_cached(entry.path, shared_path):
+                        continue
+                    try:
+                        self._place(entry.path, shared_path)
+                    except OSError as e:
+                        print(f"Failed to publish {entry.name} to the Tex cache: {e}")
+                        continue
+                    added += 1
+        if added:
+            self.evict()
+        return hits, added
+
+    @staticmethod
+    def _is_cached(private_path: str, shared_path: str) -> bool:
+        try:
+            return os.path.samefile(private_path, shared_path) or filecmp.cmp(
+                private_path, shared_path, shallow=False
+            )
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def _touch(path: str):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # evicted meanwhile
+
+    @staticmethod
+    def _place(source: str, destination: str):
+        # Readers only ever see complete files: link or copy aside, then rename
+        temp_path = os.path.join(os.path.dirname(destination), f".{uuid.uuid4().hex}.tmp")
+        try:
+            try:
+                os.link(source, temp_path)
+            except FileNotFoundError:
+                raise
+            except OSError:
+                shutil.copyfile(source, temp_path)
+            os.replace(temp_path, destination)
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits ``max_bytes``.
+
+        Evicts down to 90% of the cap so it does not run after every render.
+        Skipped while another process is evicting.
+        """
+
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, ".lock"), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            entries = []
+            for subdir in CACHE_SUBDIRS:
+                for entry in self._entries(subdir):
+                    try:
+                        info = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((info.st_mtime, info.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes:
+                return
+            target = self.max_bytes * 0.9
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def stats(self) -> dict:
+        entries = [entry for subdir in CACHE_SUBDIRS for entry in self._entries(subdir)]
+        size = 0
+        for entry in entries:
+            try:
+                size += entry.stat().st_size
+            except FileNotFoundError:
+                continue
+        return {"entries": len(entries), "bytes": size, "max_bytes": self.max_bytes}
+
+    def warm_up(self, formulas: List[str]) -> Tuple[int, int]:
+        """Compiles formulas into the cache with a Manim dry run.
+
+        Args:
+            formulas (List[str]): LaTeX math, each rendered as ``MathTex``
+
+        Returns:
+            Tuple[int, int]: Formulas already cached and SVGs added
+
+        Raises:
+            subprocess.CalledProcessError: If Manim fails
+        """
+
+        with scratch_pool.acquire() as media_dir:
+            scene_file = os.path.join(media_dir, "warmup.py")
+            with open(scene_file, "w") as f:
+                f.write(WARMUP_SCENE.format(formulas=formulas))
+            config_file = os.path.join(media_dir, "manim.cfg")
+            with open(config_file, "w") as f:
+                f.write("[CLI]\nno_latex_cleanup = True\n")
+            render_sandbox.run(
+                MANIM_CLI
+                + ["--dry_run", "--config_file", config_file, "--media_dir", media_dir]
+                + [scene_file, "TexCacheWarmup"]
+            )
+            return self.publish(media_dir)
+
+
+def few_shot_formulas() -> List[str]:
+    """Returns the LaTeX formulas of the few-shot scene descriptions."""
+
+    from manimator.few_shot.few_shot_prompts import SCENE_EXAMPLES
+
+    formulas = []
+    for message in SCENE_EXAMPLES:
+        for match in FORMULA_PATTERN.finditer(message["content"]):
+            formula = (match.group(1) or match.group(2)).strip()
+            if formula and formula not in formulas:
+                formulas.append(formula)
+    return formulas
+
+
+tex_cache = TexCache()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Warms up the shared Tex cache with common formulas."
+    )
+    parser.add_argument(
+        "--file",
+        help="File with one formula per line; defaults to the formulas of "
+        "the few-shot examples",
+    )
+    parser.add_argument("--stats", action="store_true", help="Only print cache stats")
+    args = parser.parse_args()
+
+    if not args.stats:
+        if args.file:
+            with open(args.file) as f:
+                formulas = [line.strip() for line in f if line.strip()]
+        else:
+            formulas = few_shot_formulas()
+        hits, added = tex_cache.warm_up(formulas)
+        print(f"{len(formulas)} formulas: {hits} already cached, {added} SVGs added")
+    print(tex_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi import HTTPException
+
+from manimator.utils.arxiv_fetcher import ArxivFetcher
+
+PDF = b"%PDF-1.4 fake paper\n" * 100
+
+
+class FakeArxiv(ThreadingHTTPServer):
+    """Local stand-in for arxiv.org serving scripted responses per path.
+
+    ``routes`` maps a path to a list of ``(status, body)`` responses served
+    in turn; the last one repeats.
+    """
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ArxivHandler)
+        self.routes = {}
+        self.requests = []
+        self.connections = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/pdf"
+
+
+class ArxivHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooling is observable
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        self.server.connections.add(self.client_address)
+        responses = self.server.routes.get(self.path, [(404, b"not found")])
+        status, body = responses.pop(0) if len(responses) > 1 else responses[0]
+        self.send_response(status)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = FakeArxiv()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fetcher(server, tmp_path):
+    return ArxivFetcher(
+        base_url=server.base_url, cache_dir=str(tmp_path), timeout=5, retries=2
+    )
+
+
+def fetch_all(fetcher, *arxiv_ids):
+    async def run():
+        try:
+            return [await fetcher.fetch(arxiv_id) for arxiv_id in arxiv_ids]
+        finally:
+            await fetcher.aclose()
+
+    return asyncio.run(run())
+
+
+def fetch_error(fetcher, arxiv_id) -> HTTPException:
+    with pytest.raises(HTTPException) as error:
+        fetch_all(fetcher, arxiv_id)
+    return error.value
+
+
+def test_downloads_share_one_connection(server, fetcher):
+    server.routes["/pdf/2312.00001"] = [(200, PDF)]
+    server.routes["/pdf/2312.00002"] = [(200, PDF[:10])]
+
+    assert fetch_all(fetcher, "2312.00001", "2312.00002") == [PDF, PDF[:10]]
+    assert len(server.requests) == 2
+    assert len(server.connections) == 1
+
+
+def test_versioned_paper_is_served_from_disk(server, fetcher):
+    server.routes["/pdf/2312.00001v2"] = [(200, PDF)]
+
+    assert fetch_all(fetcher, "2312.00001v2", "2312.00001v2") == [PDF, PDF]
+    assert server.requests == ["/pdf/2312.00001v2"]
+    assert os.path.exists(os.path.join(fetcher.cache_dir, "2312.00001", "v2.pdf"))
+
+
+def test_unversioned_cache_entry_expires(server, fetcher):
+    server.routes["/pdf/2312.00001"] = [(200, PDF)]
+    fetch_all(fetcher, "2312.00001")
+    fetch_all(fetcher, "2312.00001")
+    assert len(server.requests) == 1
+
+    path = os.path.join(fetcher.cache_dir, "2312.00001", "latest.pdf")
+    stale = time.time() - fetcher.latest_ttl - 1
+    os.utime(path, (stale, stale))
+    fetch_all(fetcher, "2312.00001")
+    assert len(server.requests) == 2
+
+
+def test_unknown_paper_is_404(server, fetcher):
+    assert fetch_error(fetcher, "2312.99999").status_code == 404
+    assert len(server.requests) == 1
+
+
+def test_server_errors_are_retried_then_502(server, fetcher):
+    server.routes["/pdf/2312.00001"] = [(500, b"oops")]
+
+    assert fetch_error(fetcher, "2312.00001").status_code == 502
+    assert len(server.requests) == fetcher.retries
+
+
+def test_rate_limit_is_retried(server, fetcher):
+    server.routes["/pdf/2312.00001"] = [(429, b"slow down"), (200, PDF)]
+
+    assert fetch_all(fetcher, "2312.00001") == [PDF]
+    assert len(server.requests) == 2
+
+
+def test_oversized_pdf_is_413(server, fetcher):
+    fetcher.max_bytes = len(PDF) - 1
+    server.routes["/pdf/2312.00001"] = [(200, PDF)]
+
+    assert fetch_error(fetcher, "2312.00001").status_code == 413
+    assert not os.path.exists(os.path.join(fetcher.cache_dir, "2312.00001"))
+
+
+def test_invalid_id_is_400_without_request(server, fetcher):
+    assert fetch_error(fetcher, "../etc/passwd").status_code == 400
+    assert server.requests == []